@@ -0,0 +1,170 @@
+"""
+Ollama Backend Pool
+Routes generations across several Ollama hosts by model affinity and load
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+from agents.process_local import ProcessLocal
+from agents.ollama_client import (
+    OllamaClient, OllamaError, OllamaConnectionError, DEFAULT_OLLAMA_URL, get_ollama_client
+)
+
+class OllamaBackend:
+    """One Ollama endpoint with its model inventory and load counters"""
+
+    def __init__(self, url: str, client: OllamaClient = None):
+        self.url = url.rstrip('/')
+        self.client = client or OllamaClient(self.url)
+        self.models = set()
+        self.healthy = True
+        self.outstanding = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_probe = None
+
+    def probe(self, timeout: float = 3) -> bool:
+        """Refresh health and the model list from /api/tags"""
+
+        try:
+            self.models = {model['name'] for model in self.client.tags(timeout=timeout)}
+            self.healthy = True
+            self.last_error = None
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+
+        self.last_probe = time.time()
+        return self.healthy
+
+    def get_status(self) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'total_requests': self.total_requests,
+            'failures': self.failures,
+            'models': sorted(self.models),
+            'last_error': self.last_error,
+            'last_probe': self.last_probe
+        }
+
+class BackendPool:
+    """Registry of Ollama endpoints with periodic health probes"""
+
+    def __init__(self, urls: List[str] = None, probe_interval: float = 15):
+        default = get_ollama_client()
+        urls = urls or [default.base_url]
+
+        self.backends = [
+            OllamaBackend(url, default if url.rstrip('/') == default.base_url else None)
+            for url in urls
+        ]
+        self.probe_interval = probe_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober = None
+
+    @classmethod
+    def from_env(cls) -> 'BackendPool':
+        """Build a pool from OLLAMA_HOSTS (comma-separated URLs)"""
+
+        hosts = os.getenv('OLLAMA_HOSTS', '')
+        urls = [url.strip() for url in hosts.split(',') if url.strip()] or [DEFAULT_OLLAMA_URL]
+        return cls(urls)
+
+    def start(self):
+        """Probe every backend once and start the background health checker"""
+
+        if self._prober and self._prober.is_alive():
+            return
+
+        self.probe_all()
+        self._stop.clear()
+        self._prober = threading.Thread(target=self._probe_loop, name='ollama-health', daemon=True)
+        self._prober.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def probe_all(self):
+        for backend in self.backends:
+            backend.probe()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe_all()
+
+    def select(self, model: str) -> OllamaBackend:
+        """Pick a backend: healthy first, then one with the model, then least outstanding"""
+
+        healthy = [b for b in self.backends if b.healthy]
+        if not healthy:
+            # Everything looks down; try the least-failed backend anyway
+            healthy = sorted(self.backends, key=lambda b: b.failures)[:1]
+            if not healthy:
+                raise OllamaError("No Ollama backends configured")
+
+        with_model = [b for b in healthy if model in b.models]
+        candidates = with_model or healthy
+
+        return min(candidates, key=lambda b: (b.outstanding, b.total_requests))
+
+    @contextmanager
+    def acquire(self, model: str):
+        """Reserve the best backend for one request"""
+
+        with self._lock:
+            backend = self.select(model)
+            backend.outstanding += 1
+            backend.total_requests += 1
+
+        try:
+            yield backend
+        except OllamaError as e:
+            backend.failures += 1
+            backend.last_error = str(e)
+            # Connection-level failures take the backend out until its next probe
+            if isinstance(e, OllamaConnectionError):
+                backend.healthy = False
+            raise
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def client_for(self, model: str) -> OllamaClient:
+        """Client for the backend that would serve `model` (no load accounting)"""
+        return self.select(model).client
+
+    def list_models(self) -> List[str]:
+        """Union of models across healthy backends"""
+
+        models = set()
+        for backend in self.backends:
+            if backend.healthy:
+                models |= backend.models
+        return sorted(models)
+
+    def get_status(self) -> Dict:
+        return {
+            'backends': [backend.get_status() for backend in self.backends],
+            'healthy': sum(1 for b in self.backends if b.healthy),
+            'total': len(self.backends)
+        }
+
+def _start_pool() -> BackendPool:
+    pool = BackendPool.from_env()
+    pool.start()
+    return pool
+
+# The health checker thread does not survive a fork
+_pool = ProcessLocal(_start_pool)
+
+def get_backend_pool() -> BackendPool:
+    """Get the process-wide backend pool, starting health probes on first use"""
+    return _pool.get()
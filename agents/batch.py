@@ -0,0 +1,340 @@
+"""
+Batch Generation - Bulk Prompts Through an Agent
+Bounded-parallel jobs with streamed results and resumable job IDs
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import asyncio
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+from agents.backends import get_backend_pool
+from agents.generation import get_generation_engine
+from agents.jsonl_writer import append_jsonl, flush_jsonl_writer
+from agents.process_local import ProcessLocal
+from agents.scheduler import QueueFullError
+
+BATCH_JOBS_PATH = os.getenv('BATCH_JOBS_PATH', os.path.join(os.path.dirname(__file__), 'data', 'batch_jobs'))
+
+# Admission plan for batch work (lowest weight, see agents.scheduler)
+BATCH_PLAN = 'batch'
+
+MAX_BATCH_ITEMS = 1000
+
+def normalize_items(prompts) -> List[Dict]:
+    """Accept a list of prompt strings or {'prompt', 'id', 'context', 'model'} dicts"""
+
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError("prompts must be a non-empty list")
+    if len(prompts) > MAX_BATCH_ITEMS:
+        raise ValueError(f"A batch can hold at most {MAX_BATCH_ITEMS} prompts")
+
+    items = []
+    for index, entry in enumerate(prompts):
+        if isinstance(entry, str):
+            entry = {'prompt': entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get('prompt'), str) or not entry['prompt']:
+            raise ValueError(f"Item {index} has no prompt")
+
+        items.append({
+            'id': entry.get('id', index),
+            'prompt': entry['prompt'],
+            'context': entry.get('context'),
+            'model': entry.get('model')
+        })
+
+    return items
+
+class BatchJob:
+    """A batch of prompts with results persisted as they complete
+
+    The job header is stored as <job_id>.json and results are appended to
+    <job_id>.results.jsonl, so an interrupted job can be resumed by ID and
+    only its unfinished items are run again.
+    """
+
+    def __init__(self, job_id: str, agent_name: str, items: List[Dict], model: str = None,
+                 created_at: str = None, jobs_path: str = BATCH_JOBS_PATH):
+        self.job_id = job_id
+        self.agent_name = agent_name
+        self.items = items
+        self.model = model
+        self.created_at = created_at or datetime.now().isoformat()
+        self.jobs_path = jobs_path
+        self.results = {}
+        self.status = 'pending'
+        self.finished_at = None
+
+    @property
+    def header_file(self) -> str:
+        return os.path.join(self.jobs_path, f"{self.job_id}.json")
+
+    @property
+    def results_file(self) -> str:
+        return os.path.join(self.jobs_path, f"{self.job_id}.results.jsonl")
+
+    def pending_indexes(self) -> List[int]:
+        return [index for index in range(len(self.items)) if index not in self.results]
+
+    def save(self):
+        """Write the job header"""
+
+        os.makedirs(self.jobs_path, exist_ok=True)
+        with open(self.header_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'job_id': self.job_id,
+                'agent': self.agent_name,
+                'model': self.model,
+                'items': self.items,
+                'created_at': self.created_at,
+                'status': self.status,
+                'finished_at': self.finished_at
+            }, f)
+
+    def record(self, result: Dict):
+        """Keep a finished item's result and queue it for the results log"""
+
+        self.results[result['index']] = result
+        append_jsonl(self.results_file, result)
+
+    @classmethod
+    def load(cls, job_id: str, jobs_path: str = BATCH_JOBS_PATH) -> Optional['BatchJob']:
+        """Load a job and its completed results from disk"""
+
+        # Job IDs are generated hex strings; anything else is not a file we wrote
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+
+        header_file = os.path.join(jobs_path, f"{job_id}.json")
+        if not os.path.exists(header_file):
+            return None
+
+        # Results of a job that just ran may still be queued
+        flush_jsonl_writer()
+
+        with open(header_file, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+
+        job = cls(job_id, header['agent'], header['items'], header.get('model'),
+                  header.get('created_at'), jobs_path)
+        job.status = header.get('status', 'pending')
+        job.finished_at = header.get('finished_at')
+
+        if os.path.exists(job.results_file):
+            with open(job.results_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        result = json.loads(line.strip())
+                        job.results[result['index']] = result
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+
+        return job
+
+    def summary(self) -> Dict:
+        failed = sum(1 for r in self.results.values() if r.get('error'))
+
+        return {
+            'job_id': self.job_id,
+            'agent': self.agent_name,
+            'status': self.status,
+            'total': len(self.items),
+            'completed': len(self.results),
+            'failed': failed,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+class BatchRunner:
+    """Runs batch jobs on the generation engine with bounded parallelism
+
+    Up to `max_cached_jobs` jobs are kept in memory; the least recently used
+    jobs that are not running are dropped beyond that and reloaded from disk
+    when asked for again.
+    """
+
+    def __init__(self, max_parallel: int = None, jobs_path: str = BATCH_JOBS_PATH, max_attempts: int = 5,
+                 max_cached_jobs: int = 256):
+        self.max_parallel = max_parallel
+        self.jobs_path = jobs_path
+        self.max_attempts = max_attempts
+        self.max_cached_jobs = max_cached_jobs
+        self.jobs = OrderedDict()   # job_id -> BatchJob, least recently used first
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def parallelism(self) -> int:
+        """Concurrent items per job; scales with the number of Ollama backends"""
+        return self.max_parallel or 4 * len(get_backend_pool().backends)
+
+    def create_job(self, agent_name: str, prompts, model: str = None) -> BatchJob:
+        """Validate prompts and persist a new job"""
+
+        self._resolve_agent(agent_name)
+
+        job = BatchJob(uuid.uuid4().hex, agent_name, normalize_items(prompts), model,
+                       jobs_path=self.jobs_path)
+        job.save()
+        return self._cache(job)
+
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        """Find a job in memory or on disk"""
+
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                self.jobs.move_to_end(job_id)
+                return job
+
+        job = BatchJob.load(job_id, self.jobs_path)
+        return self._cache(job) if job is not None else None
+
+    def _cache(self, job: BatchJob) -> BatchJob:
+        """Keep a job in memory, dropping the least recently used finished ones"""
+
+        with self._lock:
+            # A job loaded twice at once: keep the copy that may already be running
+            job = self.jobs.setdefault(job.job_id, job)
+            self.jobs.move_to_end(job.job_id)
+
+            idle = [job_id for job_id in self.jobs if job_id not in self._running]
+            for job_id in idle[:max(0, len(self.jobs) - self.max_cached_jobs)]:
+                del self.jobs[job_id]
+        return job
+
+    def stream(self, job: BatchJob) -> Iterator[Dict]:
+        """Run a job's unfinished items, yielding a 'job' event, a 'result' per item and a final 'done'
+
+        Results already stored for a resumed job are yielded first. If the
+        consumer goes away, the job keeps running and can be resumed by ID.
+        """
+
+        agent = self._resolve_agent(job.agent_name)
+
+        with self._lock:
+            if job.job_id in self._running:
+                raise ValueError(f"Batch job {job.job_id} is already running")
+            pending = job.pending_indexes()
+            if pending:
+                self._running.add(job.job_id)
+
+        yield {'type': 'job', **job.summary()}
+
+        for index in sorted(job.results):
+            yield {'type': 'result', **job.results[index]}
+
+        if pending:
+            events = queue.Queue()
+            future = get_generation_engine().run(self._run_async(job, agent, pending, events))
+
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+
+            future.result()
+
+        yield {'type': 'done', **job.summary()}
+
+    def run(self, agent_name: str, prompts=None, job_id: str = None, model: str = None) -> List[Dict]:
+        """Run (or resume) a batch and return all results in input order"""
+
+        job = self.get_job(job_id) if job_id else self.create_job(agent_name, prompts, model)
+        if job is None:
+            raise ValueError(f"Unknown batch job {job_id}")
+
+        for _ in self.stream(job):
+            pass
+
+        return [job.results[index] for index in sorted(job.results)]
+
+    async def _run_async(self, job: BatchJob, agent, pending: List[int], events: queue.Queue):
+        semaphore = asyncio.Semaphore(self.parallelism())
+        loop = asyncio.get_running_loop()
+
+        async def run_item(index):
+            async with semaphore:
+                result = await self._generate(job, agent, index)
+            # Results go through the background JSONL writer, headers through the executor
+            job.record(result)
+            events.put({'type': 'result', **result})
+
+        job.status = 'running'
+        await loop.run_in_executor(None, job.save)
+
+        try:
+            await asyncio.gather(*(run_item(index) for index in pending))
+            job.status = 'completed'
+        except Exception as e:
+            print(f"Batch job {job.job_id} failed: {e}")
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            await loop.run_in_executor(None, self._finish, job)
+            with self._lock:
+                self._running.discard(job.job_id)
+            events.put(None)
+
+    def _finish(self, job: BatchJob):
+        """Write the final header once every result is on disk"""
+
+        flush_jsonl_writer()
+        job.save()
+
+    async def _generate(self, job: BatchJob, agent, index: int) -> Dict:
+        """Generate one item, waiting out admission back-pressure"""
+
+        item = job.items[index]
+        start = time.monotonic()
+        error = None
+        response = None
+
+        for attempt in range(self.max_attempts):
+            try:
+                response = await agent.generate_response_async(
+                    item['prompt'],
+                    item.get('context'),
+                    item.get('model') or job.model,
+                    plan=BATCH_PLAN
+                )
+                error = None
+                break
+            except QueueFullError as e:
+                error = str(e)
+                if attempt + 1 < self.max_attempts:
+                    await asyncio.sleep(e.retry_after)
+
+        if response is not None and response == agent.fallback_response():
+            error = 'generation failed'
+
+        return {
+            'index': index,
+            'id': item['id'],
+            'response': None if error else response,
+            'error': error,
+            'elapsed': round(time.monotonic() - start, 3)
+        }
+
+    def _resolve_agent(self, agent_name: str):
+        from agents.manager import agent_manager
+
+        agent = agent_manager.get_agent(agent_name)
+        if agent is None:
+            raise ValueError(f"Unknown agent {agent_name}")
+        return agent
+
+_runner = ProcessLocal(BatchRunner)
+
+def get_batch_runner() -> BatchRunner:
+    """Get the process-wide batch runner"""
+    return _runner.get()
+
+def run_batch(agent_name: str, prompts, model: str = None, job_id: str = None) -> List[Dict]:
+    """Run prompts through an agent and return results in input order (resume with job_id)"""
+    return get_batch_runner().run(agent_name, prompts, job_id=job_id, model=model)
@@ -0,0 +1,194 @@
+"""
+Completion Cache - Exact-Match Response Caching
+In-process LRU tier with TTLs plus an optional shared (Redis) tier
+"""
+
+import time
+import asyncio
+import threading
+from functools import partial
+from collections import OrderedDict
+from typing import Dict, Optional
+from agents.singleflight import make_generation_key
+
+class LRUCacheTier:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a live entry and mark it most recently used"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        """Insert an entry, evicting the least recently used past capacity"""
+
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisCacheTier:
+    """Shared cache tier backed by Redis (optional dependency)"""
+
+    def __init__(self, url: str, prefix: str = 'completion:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self.prefix = prefix
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception:
+            # A slow or missing shared tier must never fail a chat turn
+            self._error()
+            return None
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        try:
+            self.client.set(self.prefix + key, value.encode('utf-8'), ex=max(1, int(ttl)))
+        except Exception:
+            self._error()
+
+    def _error(self):
+        with self._lock:
+            self.errors += 1
+
+class CompletionCache:
+    """Two-tier exact-match cache keyed by a hash of (model, prompt, options)
+
+    Callers on an event loop use get_async/set_async, which run the shared
+    tier's blocking round trips in the loop's executor.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 1000, shared_url: str = None):
+        self.ttl = ttl
+        self.local = LRUCacheTier(max_entries)
+        self.shared = None
+
+        if shared_url:
+            try:
+                self.shared = RedisCacheTier(shared_url)
+            except ImportError:
+                print("Warning: redis is not installed; completion cache running without shared tier")
+
+        self.stats = {
+            'hits': 0,
+            'local_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'stores': 0
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cache_config: Dict = None) -> Optional['CompletionCache']:
+        """Build a cache from an agent's `cache` config section, or None if not opted in"""
+
+        if not cache_config or not cache_config.get('enabled'):
+            return None
+
+        return cls(
+            ttl=cache_config.get('ttl_seconds', 600),
+            max_entries=cache_config.get('max_entries', 1000),
+            shared_url=cache_config.get('shared_url')
+        )
+
+    def make_key(self, model: str, prompt: str, options: Dict = None) -> str:
+        return make_generation_key(model, prompt, options)
+
+    def get(self, model: str, prompt: str, options: Dict = None) -> Optional[str]:
+        """Look up a completion, local tier first"""
+
+        key = self.make_key(model, prompt, options)
+
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits', 'local_hits')
+            return value
+
+        if self.shared:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value, self.ttl)
+                self._count('hits', 'shared_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    async def get_async(self, model: str, prompt: str, options: Dict = None) -> Optional[str]:
+        """get() for callers on an event loop"""
+
+        if not self.shared:
+            return self.get(model, prompt, options)
+        return await asyncio.get_running_loop().run_in_executor(None, partial(self.get, model, prompt, options))
+
+    def set(self, model: str, prompt: str, options: Dict, value: str, ttl: float = None):
+        """Store a completion in every tier"""
+
+        key = self.make_key(model, prompt, options)
+        ttl = ttl or self.ttl
+
+        self.local.set(key, value, ttl)
+        if self.shared:
+            self.shared.set(key, value, ttl)
+
+        self._count('stores')
+
+    async def set_async(self, model: str, prompt: str, options: Dict, value: str, ttl: float = None):
+        """set() for callers on an event loop"""
+
+        if not self.shared:
+            return self.set(model, prompt, options, value, ttl)
+        await asyncio.get_running_loop().run_in_executor(None, partial(self.set, model, prompt, options, value, ttl))
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self.stats[name] += 1
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters for tuning"""
+
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+
+        return {
+            **stats,
+            'hit_rate': stats['hits'] / lookups if lookups else 0,
+            'local_entries': len(self.local),
+            'local_evictions': self.local.evictions,
+            'local_expirations': self.local.expirations,
+            'shared_enabled': self.shared is not None,
+            'shared_errors': self.shared.errors if self.shared else 0
+        }
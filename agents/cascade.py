@@ -0,0 +1,149 @@
+"""
+Model Cascade - Small-Model-First Generation
+Drafts short turns on a small model and escalates only drafts that fail cheap checks
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from agents.residency import get_residency_manager
+
+DEFAULT_SMALL_MODELS = ['gemma2:2b', 'llama3.2:3b']
+
+REFUSAL_PATTERN = re.compile(
+    r"\b(as an ai( language model)?|i('m| am) (sorry|unable|not able)|i can(no|')t (help|assist|do that)"
+    r"|i (won't|will not) be able|i do not have the ability)\b",
+    re.IGNORECASE
+)
+
+# Draft emotions (EmotionEngine categories) that clash with the user's emotion
+CLASHING_EMOTIONS = {
+    'sadness': {'joy', 'anger'},
+    'fear': {'joy', 'anger'},
+    'anger': {'anger', 'joy'},
+    'love': {'anger'},
+    'joy': {'sadness', 'anger'}
+}
+
+class DraftScorer:
+    """Cheap accept/reject checks for a small-model draft"""
+
+    def __init__(self, emotion_engine=None, min_words: int = 3, min_distinct_trigrams: float = 0.5):
+        self.emotion_engine = emotion_engine
+        self.min_words = min_words
+        self.min_distinct_trigrams = min_distinct_trigrams
+
+    def check(self, draft: Optional[str], user_message: str) -> Tuple[bool, str]:
+        """Return (accepted, reason)"""
+
+        if not draft or not draft.strip():
+            return False, 'empty'
+
+        words = draft.lower().split()
+        if len(words) < self.min_words:
+            return False, 'too_short'
+
+        if REFUSAL_PATTERN.search(draft):
+            return False, 'refusal'
+
+        if self._is_repetitive(words, draft):
+            return False, 'repetitive'
+
+        if self.emotion_engine and self._clashes(draft, user_message):
+            return False, 'emotion_mismatch'
+
+        return True, 'accepted'
+
+    def _is_repetitive(self, words: List[str], draft: str) -> bool:
+        if len(words) >= 12:
+            trigrams = [tuple(words[i:i + 3]) for i in range(len(words) - 2)]
+            if len(set(trigrams)) / len(trigrams) < self.min_distinct_trigrams:
+                return True
+
+        sentences = [s.strip().lower() for s in re.split(r'[.!?\n]+', draft) if len(s.strip()) > 10]
+        return len(sentences) - len(set(sentences)) >= 2
+
+    def _clashes(self, draft: str, user_message: str) -> bool:
+        user_emotion = self.emotion_engine.analyze_emotion(user_message)['primary_emotion']
+        draft_emotion = self.emotion_engine.analyze_emotion(draft)['primary_emotion']
+        return draft_emotion in CLASHING_EMOTIONS.get(user_emotion, ())
+
+class ModelCascade:
+    """Per-agent small-model-first policy with escalation metrics"""
+
+    def __init__(self, agent_name: str, small_models: List[str] = None, max_input_words: int = 40,
+                 scorer: DraftScorer = None):
+        self.agent_name = agent_name
+        self.small_models = list(small_models or DEFAULT_SMALL_MODELS)
+        self.max_input_words = max_input_words
+        self.scorer = scorer or DraftScorer()
+
+        self._lock = threading.Lock()
+        self.stats = {
+            'drafts': 0,
+            'accepted': 0,
+            'escalated': 0,
+            'skipped_long_input': 0,
+            'reasons': {}
+        }
+
+    @classmethod
+    def from_config(cls, agent_name: str, cascade_config: Dict = None, emotion_engine=None) -> Optional['ModelCascade']:
+        """Build a cascade from an agent's `cascade` config section, or None if not opted in"""
+
+        if not cascade_config or not cascade_config.get('enabled'):
+            return None
+
+        return cls(
+            agent_name,
+            small_models=cascade_config.get('small_models'),
+            max_input_words=cascade_config.get('max_input_words', 40),
+            scorer=DraftScorer(emotion_engine, min_words=cascade_config.get('min_words', 3))
+        )
+
+    def draft_model(self, model: str, user_message: str) -> Optional[str]:
+        """Small model to draft with, or None to go straight to `model`"""
+
+        if model in self.small_models:
+            return None
+
+        if len(user_message.split()) > self.max_input_words:
+            with self._lock:
+                self.stats['skipped_long_input'] += 1
+            return None
+
+        # Prefer a small model that is already loaded
+        residency = get_residency_manager()
+        for candidate in self.small_models:
+            if residency.is_resident(candidate):
+                return candidate
+        return self.small_models[0]
+
+    def accept(self, draft: Optional[str], user_message: str) -> bool:
+        """Score a draft and record whether the turn escalates"""
+
+        accepted, reason = self.scorer.check(draft, user_message)
+
+        with self._lock:
+            self.stats['drafts'] += 1
+            self.stats['accepted' if accepted else 'escalated'] += 1
+            if not accepted:
+                self.stats['reasons'][reason] = self.stats['reasons'].get(reason, 0) + 1
+
+        return accepted
+
+    def get_stats(self) -> Dict:
+        """Get draft acceptance and escalation counters"""
+
+        with self._lock:
+            drafts = self.stats['drafts']
+            return {
+                'agent': self.agent_name,
+                'small_models': self.small_models,
+                'drafts': drafts,
+                'accepted': self.stats['accepted'],
+                'escalated': self.stats['escalated'],
+                'escalation_rate': self.stats['escalated'] / drafts if drafts else 0,
+                'skipped_long_input': self.stats['skipped_long_input'],
+                'escalation_reasons': dict(self.stats['reasons'])
+            }
@@ -0,0 +1,197 @@
+"""
+Context Packer - Token-Budgeted Prompt Context
+Ranks memory snippets by value per token and fills the model's context window
+"""
+
+import re
+import math
+import time
+import threading
+from typing import Callable, Dict, Iterable, List
+
+# Ollama's num_ctx when the Modelfile does not set one
+DEFAULT_NUM_CTX = 2048
+
+# Rough characters per token for each model family's tokenizer
+CHARS_PER_TOKEN = {
+    'yi': 3.5,
+    'qwen': 3.6,
+    'llama': 3.8,
+    'llava': 3.8,
+    'mistral': 3.6,
+    'mathstral': 3.6,
+    'gemma': 4.0,
+    'phi': 3.5,
+    'deepseek': 3.4
+}
+DEFAULT_CHARS_PER_TOKEN = 3.6
+
+# Seconds before a failed /api/show lookup is tried again
+NUM_CTX_RETRY_SECONDS = 60
+
+_num_ctx = {}            # model -> num_ctx from /api/show
+_num_ctx_pending = set()
+_num_ctx_retry_at = {}   # model -> time a failed lookup may be retried
+_num_ctx_lock = threading.Lock()
+
+def model_family(model: str) -> str:
+    match = re.match(r'[a-z]+', (model or '').lower())
+    return match.group(0) if match else ''
+
+def estimate_tokens(text: str, model: str = None) -> int:
+    """Estimate the token count of text for a model"""
+
+    if not text:
+        return 0
+    ratio = CHARS_PER_TOKEN.get(model_family(model), DEFAULT_CHARS_PER_TOKEN)
+    return math.ceil(len(text) / ratio)
+
+def get_num_ctx(model: str) -> int:
+    """Context window for a model, looked up from its Modelfile in the background
+
+    Prompts are built on the generation engine loop, so the first call for a
+    model returns DEFAULT_NUM_CTX instead of blocking on /api/show.
+    """
+
+    if model in _num_ctx:
+        return _num_ctx[model]
+
+    with _num_ctx_lock:
+        if model not in _num_ctx_pending and time.time() >= _num_ctx_retry_at.get(model, 0):
+            _num_ctx_pending.add(model)
+            threading.Thread(target=_fetch_num_ctx, args=(model,), daemon=True).start()
+
+    return DEFAULT_NUM_CTX
+
+def _fetch_num_ctx(model: str):
+    from agents.backends import get_backend_pool
+
+    try:
+        details = get_backend_pool().client_for(model).show(model)
+        match = re.search(r'^num_ctx\s+(\d+)', details.get('parameters') or '', re.MULTILINE)
+        _num_ctx[model] = int(match.group(1)) if match else DEFAULT_NUM_CTX
+    except Exception as e:
+        print(f"Could not read num_ctx for {model}: {e}")
+        # Let a call after the retry delay try again once Ollama is reachable
+        with _num_ctx_lock:
+            _num_ctx_retry_at[model] = time.time() + NUM_CTX_RETRY_SECONDS
+    finally:
+        with _num_ctx_lock:
+            _num_ctx_pending.discard(model)
+
+class Snippet:
+    """A candidate piece of prompt context"""
+
+    __slots__ = ('kind', 'text', 'value', 'order', 'tokens')
+
+    def __init__(self, kind: str, text: str, value: float, order: int = 0):
+        self.kind = kind
+        self.text = text
+        self.value = value
+        self.order = order
+        self.tokens = 0
+
+def recent_turn_snippets(turns: List, render: Callable, kind: str = 'recent', decay: float = 0.85) -> List[Snippet]:
+    """Snippets for conversation turns (oldest first); value decays with age"""
+
+    snippets = []
+    for age, turn in enumerate(reversed(turns)):
+        text = render(turn)
+        if text:
+            snippets.append(Snippet(kind, text, decay ** age, order=len(turns) - age))
+    return snippets
+
+def scored_snippets(items: Iterable, render: Callable, score: Callable, kind: str) -> List[Snippet]:
+    """Snippets for scored items (memories, preferences) in their given order"""
+
+    snippets = []
+    for order, item in enumerate(items):
+        text = render(item)
+        if text:
+            snippets.append(Snippet(kind, text, score(item), order=order))
+    return snippets
+
+class ContextPacker:
+    """Greedy knapsack of context snippets into a token budget
+
+    The budget is the model's num_ctx (or a configured `budget_tokens`) minus
+    the fixed prompt and the tokens reserved for the response.
+    """
+
+    def __init__(self, budget_tokens: int = None, reserve_tokens: int = 256):
+        self.budget_tokens = budget_tokens
+        self.reserve_tokens = reserve_tokens
+
+        self.stats = {
+            'packs': 0,
+            'truncated_packs': 0,
+            'snippets_offered': 0,
+            'snippets_packed': 0,
+            'tokens_offered': 0,
+            'tokens_packed': 0
+        }
+
+    @classmethod
+    def from_config(cls, packing_config: Dict = None) -> 'ContextPacker':
+        """Build a packer from an agent's `context_packing` config section"""
+
+        packing_config = packing_config or {}
+
+        return cls(
+            budget_tokens=packing_config.get('budget_tokens'),
+            reserve_tokens=packing_config.get('reserve_tokens', 256)
+        )
+
+    def available_tokens(self, model: str, fixed_text: str, options: Dict = None) -> int:
+        """Tokens left for context after the fixed prompt and the response reserve"""
+
+        options = options or {}
+        window = self.budget_tokens or options.get('num_ctx') or get_num_ctx(model)
+        reserve = options.get('num_predict') or options.get('max_tokens') or self.reserve_tokens
+
+        return max(0, window - reserve - estimate_tokens(fixed_text, model))
+
+    def pack(self, model: str, fixed_text: str, snippets: List[Snippet], options: Dict = None) -> Dict[str, List[str]]:
+        """Choose the snippets with the most value per token that fit the budget
+
+        Returns the chosen snippet texts per kind, in their original order.
+        """
+
+        budget = self.available_tokens(model, fixed_text, options)
+
+        for snippet in snippets:
+            snippet.tokens = max(1, estimate_tokens(snippet.text, model))
+
+        ranked = sorted(snippets, key=lambda s: s.value / s.tokens, reverse=True)
+
+        chosen, used = [], 0
+        for snippet in ranked:
+            if used + snippet.tokens <= budget:
+                chosen.append(snippet)
+                used += snippet.tokens
+
+        packed = {}
+        for snippet in sorted(chosen, key=lambda s: s.order):
+            packed.setdefault(snippet.kind, []).append(snippet.text)
+
+        self.stats['packs'] += 1
+        self.stats['snippets_offered'] += len(snippets)
+        self.stats['snippets_packed'] += len(chosen)
+        self.stats['tokens_offered'] += sum(s.tokens for s in snippets)
+        self.stats['tokens_packed'] += used
+        if len(chosen) < len(snippets):
+            self.stats['truncated_packs'] += 1
+
+        return packed
+
+    def get_stats(self) -> Dict:
+        """Get packing and truncation counters"""
+
+        packs = self.stats['packs']
+        offered = self.stats['snippets_offered']
+
+        return {
+            **self.stats,
+            'truncation_rate': self.stats['truncated_packs'] / packs if packs else 0,
+            'snippet_drop_rate': 1 - self.stats['snippets_packed'] / offered if offered else 0
+        }
@@ -5,10 +5,22 @@ Advanced multi-agent platform with Ollama integration
 
 import os
 import yaml
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, List, Optional
-import requests
+from typing import Dict, Iterator, List, Optional
 import json
+import concurrent.futures
+from agents.generation import get_generation_engine
+from agents.cache import CompletionCache
+from agents.semantic_cache import SemanticCache
+from agents.sessions import SessionStore
+from agents.context_packer import ContextPacker, Snippet, recent_turn_snippets, scored_snippets
+from agents.cascade import ModelCascade, DEFAULT_SMALL_MODELS
+from agents.topk_memory import TopKMemories
+from agents.vector_memory import get_vector_memory
+from agents.scheduler import QueueFullError
+from agents.memory_backend import AGENTS_PATH, agent_data_path, get_memory_backend
 
 class AgentCore:
     """Base class for all AI agents"""
@@ -16,7 +28,7 @@ class AgentCore:
     def __init__(self, agent_name: str, config_path: str = None):
         self.agent_name = agent_name
         self.config = self.load_config(config_path)
-        self.ollama_url = "http://localhost:11434"
+        self.engine = get_generation_engine()
         self.memory_system = None
         self.emotion_engine = None
         
@@ -26,7 +38,7 @@ class AgentCore:
     def load_config(self, config_path: str = None) -> Dict:
         """Load agent configuration"""
         if not config_path:
-            config_path = f"/workspaces/codespaces-flask/agents/{self.agent_name}/config.yaml"
+            config_path = os.path.join(AGENTS_PATH, self.agent_name, 'config.yaml')
         
         try:
             with open(config_path, 'r') as f:
@@ -48,88 +60,341 @@ class AgentCore:
             },
             'memory': {
                 'short_term_limit': 50,
-                'long_term_limit': 1000
+                'long_term_limit': 1000,
+                'max_resident_users': 1000
             },
             'learning': {
                 'enabled': True,
                 'feedback_learning': True
+            },
+            'cache': {
+                'enabled': False,
+                'ttl_seconds': 600,
+                'max_entries': 1000,
+                'shared_url': None
+            },
+            'residency': {
+                'prefer_resident': False
+            },
+            'cascade': {
+                'enabled': False,
+                'small_models': list(DEFAULT_SMALL_MODELS),
+                'max_input_words': 40,
+                'min_words': 3
+            },
+            'context_packing': {
+                'budget_tokens': None,
+                'reserve_tokens': 256
+            },
+            'sessions': {
+                'enabled': False,
+                'ttl_seconds': 1800,
+                'max_sessions': 1000,
+                'max_turns': 20
+            },
+            'resilience': {
+                'hedge': False,
+                'hedge_min_delay': 0.5,
+                'hedge_default_delay': 8.0
+            },
+            'semantic_cache': {
+                'enabled': False,
+                'embedding_model': 'nomic-embed-text:latest',
+                'threshold': 0.92,
+                'max_entries': 2000,
+                'ttl_seconds': 3600
+            },
+            'vector_memory': {
+                'enabled': False,
+                'embedding_model': 'nomic-embed-text:latest',
+                'top_k': 5,
+                'min_score': 0.3,
+                'ivf_threshold': 20000,
+                'nprobe': 8,
+                'max_resident_users': 64
             }
         }
     
     def initialize_systems(self):
         """Initialize core agent systems"""
         # Memory System
-        self.memory_system = MemorySystem(self.agent_name)
+        memory_config = self.config.get('memory', {})
+        self.memory_system = MemorySystem(
+            self.agent_name,
+            short_term_limit=memory_config.get('short_term_limit', 50),
+            max_users=memory_config.get('max_resident_users', 1000)
+        )
         
         # Emotion Engine
         self.emotion_engine = EmotionEngine(self.agent_name)
         
         # Performance Analytics
         self.analytics = PerformanceAnalytics(self.agent_name)
+        
+        # Completion cache (per-agent opt-in via config)
+        self.completion_cache = CompletionCache.from_config(self.config.get('cache'))
+        self.semantic_cache = SemanticCache.from_config(self.config.get('semantic_cache'))
+        self.sessions = SessionStore.from_config(self.config.get('sessions'))
+        self.context_packer = ContextPacker.from_config(self.config.get('context_packing'))
+        self.cascade = ModelCascade.from_config(self.agent_name, self.config.get('cascade'), self.emotion_engine)
+        self.vector_memory = get_vector_memory(self.config.get('vector_memory'), self.memory_system.memory_path)
     
-    def generate_response(self, prompt: str, context: Dict = None, model: str = None) -> str:
+    def generate_response(self, prompt: str, context: Dict = None, model: str = None, plan: str = None) -> str:
         """Generate response using Ollama"""
+        return self.submit_response(prompt, context, model, plan).result()
+    
+    def submit_response(self, prompt: str, context: Dict = None, model: str = None,
+                        plan: str = None) -> concurrent.futures.Future:
+        """Submit a generation to the engine without blocking the caller"""
+        return self.engine.run(self.generate_response_async(prompt, context, model, plan))
+    
+    async def generate_response_async(self, prompt: str, context: Dict = None, model: str = None,
+                                      plan: str = None, session_key: tuple = None) -> str:
+        """Generate response on the generation engine loop (raises QueueFullError when busy)
+        
+        With a `session_key` and sessions enabled, follow-up turns continue from
+        the Ollama context of the previous turn instead of resending the full prompt.
+        """
         
         if not model:
             model = self.config['models']['primary']
         
         try:
             # Build enhanced prompt with context
-            enhanced_prompt = self.build_contextual_prompt(prompt, context)
+            full_prompt = self.build_contextual_prompt(prompt, context, model)
+            options = self.config.get('personality', {})
+            turn = self.begin_session_turn(session_key, model, prompt, context)
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": enhanced_prompt,
-                    "stream": False,
-                    "options": self.config.get('personality', {})
-                },
-                timeout=30
+            if self.completion_cache and not turn['continued']:
+                cached = await self.completion_cache.get_async(model, full_prompt, options)
+                if cached is not None:
+                    return cached
+            
+            # Identical concurrent requests (common openers) share one call;
+            # a failing or slow model is rerouted to the fallback model
+            result = await self.engine.generate_resilient_async(
+                model,
+                turn['prompt'] or full_prompt,
+                options=options,
+                timeout=30,
+                plan=plan,
+                fallback_model=self.config['models'].get('fallback'),
+                fallback_prompt=full_prompt,
+                **self.resilience_options(),
+                **turn['extra']
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '').strip()
-            else:
-                return self.fallback_response()
-                
+            response = result.get('response', '').strip()
+            self.end_session_turn(session_key, turn, model, result)
+            
+            # Only cache full-prompt answers that came from the requested model
+            if self.completion_cache and response and not turn['continued'] and result.get('model', model) == model:
+                await self.completion_cache.set_async(model, full_prompt, options, response)
+            
+            return response
+            
+        except QueueFullError:
+            raise
         except Exception as e:
             print(f"Error generating response: {e}")
+            if self.sessions and session_key:
+                self.sessions.invalidate(session_key)
             return self.fallback_response()
     
-    def build_contextual_prompt(self, prompt: str, context: Dict = None) -> str:
+    def generate_response_stream(self, prompt: str, context: Dict = None, model: str = None,
+                                 plan: str = None, session_key: tuple = None, on_done=None) -> Iterator[str]:
+        """Generate response using Ollama, yielding text tokens as they arrive
+        
+        `on_done` is called with Ollama's final chunk, so callers can tell a
+        complete generation from one cut off mid-stream.
+        """
+        
+        if not model:
+            model = self.config['models']['primary']
+        
+        full_prompt = self.build_contextual_prompt(prompt, context, model)
+        turn = self.begin_session_turn(session_key, model, prompt, context)
+        emitted = False
+        
+        try:
+            for chunk in self.engine.stream_resilient(
+                model,
+                turn['prompt'] or full_prompt,
+                options=self.config.get('personality', {}),
+                timeout=30,
+                plan=plan,
+                fallback_model=self.config['models'].get('fallback'),
+                fallback_prompt=full_prompt,
+                **turn['extra']
+            ):
+                if chunk.get('done'):
+                    self.end_session_turn(session_key, turn, model, chunk)
+                    if on_done:
+                        on_done(chunk)
+                
+                token = chunk.get('response', '')
+                if token:
+                    # Match generate_response, which strips leading whitespace
+                    if not emitted:
+                        token = token.lstrip()
+                        if not token:
+                            continue
+                    emitted = True
+                    yield token
+                
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            if self.sessions and session_key:
+                self.sessions.invalidate(session_key)
+            if not emitted:
+                yield self.fallback_response()
+    
+    def begin_session_turn(self, session_key: tuple, model: str, prompt: str, context: Dict = None) -> Dict:
+        """Look up the conversation session for a turn
+        
+        Returns the follow-up prompt and KV context to send when the session can
+        be continued, or an empty turn when a full prompt is needed.
+        """
+        
+        context = context or {}
+        fingerprint = (model, context.get('mood'), context.get('relationship_level'))
+        session_context = self.sessions.get(session_key, fingerprint) if self.sessions and session_key else None
+        
+        if not session_context:
+            return {'fingerprint': fingerprint, 'continued': False, 'prompt': None, 'extra': {}}
+        
+        return {
+            'fingerprint': fingerprint,
+            'continued': True,
+            'prompt': self.build_followup_prompt(prompt, context),
+            'extra': {'context': session_context}
+        }
+    
+    def end_session_turn(self, session_key: tuple, turn: Dict, model: str, result: Dict):
+        """Store the context Ollama returned, or drop the session if another model answered"""
+        
+        if not self.sessions or not session_key:
+            return
+        
+        if result.get('model', model) == model:
+            self.sessions.update(session_key, turn['fingerprint'], result.get('context'), turn['continued'])
+        else:
+            self.sessions.invalidate(session_key)
+    
+    def resilience_options(self) -> Dict:
+        """Hedging settings from the `resilience` config section"""
+        
+        resilience = self.config.get('resilience') or {}
+        
+        return {
+            'hedge': resilience.get('hedge', False),
+            'hedge_min_delay': resilience.get('hedge_min_delay', 0.5),
+            'hedge_default_delay': resilience.get('hedge_default_delay', 8.0)
+        }
+    
+    def build_contextual_prompt(self, prompt: str, context: Dict = None, model: str = None) -> str:
         """Build contextual prompt with agent personality and memory"""
         
         base_personality = f"You are {self.agent_name}, a specialized AI agent."
         
         if context:
-            memory_context = context.get('memory', [])
+            model = model or self.config['models']['primary']
             emotional_context = context.get('emotion', 'neutral')
             
-            enhanced_prompt = f"{base_personality}\n\nContext: {memory_context}\nEmotion: {emotional_context}\n\nUser: {prompt}\n\nResponse:"
+            fixed_prompt = f"{base_personality}\n\nContext:\n\nEmotion: {emotional_context}\n\nUser: {prompt}\n\nResponse:"
+            packed = self.context_packer.pack(
+                model,
+                fixed_prompt,
+                self.context_snippets(context),
+                self.config.get('personality', {})
+            )
+            memory_context = '\n'.join(packed.get('memory', []) + packed.get('preference', []) + packed.get('recent', []))
+            
+            enhanced_prompt = f"{base_personality}\n\nContext:\n{memory_context}\nEmotion: {emotional_context}\n\nUser: {prompt}\n\nResponse:"
         else:
             enhanced_prompt = f"{base_personality}\n\nUser: {prompt}\n\nResponse:"
         
         return enhanced_prompt
     
+    def context_snippets(self, context: Dict) -> List[Snippet]:
+        """Candidate context snippets: memories, preferences and recent turns"""
+        
+        memory = context.get('memory') or []
+        if isinstance(memory, str):
+            memory = [memory]
+        
+        preferences = context.get('user_preferences') or {}
+        
+        def render_turn(entry):
+            content = entry.get('content', entry) if isinstance(entry, dict) else entry
+            if not isinstance(content, dict):
+                return str(content)
+            return f"User: {content.get('user_input', '')}\nYou: {content.get('response', '')}"
+        
+        return (
+            scored_snippets(memory, str, lambda m: 1.0, 'memory') +
+            scored_snippets(preferences.items(), lambda kv: f"Preference {kv[0]}: {kv[1]}", lambda kv: 0.6, 'preference') +
+            recent_turn_snippets(context.get('recent_interactions') or [], render_turn)
+        )
+    
+    def build_followup_prompt(self, prompt: str, context: Dict = None) -> str:
+        """Build the prompt for a turn that continues an Ollama context"""
+        
+        emotional_context = (context or {}).get('emotion', 'neutral')
+        
+        return f"\n\nEmotion: {emotional_context}\n\nUser: {prompt}\n\nResponse:"
+    
     def fallback_response(self) -> str:
         """Fallback response when AI generation fails"""
         return "I'm having some technical difficulties right now. Let me try again in a moment."
 
+class UserMemory:
+    """Short-term ring buffer and running aggregates for one user"""
+    
+    __slots__ = ('recent', 'interactions')
+    
+    def __init__(self, short_term_limit: int):
+        self.recent = deque(maxlen=short_term_limit)
+        self.interactions = 0
+
 class MemorySystem:
     """Advanced memory management for agents"""
     
-    def __init__(self, agent_name: str):
+    def __init__(self, agent_name: str, short_term_limit: int = 50, max_users: int = 1000):
         self.agent_name = agent_name
-        self.memory_path = f"/workspaces/codespaces-flask/agents/{agent_name}/memory/data"
+        self.memory_path = agent_data_path(agent_name, 'memory', 'data')
         os.makedirs(self.memory_path, exist_ok=True)
+        self.backend = get_memory_backend(self.memory_path)
+        
+        self.short_term_limit = short_term_limit
+        self.max_users = max_users
         
         # Memory types
-        self.short_term = []  # Recent interactions
-        self.long_term = {}   # Important memories
+        self.short_term = OrderedDict()  # user_id -> UserMemory, least recently active first
+        self.long_term = {}   # user_id -> TopKMemories of important memories
         self.episodic = {}    # Specific episodes/conversations
         self.semantic = {}    # General knowledge/facts
+        
+        self._lock = threading.Lock()
+        self.evicted_users = 0
+    
+    def _user_memory(self, user_id: str) -> UserMemory:
+        """Get or create a user's memory and mark it most recently used (lock held)"""
+        
+        user_memory = self.short_term.get(user_id)
+        if user_memory is None:
+            user_memory = self.short_term[user_id] = UserMemory(self.short_term_limit)
+            
+            # Bound resident users; evicted users start over with an empty buffer
+            while len(self.short_term) > self.max_users:
+                self.short_term.popitem(last=False)
+                self.evicted_users += 1
+        else:
+            self.short_term.move_to_end(user_id)
+        
+        return user_memory
     
     def store_interaction(self, user_id: str, interaction: Dict):
         """Store user interaction in memory"""
@@ -141,8 +406,11 @@ class MemorySystem:
             'importance_score': self.calculate_importance(interaction)
         }
         
-        # Store in short-term memory
-        self.short_term.append(memory_entry)
+        # Store in the user's short-term ring buffer
+        with self._lock:
+            user_memory = self._user_memory(user_id)
+            user_memory.recent.append(memory_entry)
+            user_memory.interactions += 1
         
         # Move to long-term if important
         if memory_entry['importance_score'] > 0.7:
@@ -165,8 +433,10 @@ class MemorySystem:
     def get_context(self, user_id: str, limit: int = 10) -> Dict:
         """Get conversation context for user"""
         
-        user_memories = [m for m in self.short_term if m.get('user_id') == user_id]
-        recent_memories = sorted(user_memories, key=lambda x: x['timestamp'])[-limit:]
+        with self._lock:
+            user_memory = self.short_term.get(user_id)
+            # Entries are appended in time order, so the newest are at the end
+            recent_memories = list(user_memory.recent)[-limit:] if user_memory else []
         
         return {
             'recent_interactions': recent_memories,
@@ -174,28 +444,36 @@ class MemorySystem:
             'relationship_level': self.calculate_relationship_level(user_id)
         }
     
-    def store_long_term_memory(self, user_id: str, memory: Dict):
-        """Store important memory in long-term storage"""
+    def get_user_preferences(self, user_id: str) -> Dict:
+        """Stated user preferences (none are extracted from conversations yet)"""
+        return {}
+    
+    def calculate_relationship_level(self, user_id: str) -> int:
+        """Relationship level (0-10) from interaction count and important memories"""
         
-        if user_id not in self.long_term:
-            self.long_term[user_id] = []
+        with self._lock:
+            user_memory = self.short_term.get(user_id)
+            interactions = user_memory.interactions if user_memory else 0
         
-        self.long_term[user_id].append(memory)
+        important = len(self.long_term.get(user_id, ()))
+        
+        return min(10, interactions // 10 + important // 5)
+    
+    def store_long_term_memory(self, user_id: str, memory: Dict):
+        """Store important memory in long-term storage"""
         
-        # Limit long-term memory size
-        if len(self.long_term[user_id]) > 100:
-            # Keep most important memories
-            self.long_term[user_id].sort(key=lambda x: x['importance_score'], reverse=True)
-            self.long_term[user_id] = self.long_term[user_id][:100]
+        # Bounded min-heap keeps the 100 most important memories in O(log K)
+        with self._lock:
+            if user_id not in self.long_term:
+                self.long_term[user_id] = TopKMemories(100)
+            
+            self.long_term[user_id].insert(memory)
     
     def persist_memory(self, memory: Dict):
         """Persist memory to disk"""
         
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        memory_file = f"{self.memory_path}/memory_{date_str}.jsonl"
-        
-        with open(memory_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(memory) + '\n')
+        # Group-committed by the background writer, off the request path
+        self.backend.append('memory', memory['user_id'], memory)
 
 class EmotionEngine:
     """Emotional intelligence system for agents"""
@@ -0,0 +1,330 @@
+"""
+Embedding Service - Micro-Batched Ollama Embeddings
+Coalesces concurrent embed requests into batch calls and caches vectors on disk
+"""
+
+import os
+import json
+import mmap
+import fcntl
+import time
+import hashlib
+import threading
+import concurrent.futures
+from array import array
+from typing import Dict, List, Optional
+from agents.backends import get_backend_pool
+from agents.ollama_client import OllamaError
+from agents.process_local import ProcessLocal
+
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH',
+                                 os.path.join(os.path.dirname(__file__), 'data', 'embeddings'))
+
+DEFAULT_EMBEDDING_MODEL = 'nomic-embed-text:latest'
+
+def content_key(model: str, text: str) -> bytes:
+    """16-byte cache key for a (model, text) pair"""
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).digest()[:16]
+
+class VectorStore:
+    """Append-only float32 vector file with a parallel key file, read through mmap
+
+    <name>.f32 holds fixed-size rows of float32; <name>.keys holds one 16-byte
+    content hash per row in the same order. Writers hold an exclusive lock on
+    <name>.lock so worker processes can share the store; rows written by other
+    processes are picked up from the key file on a cache miss.
+    """
+
+    KEY_SIZE = 16
+
+    def __init__(self, path: str, name: str):
+        self.meta_file = os.path.join(path, f"{name}.json")
+        self.data_file = os.path.join(path, f"{name}.f32")
+        self.keys_file = os.path.join(path, f"{name}.keys")
+        self.lock_file = os.path.join(path, f"{name}.lock")
+
+        self.dim = None
+        self._rows = {}
+        self._known_rows = 0
+        self._map = None
+        self._mapped_rows = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._refresh()
+
+    def _read_dim(self) -> Optional[int]:
+        if self.dim is None and os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.dim = json.load(f)['dim']
+        return self.dim
+
+    def _refresh(self):
+        """Read keys appended since the last refresh (lock held)"""
+
+        if not self._read_dim() or not os.path.exists(self.keys_file):
+            return
+
+        # Only rows whose vector is fully written count
+        data_rows = os.path.getsize(self.data_file) // (self.dim * 4) if os.path.exists(self.data_file) else 0
+        key_rows = min(data_rows, os.path.getsize(self.keys_file) // self.KEY_SIZE)
+        if key_rows <= self._known_rows:
+            return
+
+        with open(self.keys_file, 'rb') as f:
+            f.seek(self._known_rows * self.KEY_SIZE)
+            keys = f.read((key_rows - self._known_rows) * self.KEY_SIZE)
+
+        for offset in range(0, len(keys), self.KEY_SIZE):
+            self._rows[keys[offset:offset + self.KEY_SIZE]] = self._known_rows
+            self._known_rows += 1
+
+    def _remap(self):
+        """Map the data file again after it has grown (lock held)"""
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+        size = os.path.getsize(self.data_file) if os.path.exists(self.data_file) else 0
+        if size:
+            with open(self.data_file, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_rows = size // (self.dim * 4)
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self._refresh()
+                row = self._rows.get(key)
+                if row is None:
+                    return None
+            if row >= self._mapped_rows:
+                self._remap()
+
+            row_size = self.dim * 4
+            vector = array('f')
+            vector.frombytes(self._map[row * row_size:(row + 1) * row_size])
+            return vector.tolist()
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]):
+        """Append vectors for keys not already stored"""
+
+        with self._lock, open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self._read_dim() is None and vectors:
+                    self.dim = len(vectors[0])
+                    with open(self.meta_file, 'w', encoding='utf-8') as f:
+                        json.dump({'dim': self.dim}, f)
+
+                self._refresh()
+                new = [(k, v) for k, v in zip(keys, vectors) if k not in self._rows and len(v) == self.dim]
+                if not new:
+                    return
+
+                # Drop any partial tail left by an interrupted writer
+                with open(self.data_file, 'ab') as data, open(self.keys_file, 'ab') as key_file:
+                    data.truncate(self._known_rows * self.dim * 4)
+                    key_file.truncate(self._known_rows * self.KEY_SIZE)
+
+                    for _, vector in new:
+                        data.write(array('f', vector).tobytes())
+                    data.flush()
+                    for key, _ in new:
+                        key_file.write(key)
+
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+                self._mapped_rows = 0
+
+class EmbeddingService:
+    """Embeds texts for one model, batching concurrent requests into single Ollama calls
+
+    Callers on any thread get a Future per text. A batcher thread collects
+    pending texts until `max_batch` are queued or `max_wait` seconds pass,
+    then sends them in one /api/embed request.
+    """
+
+    def __init__(self, model: str = DEFAULT_EMBEDDING_MODEL, max_batch: int = 32, max_wait: float = 0.01,
+                 cache_path: str = EMBEDDING_CACHE_PATH, timeout: float = 30):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        slug = ''.join(c if c.isalnum() else '_' for c in model)
+        self.store = VectorStore(cache_path, slug) if cache_path else None
+
+        self._pending = []           # (key, text, future)
+        self._in_flight = {}         # key -> future, so duplicates share one slot
+        self._cond = threading.Condition()
+        self._batcher = None
+        self._batch_endpoint = True  # older Ollama only has /api/embeddings
+
+        self.stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'coalesced': 0,
+            'batches': 0,
+            'batched_texts': 0,
+            'errors': 0
+        }
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in order; cached vectors are served from disk, the rest in batches"""
+
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def submit(self, text: str) -> concurrent.futures.Future:
+        """Queue a text for embedding and return a Future for its vector"""
+
+        key = content_key(self.model, text)
+        cached = self.store.get(key) if self.store is not None else None
+
+        with self._cond:
+            self.stats['requests'] += 1
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                future = concurrent.futures.Future()
+                future.set_result(cached)
+                return future
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+
+            future = self._in_flight[key] = concurrent.futures.Future()
+            self._pending.append((key, text, future))
+            self._ensure_batcher()
+            self._cond.notify()
+
+        return future
+
+    def _ensure_batcher(self):
+        if self._batcher is None or not self._batcher.is_alive():
+            self._batcher = threading.Thread(target=self._batch_loop, name='embedding-batcher', daemon=True)
+            self._batcher.start()
+
+    def _batch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                # Give concurrent callers a moment to join the batch
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        keys = [key for key, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+
+        try:
+            vectors = self._call(texts)
+            if len(vectors) != len(texts):
+                raise OllamaError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            with self._cond:
+                self.stats['errors'] += 1
+            for key, _, future in batch:
+                future.set_exception(e)
+            self._finish(keys)
+            return
+
+        with self._cond:
+            self.stats['batches'] += 1
+            self.stats['batched_texts'] += len(texts)
+
+        if self.store is not None:
+            try:
+                self.store.put_many(keys, vectors)
+            except OSError as e:
+                print(f"Embedding cache write error: {e}")
+
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+        self._finish(keys)
+
+    def _call(self, texts: List[str]) -> List[List[float]]:
+        client = get_backend_pool().client_for(self.model)
+
+        if self._batch_endpoint:
+            try:
+                return client.embed(self.model, texts, timeout=self.timeout)
+            except OllamaError as e:
+                if e.status_code != 404:
+                    raise
+                self._batch_endpoint = False
+
+        return [client.embeddings(self.model, text, timeout=self.timeout) for text in texts]
+
+    def _finish(self, keys: List[bytes]):
+        with self._cond:
+            for key in keys:
+                self._in_flight.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        """Get cache and batching counters"""
+
+        with self._cond:
+            stats = dict(self.stats)
+        batches = stats['batches']
+
+        return {
+            **stats,
+            'model': self.model,
+            'cache_hit_rate': stats['cache_hits'] / stats['requests'] if stats['requests'] else 0,
+            'avg_batch_size': stats['batched_texts'] / batches if batches else 0,
+            'cached_vectors': len(self.store) if self.store is not None else 0
+        }
+
+# model -> EmbeddingService; batcher threads do not survive a fork
+_services = ProcessLocal(dict)
+_services_lock = threading.Lock()
+
+def get_embedding_service(model: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingService:
+    """Get the process-wide embedding service for a model"""
+
+    services = _services.get()
+    with _services_lock:
+        service = services.get(model)
+        if service is None:
+            service = services[model] = EmbeddingService(model)
+
+    return service
+
+def embed_many(texts: List[str], model: str = DEFAULT_EMBEDDING_MODEL) -> List[List[float]]:
+    """Embed texts with the shared service for `model`"""
+    return get_embedding_service(model).embed_many(texts)
+
+def get_embedding_stats() -> List[Dict]:
+    """Counters for every embedding service in this process"""
+    return [service.get_stats() for service in list((_services.peek() or {}).values())]
@@ -0,0 +1,433 @@
+"""
+Generation Engine - Asyncio Scheduling for Ollama Calls
+Bounded per-model concurrency with an awaitable submission API
+"""
+
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Dict, Iterator
+from agents.backends import get_backend_pool
+from agents.process_local import ProcessLocal
+from agents.singleflight import SingleFlight, make_generation_key
+from agents.scheduler import PriorityScheduler, QueueFullError
+from agents.resilience import CircuitBreakerRegistry
+from agents.residency import get_residency_manager
+
+# Concurrent generations allowed per model; larger models get fewer slots
+DEFAULT_MODEL_CONCURRENCY = {
+    'phi3:14b': 1,
+    'yi:6b': 2,
+    'mistral:7b': 2,
+    'qwen2.5:7b': 2,
+    'mathstral:7b': 2,
+    'deepseek-coder:6.7b': 2,
+    'llava:7b': 2,
+    'llama3.2:3b': 4,
+    'gemma2:2b': 4
+}
+
+# Generations admitted at once per Ollama host when no total capacity is configured
+DEFAULT_ADMISSION_PER_HOST = 8
+
+class GenerationEngine:
+    """Asyncio generation service running on a dedicated event loop thread"""
+
+    def __init__(self, model_concurrency: Dict[str, int] = None, default_concurrency: int = 2,
+                 max_workers: int = 32, admission_capacity: int = None, slot_timeout: float = 60):
+        self.model_concurrency = dict(DEFAULT_MODEL_CONCURRENCY)
+        self.model_concurrency.update(model_concurrency or {})
+        self.default_concurrency = default_concurrency
+        self.max_workers = max_workers
+        self.admission_capacity = admission_capacity
+        # Longest a blocking stream() waits for admission or a model slot
+        self.slot_timeout = slot_timeout
+
+        self.loop = None
+        self._thread = None
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._semaphores = {}
+        self.singleflight = SingleFlight()
+        self.scheduler = PriorityScheduler(self._admission_capacity())
+        self.breakers = CircuitBreakerRegistry()
+
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'in_flight': {},
+            'waiting': {},
+            'rerouted': 0,
+            'fallbacks': 0,
+            'hedged': 0,
+            'hedge_wins': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> 'GenerationEngine':
+        """Build an engine from GENERATION_ADMISSION_CAPACITY (total slots; unset = per host)"""
+
+        capacity = os.getenv('GENERATION_ADMISSION_CAPACITY')
+        return cls(admission_capacity=int(capacity) if capacity else None)
+
+    def _admission_capacity(self) -> int:
+        """Admission slots: the configured total, else DEFAULT_ADMISSION_PER_HOST per Ollama host"""
+
+        if self.admission_capacity:
+            return self.admission_capacity
+        # Like the per-model limits in _acquire, capacity grows with the pool
+        return DEFAULT_ADMISSION_PER_HOST * max(1, len(get_backend_pool().backends))
+
+    def start(self):
+        """Start the event loop thread if it is not already running"""
+
+        with self._start_lock:
+            if self.loop and self.loop.is_running():
+                return
+
+            self.loop = asyncio.new_event_loop()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='ollama-gen'
+            )
+            self.loop.set_default_executor(self._executor)
+            self._semaphores = {}
+            self.singleflight = SingleFlight()
+            self.scheduler = PriorityScheduler(self._admission_capacity())
+
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                self.loop.call_soon(ready.set)
+                self.loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name='generation-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def stop(self):
+        """Stop the event loop thread and its executor"""
+
+        with self._start_lock:
+            if self.loop and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join(timeout=5)
+            if self._executor:
+                self._executor.shutdown(wait=False)
+            self.loop = None
+
+    def run(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the engine loop from any thread"""
+
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+               plan: str = None, **extra) -> concurrent.futures.Future:
+        """Submit a generation and get a Future for the Ollama result"""
+        return self.run(self.generate_async(model, prompt, options, timeout, plan, **extra))
+
+    def generate(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+                 plan: str = None, **extra) -> Dict:
+        """Blocking wrapper around submit()"""
+
+        self._check_blocking_call()
+        return self.submit(model, prompt, options, timeout, plan, **extra).result()
+
+    async def generate_async(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+                             plan: str = None, **extra) -> Dict:
+        """Generate on the engine loop after plan admission and a free slot on the model
+
+        Raises QueueFullError when the plan's admission queue is full.
+        """
+
+        self.stats['submitted'] += 1
+        extra = self._with_residency(model, extra)
+
+        breaker = self.breakers.get(model)
+        recorded = False
+
+        try:
+            async with self.scheduler.slot(plan or 'free'), self._model_slot(model):
+                start = time.monotonic()
+                try:
+                    with get_backend_pool().acquire(model) as backend:
+                        get_residency_manager().record_placement(model, backend.url)
+                        result = await self.loop.run_in_executor(
+                            None,
+                            partial(backend.client.generate, model, prompt, options=options,
+                                    timeout=timeout, **extra)
+                        )
+                except Exception:
+                    self.stats['failed'] += 1
+                    recorded = True
+                    breaker.record_failure()
+                    raise
+
+            recorded = True
+            breaker.record_success(time.monotonic() - start)
+        finally:
+            # Rejected, timed out waiting for a slot, or cancelled
+            if not recorded:
+                breaker.release_probe()
+
+        self.stats['completed'] += 1
+        return result
+
+    async def generate_shared_async(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+                                    plan: str = None, **extra) -> Dict:
+        """Like generate_async, but identical in-flight requests share one upstream call"""
+
+        key = make_generation_key(model, prompt, {**(options or {}), **extra})
+        return await self.singleflight.do(
+            key,
+            lambda: self.generate_async(model, prompt, options, timeout, plan, **extra)
+        )
+
+    async def generate_resilient_async(self, model: str, prompt: str, options: Dict = None,
+                                       timeout: float = 30, plan: str = None, fallback_model: str = None,
+                                       hedge: bool = False, hedge_min_delay: float = 0.5,
+                                       hedge_default_delay: float = 8.0, shared: bool = True,
+                                       fallback_prompt: str = None, **extra) -> Dict:
+        """Generate with `model`, falling back to `fallback_model` when it is failing or slow
+
+        While the model's circuit breaker is open the request goes straight to
+        the fallback. Otherwise a failure retries once on the fallback, and with
+        `hedge` the fallback is also started once the primary has run past its
+        p95 latency; whichever answers first wins.
+
+        A KV `context` in `extra` belongs to `model`, so the fallback never gets
+        it and is sent `fallback_prompt` (the full prompt) instead.
+        """
+
+        generate = self.generate_shared_async if shared else self.generate_async
+
+        if not fallback_model or fallback_model == model:
+            return await generate(model, prompt, options, timeout, plan, **extra)
+
+        fallback_extra = {k: v for k, v in extra.items() if k != 'context'}
+
+        def attempt(target):
+            if target == model:
+                coro = generate(model, prompt, options, timeout, plan, **extra)
+            else:
+                coro = generate(target, fallback_prompt or prompt, options, timeout, plan, **fallback_extra)
+            return asyncio.ensure_future(coro)
+
+        if not self.breakers.get(model).allow():
+            self.stats['rerouted'] += 1
+            return await attempt(fallback_model)
+
+        primary = attempt(model)
+
+        if hedge:
+            delay = self.breakers.get(model).latency_percentile(0.95) or hedge_default_delay
+            done, _ = await asyncio.wait({primary}, timeout=max(hedge_min_delay, delay))
+
+            if not done:
+                self.stats['hedged'] += 1
+                backup = attempt(fallback_model)
+                winner = await self._first_success(primary, backup)
+                if winner is backup:
+                    self.stats['hedge_wins'] += 1
+                return winner.result()
+
+        try:
+            return await primary
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Generation with {model} failed, using {fallback_model}: {e}")
+            self.stats['fallbacks'] += 1
+            return await attempt(fallback_model)
+
+    async def _first_success(self, *tasks) -> asyncio.Future:
+        """Wait for the first task to succeed; raise the last error if all fail
+
+        Losing tasks are left to finish so their model slots and breaker
+        outcomes stay accurate; their results are discarded.
+        """
+
+        pending = set(tasks)
+        error = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(lambda t: t.cancelled() or t.exception())
+                    return task
+                error = task.exception()
+
+        raise error
+
+    def stream_resilient(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+                         plan: str = None, fallback_model: str = None, fallback_prompt: str = None,
+                         **extra) -> Iterator[Dict]:
+        """Stream from `model`, or from `fallback_model` if its breaker is open or it fails before the first token"""
+
+        fallback_extra = {k: v for k, v in extra.items() if k != 'context'}
+
+        if fallback_model and fallback_model != model and not self.breakers.get(model).allow():
+            self.stats['rerouted'] += 1
+            yield from self.stream(fallback_model, fallback_prompt or prompt, options, timeout, plan,
+                                   **fallback_extra)
+            return
+
+        emitted = False
+        try:
+            for chunk in self.stream(model, prompt, options, timeout, plan, **extra):
+                emitted = True
+                yield chunk
+        except QueueFullError:
+            raise
+        except Exception as e:
+            if emitted or not fallback_model or fallback_model == model:
+                raise
+            print(f"Streaming with {model} failed, using {fallback_model}: {e}")
+            self.stats['fallbacks'] += 1
+            yield from self.stream(fallback_model, fallback_prompt or prompt, options, timeout, plan,
+                                   **fallback_extra)
+
+    def stream(self, model: str, prompt: str, options: Dict = None, timeout: float = 30,
+               plan: str = None, **extra) -> Iterator[Dict]:
+        """Stream a generation in the caller's thread while holding admission and model slots"""
+
+        self.start()
+        self._check_blocking_call()
+        extra = self._with_residency(model, extra)
+        # A full or stalled admission queue raises QueueFullError; a saturated
+        # model raises TimeoutError, which stream_resilient treats as a failure
+        breaker = self.breakers.get(model)
+        recorded = False
+        try:
+            plan = self._wait(self.scheduler.acquire(plan or 'free', self.slot_timeout))
+            start = time.monotonic()
+            try:
+                semaphore = self._wait(asyncio.wait_for(self._acquire(model), self.slot_timeout))
+                try:
+                    with get_backend_pool().acquire(model) as backend:
+                        get_residency_manager().record_placement(model, backend.url)
+                        yield from backend.client.generate_stream(model, prompt, options=options,
+                                                                  timeout=timeout, **extra)
+                    recorded = True
+                    breaker.record_success()
+                except GeneratorExit:
+                    raise
+                except Exception:
+                    recorded = True
+                    breaker.record_failure()
+                    raise
+                finally:
+                    self.loop.call_soon_threadsafe(self._release, model, semaphore)
+            finally:
+                self.loop.call_soon_threadsafe(self.scheduler.release, time.monotonic() - start)
+        finally:
+            # Abandoned by the caller, rejected, or timed out waiting for a slot
+            if not recorded:
+                breaker.release_probe()
+
+    def _check_blocking_call(self):
+        """Refuse to block the engine loop thread on its own work"""
+
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Blocking generation call made on the engine loop thread; await the async API instead")
+
+    def _wait(self, coro):
+        """Run a coroutine on the engine loop and block the calling thread for its result
+
+        The coroutine bounds its own wait (slot_timeout); the extra grace here
+        only keeps a caller from hanging on a stalled loop.
+        """
+
+        future = self.run(coro)
+        try:
+            return future.result(self.slot_timeout + 5)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _with_residency(self, model: str, extra: Dict) -> Dict:
+        """Record the request for residency ranking and apply its keep_alive
+
+        Which host holds the model is recorded once a backend is picked.
+        """
+
+        residency = get_residency_manager()
+        residency.record_request(model)
+
+        keep_alive = residency.keep_alive_for(model)
+        if keep_alive is not None and 'keep_alive' not in extra:
+            extra = {**extra, 'keep_alive': keep_alive}
+
+        return extra
+
+    @asynccontextmanager
+    async def _model_slot(self, model: str):
+        """Hold one concurrency slot for a model"""
+
+        semaphore = await self._acquire(model)
+        try:
+            yield
+        finally:
+            self._release(model, semaphore)
+
+    async def _acquire(self, model: str) -> asyncio.Semaphore:
+        """Wait for a slot on the model's semaphore"""
+
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            # Per-model limits are per Ollama host
+            limit = self.model_concurrency.get(model, self.default_concurrency)
+            limit *= max(1, len(get_backend_pool().backends))
+            semaphore = self._semaphores[model] = asyncio.Semaphore(limit)
+
+        waiting = self.stats['waiting']
+        waiting[model] = waiting.get(model, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            waiting[model] -= 1
+
+        in_flight = self.stats['in_flight']
+        in_flight[model] = in_flight.get(model, 0) + 1
+        return semaphore
+
+    def _release(self, model: str, semaphore: asyncio.Semaphore):
+        """Release a model slot (must run on the engine loop)"""
+
+        self.stats['in_flight'][model] -= 1
+        semaphore.release()
+
+    def get_stats(self) -> Dict:
+        """Get engine queue and throughput statistics"""
+
+        return {
+            'submitted': self.stats['submitted'],
+            'completed': self.stats['completed'],
+            'failed': self.stats['failed'],
+            'in_flight': dict(self.stats['in_flight']),
+            'waiting': dict(self.stats['waiting']),
+            'model_concurrency': dict(self.model_concurrency),
+            'rerouted': self.stats['rerouted'],
+            'fallbacks': self.stats['fallbacks'],
+            'hedged': self.stats['hedged'],
+            'hedge_wins': self.stats['hedge_wins'],
+            'singleflight': self.singleflight.get_stats(),
+            'admission': self.scheduler.get_stats(),
+            'breakers': self.breakers.get_status()
+        }
+
+# Event loop threads do not survive a fork, so each worker builds its own
+_engine = ProcessLocal(GenerationEngine.from_env)
+
+def get_generation_engine() -> GenerationEngine:
+    """Get the process-wide generation engine"""
+    return _engine.get()
@@ -0,0 +1,254 @@
+"""
+JSONL Writer - Group-Commit Background Appends
+Moves memory and interaction log writes off the request path
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from agents.process_local import ProcessLocal
+
+class _FlushMarker:
+    """Queue entry that asks the writer to commit everything before it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+class JsonlWriter:
+    """Appends JSON lines from a bounded queue on a background thread
+
+    Records are serialized on the caller's thread (so later mutation of the
+    dict does not change what is written) and grouped per target file. A
+    group is committed when `batch_size` records are pending or the oldest
+    has waited `flush_interval` seconds. File handles stay open between
+    commits, up to `max_open_files`. When the queue is full the caller
+    writes the record itself rather than dropping it.
+
+    Besides plain file paths, records can target a sink: an object with
+    `prepare(record)` (run on the caller's thread) and
+    `write_batch(items, fsync)` (run on the writer thread).
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 256, flush_interval: float = 0.2,
+                 fsync: bool = False, max_open_files: int = 64, idle_close: float = 60):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_open_files = max_open_files
+        self.idle_close = idle_close
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._handles = OrderedDict()   # path -> (file, last used)
+        self._file_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='jsonl-writer', daemon=True)
+        self._thread.start()
+
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'commits': 0,
+            'fsyncs': 0,
+            'sync_fallbacks': 0,
+            'errors': 0,
+            'max_queue_depth': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> 'JsonlWriter':
+        """Build a writer from JSONL_WRITER_* environment variables"""
+
+        return cls(
+            max_queue=int(os.getenv('JSONL_WRITER_MAX_QUEUE', 10000)),
+            batch_size=int(os.getenv('JSONL_WRITER_BATCH_SIZE', 256)),
+            flush_interval=float(os.getenv('JSONL_WRITER_FLUSH_INTERVAL', 0.2)),
+            fsync=os.getenv('JSONL_WRITER_FSYNC', '').lower() in ('1', 'true', 'yes')
+        )
+
+    def append(self, path: str, record: Dict):
+        """Queue one record for appending to path"""
+        self._enqueue(path, json.dumps(record) + '\n')
+
+    def append_to(self, sink, record: Dict):
+        """Queue one record for a sink (see class docstring)"""
+        self._enqueue(sink, sink.prepare(record))
+
+    def _enqueue(self, target, item):
+        if not self._closed:
+            try:
+                self._queue.put_nowait((target, item))
+                self.stats['enqueued'] += 1
+                self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self._queue.qsize())
+                return
+            except queue.Full:
+                self.stats['sync_fallbacks'] += 1
+
+        # Back-pressure (or shutdown): write on the caller's thread
+        self._commit({target: [item]})
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every record queued before this call is on disk"""
+
+        if self._closed or not self._thread.is_alive():
+            return True
+
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 10):
+        """Drain the queue and close all file handles"""
+
+        if self._closed:
+            return
+
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._close_handles()
+
+    def _run(self):
+        pending = {}
+        pending_count = 0
+        oldest = None
+
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.flush_interval - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout if timeout is not None else self.idle_close)
+            except queue.Empty:
+                item = False
+
+            if item is None or isinstance(item, _FlushMarker):
+                self._commit(pending)
+                pending, pending_count, oldest = {}, 0, None
+                if item is None:
+                    return
+                item.done.set()
+                continue
+
+            if item:
+                target, line = item
+                pending.setdefault(target, []).append(line)
+                pending_count += 1
+                if oldest is None:
+                    oldest = time.monotonic()
+
+            if pending_count >= self.batch_size or (oldest is not None and time.monotonic() - oldest >= self.flush_interval):
+                self._commit(pending)
+                pending, pending_count, oldest = {}, 0, None
+
+            if item is False:
+                self._close_idle_handles()
+
+    def _commit(self, pending: Dict):
+        """Write grouped lines, one write per file"""
+
+        if not pending:
+            return
+
+        with self._file_lock:
+            for path, lines in pending.items():
+                try:
+                    if not isinstance(path, str):
+                        path.write_batch(lines, self.fsync)
+                        self.stats['written'] += len(lines)
+                        continue
+
+                    handle = self._handle(path)
+                    handle.write(''.join(lines))
+                    handle.flush()
+                    if self.fsync:
+                        os.fsync(handle.fileno())
+                        self.stats['fsyncs'] += 1
+                    self.stats['written'] += len(lines)
+                except OSError as e:
+                    self.stats['errors'] += 1
+                    print(f"JSONL writer error for {path}: {e}")
+                    self._drop_handle(path)
+
+            self.stats['commits'] += 1
+
+    def _handle(self, path: str):
+        """Open (or reuse) an append handle (file lock held)"""
+
+        entry = self._handles.get(path)
+        if entry is not None:
+            self._handles.move_to_end(path)
+            self._handles[path] = (entry[0], time.monotonic())
+            return entry[0]
+
+        handle = open(path, 'a', encoding='utf-8')
+        self._handles[path] = (handle, time.monotonic())
+
+        while len(self._handles) > self.max_open_files:
+            _, (old, _) = self._handles.popitem(last=False)
+            old.close()
+
+        return handle
+
+    def _drop_handle(self, path: str):
+        entry = self._handles.pop(path, None)
+        if entry is not None:
+            try:
+                entry[0].close()
+            except OSError:
+                pass
+
+    def _close_idle_handles(self):
+        """Close handles unused for `idle_close` seconds (daily files roll over)"""
+
+        cutoff = time.monotonic() - self.idle_close
+        with self._file_lock:
+            for path in [p for p, (_, used) in self._handles.items() if used < cutoff]:
+                self._drop_handle(path)
+
+    def _close_handles(self):
+        with self._file_lock:
+            for path in list(self._handles):
+                self._drop_handle(path)
+
+    def get_stats(self) -> Dict:
+        """Get queue and commit counters"""
+
+        commits = self.stats['commits']
+
+        return {
+            **self.stats,
+            'queue_depth': self._queue.qsize(),
+            'open_files': len(self._handles),
+            'avg_records_per_commit': self.stats['written'] / commits if commits else 0
+        }
+
+# The writer thread does not survive a fork
+_writer = ProcessLocal(JsonlWriter.from_env)
+
+def get_jsonl_writer() -> JsonlWriter:
+    """Get the process-wide JSONL writer"""
+    return _writer.get()
+
+def append_jsonl(path: str, record: Dict):
+    """Append a record to a JSONL file through the shared writer"""
+    get_jsonl_writer().append(path, record)
+
+def flush_jsonl_writer(timeout: float = None) -> bool:
+    """Wait for queued records to reach disk (before reading a file back)"""
+
+    writer = _writer.peek()
+    return writer.flush(timeout) if writer else True
+
+def shutdown_jsonl_writer(timeout: float = 10):
+    """Drain and close this process's writer; safe to call more than once"""
+
+    writer = _writer.peek()
+    if writer:
+        writer.close(timeout)
+
+atexit.register(shutdown_jsonl_writer)
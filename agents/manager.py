@@ -6,10 +6,17 @@ Centralized management for all AI agents with Ollama integration
 import os
 import json
 import asyncio
+import concurrent.futures
 from datetime import datetime
-from typing import Dict, List, Optional
-import requests
+from typing import Dict, Iterator, List, Optional
 from agents.core import AgentCore, MemorySystem, EmotionEngine
+from agents.ollama_client import get_ollama_client
+from agents.backends import get_backend_pool
+from agents.generation import get_generation_engine
+from agents.residency import get_residency_manager
+from agents.embeddings import get_embedding_stats
+from agents.jsonl_writer import get_jsonl_writer
+from agents.vector_memory import get_vector_memory_stats
 
 class AgentManager:
     """Central management system for all AI agents"""
@@ -19,6 +26,10 @@ class AgentManager:
         self.ollama_models = self.discover_ollama_models()
         self.agent_registry = self.load_agent_registry()
         
+        # Warm the models most agents depend on without blocking startup
+        self.residency = get_residency_manager()
+        self.residency.preload_async(self.rank_models_for_preload())
+        
         # Performance monitoring
         self.system_metrics = {
             'total_interactions': 0,
@@ -30,13 +41,10 @@ class AgentManager:
     def discover_ollama_models(self) -> List[str]:
         """Discover available Ollama models"""
         
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            if response.status_code == 200:
-                models_data = response.json()
-                return [model['name'] for model in models_data.get('models', [])]
-            return []
-        except:
+        models = get_backend_pool().list_models()
+        if models:
+            return models
+        else:
             # Fallback to known models from your list
             return [
                 'yi:6b', 'mathstral:7b', 'nomic-embed-text:latest', 
@@ -163,11 +171,31 @@ class AgentManager:
         return {
             'system_metrics': self.system_metrics,
             'available_models': self.ollama_models,
+            'ollama_metrics': get_ollama_client().get_metrics(),
+            'ollama_backends': get_backend_pool().get_status(),
+            'generation_engine': get_generation_engine().get_stats(),
+            'embeddings': get_embedding_stats(),
+            'jsonl_writer': get_jsonl_writer().get_stats(),
+            'vector_memory': get_vector_memory_stats(),
             'active_agents': len(self.active_agents),
             'agent_registry': list(self.agent_registry.keys()),
             'timestamp': datetime.now().isoformat()
         }
     
+    def rank_models_for_preload(self) -> List[str]:
+        """Rank models by observed traffic, then by how many agent roles use them"""
+        
+        role_counts = {}
+        for agent in self.agent_registry.values():
+            for model in agent.get('models', {}).values():
+                role_counts[model] = role_counts.get(model, 0) + 1
+        
+        observed = self.residency.hottest()
+        by_roles = sorted(role_counts, key=lambda m: role_counts[m], reverse=True)
+        
+        ranked = dict.fromkeys(observed + by_roles)
+        return [m for m in ranked if m in self.ollama_models or not self.ollama_models]
+    
     def optimize_model_allocation(self) -> Dict:
         """Optimize model allocation across agents"""
         
@@ -184,10 +212,17 @@ class AgentManager:
             if usage > 3:  # Threshold for high usage
                 recommendations[model] = "Consider load balancing"
         
+        # Models requested often but not resident keep paying cold starts
+        residency = self.residency.get_stats()
+        for model, cold_starts in residency['cold_starts'].items():
+            if cold_starts > 3 and model not in residency['resident_models']:
+                recommendations[model] = "Frequent cold starts; consider pinning or raising the memory budget"
+        
         return {
             'model_usage': model_usage,
             'recommendations': recommendations,
-            'available_alternatives': [m for m in self.ollama_models if m not in model_usage]
+            'available_alternatives': [m for m in self.ollama_models if m not in model_usage],
+            'residency': residency
         }
 
 class EnhancedAgent(AgentCore):
@@ -224,14 +259,31 @@ class EnhancedAgent(AgentCore):
     
     def generate_contextual_response(self, user_input: str, user_id: str, context: Dict = None) -> Dict:
         """Generate contextual response with all agent capabilities"""
+        return self.submit_contextual_response(user_input, user_id, context).result()
+    
+    def submit_contextual_response(self, user_input: str, user_id: str, context: Dict = None) -> concurrent.futures.Future:
+        """Submit a contextual response to the generation engine without blocking the caller"""
+        return self.engine.run(self.generate_contextual_response_async(user_input, user_id, context))
+    
+    async def generate_contextual_response_async(self, user_input: str, user_id: str, context: Dict = None) -> Dict:
+        """Generate contextual response on the generation engine loop"""
         
         start_time = datetime.now()
         
+        # Memory and emotion work runs off the engine loop so in-flight generations keep moving
+        loop = asyncio.get_running_loop()
+        
         # Get user context from memory
-        memory_context = self.memory_system.get_context(user_id) if hasattr(self, 'memory_system') else {}
+        memory_context = (await loop.run_in_executor(None, self.memory_system.get_context, user_id)
+                          if hasattr(self, 'memory_system') else {})
+        
+        # Long-term memories most relevant to this message
+        if self.vector_memory:
+            memory_context['memory'] = await loop.run_in_executor(None, self.recall_memories, user_id, user_input)
         
         # Analyze user emotion
-        user_emotion = self.emotion_engine.analyze_emotion(user_input) if hasattr(self, 'emotion_engine') else {}
+        user_emotion = (await loop.run_in_executor(None, self.emotion_engine.analyze_emotion, user_input)
+                        if hasattr(self, 'emotion_engine') else {})
         
         # Select appropriate model based on context
         selected_model = self.select_model_for_context(user_emotion, context)
@@ -244,8 +296,36 @@ class EnhancedAgent(AgentCore):
             'capabilities': self.capabilities
         }
         
+        # Serve paraphrases of earlier messages from the semantic cache
+        scope = (self.agent_name, selected_model)
+        response = None
+        
+        if self.semantic_cache:
+            response = await loop.run_in_executor(None, self.semantic_cache.lookup, scope, user_input)
+            
+            # The model never saw this exchange, so its KV context is now behind
+            if response is not None and self.sessions:
+                self.sessions.invalidate((user_id, self.agent_name))
+        
+        # Short turns are drafted on a small model and escalated only if the draft fails
+        draft_model = self.cascade.draft_model(selected_model, user_input) if self.cascade and response is None else None
+        if draft_model:
+            draft = await self.generate_response_async(user_input, enhanced_context, draft_model,
+                                                       plan=(context or {}).get('plan'))
+            if self.cascade.accept(None if draft == self.fallback_response() else draft, user_input):
+                response, selected_model = draft, draft_model
+                # The session's model never saw this exchange
+                if self.sessions:
+                    self.sessions.invalidate((user_id, self.agent_name))
+        
         # Generate response
-        response = self.generate_response(user_input, enhanced_context, selected_model)
+        if response is None:
+            response = await self.generate_response_async(user_input, enhanced_context, selected_model,
+                                                          plan=(context or {}).get('plan'),
+                                                          session_key=(user_id, self.agent_name))
+            
+            if self.semantic_cache and response != self.fallback_response():
+                await loop.run_in_executor(None, self.semantic_cache.store, scope, user_input, response)
         
         # Post-process response
         processed_response = self.post_process_response(response, user_emotion, context)
@@ -261,7 +341,8 @@ class EnhancedAgent(AgentCore):
         }
         
         if hasattr(self, 'memory_system'):
-            self.memory_system.store_interaction(user_id, interaction_data)
+            await loop.run_in_executor(None, self.memory_system.store_interaction, user_id, interaction_data)
+        self.remember_exchange(user_id, user_input, processed_response)
         
         return {
             'response': processed_response,
@@ -271,9 +352,114 @@ class EnhancedAgent(AgentCore):
             'agent_status': self.get_agent_status()
         }
     
+    def generate_contextual_response_stream(self, user_input: str, user_id: str, context: Dict = None) -> Iterator[Dict]:
+        """Stream a contextual response as token events followed by a final 'done' event"""
+        
+        start_time = datetime.now()
+        
+        memory_context = self.memory_system.get_context(user_id) if hasattr(self, 'memory_system') else {}
+        if self.vector_memory:
+            memory_context['memory'] = self.recall_memories(user_id, user_input)
+        user_emotion = self.emotion_engine.analyze_emotion(user_input) if hasattr(self, 'emotion_engine') else {}
+        selected_model = self.select_model_for_context(user_emotion, context)
+        
+        enhanced_context = {
+            **memory_context,
+            'user_emotion': user_emotion,
+            'agent_personality': self.agent_config.get('personality', ''),
+            'capabilities': self.capabilities
+        }
+        
+        tokens = []
+        
+        # A paraphrase of an earlier message is answered from the semantic cache as one token
+        scope = (self.agent_name, selected_model)
+        cached = self.semantic_cache.lookup(scope, user_input) if self.semantic_cache else None
+        if cached is not None:
+            tokens.append(cached)
+            yield {'type': 'token', 'token': cached}
+            # The model never saw this exchange, so its KV context is now behind
+            if self.sessions:
+                self.sessions.invalidate((user_id, self.agent_name))
+        
+        # A small-model draft is scored before anything is shown, then sent as one token
+        draft_model = self.cascade.draft_model(selected_model, user_input) if self.cascade and not tokens else None
+        if draft_model:
+            draft = self.submit_response(user_input, enhanced_context, draft_model,
+                                         plan=(context or {}).get('plan')).result()
+            if self.cascade.accept(None if draft == self.fallback_response() else draft, user_input):
+                selected_model = draft_model
+                tokens.append(draft)
+                yield {'type': 'token', 'token': draft}
+                if self.sessions:
+                    self.sessions.invalidate((user_id, self.agent_name))
+        
+        if not tokens:
+            finished = []
+            for token in self.generate_response_stream(user_input, enhanced_context, selected_model,
+                                                       plan=(context or {}).get('plan'),
+                                                       session_key=(user_id, self.agent_name),
+                                                       on_done=finished.append):
+                tokens.append(token)
+                yield {'type': 'token', 'token': token}
+            
+            # Only complete generations are cached; a cut-off stream has no final chunk
+            streamed = ''.join(tokens).strip()
+            if self.semantic_cache and finished and streamed != self.fallback_response():
+                self.semantic_cache.store(scope, user_input, streamed)
+        
+        # Post-processing runs on the tail: anything appended is streamed as a
+        # last token, and the final event always carries the processed text.
+        response = ''.join(tokens).strip()
+        processed_response = self.post_process_response(response, user_emotion, context)
+        if processed_response.startswith(response) and len(processed_response) > len(response):
+            yield {'type': 'token', 'token': processed_response[len(response):]}
+        
+        interaction_data = {
+            'user_input': user_input,
+            'response': processed_response,
+            'model_used': selected_model,
+            'user_emotion': user_emotion,
+            'timestamp': datetime.now().isoformat(),
+            'response_time': (datetime.now() - start_time).total_seconds()
+        }
+        
+        if hasattr(self, 'memory_system'):
+            self.memory_system.store_interaction(user_id, interaction_data)
+        self.remember_exchange(user_id, user_input, processed_response)
+        
+        yield {
+            'type': 'done',
+            'response': processed_response,
+            'emotion': user_emotion.get('primary_emotion', 'neutral'),
+            'model_used': selected_model,
+            'response_time': interaction_data['response_time']
+        }
+    
+    def recall_memories(self, user_id: str, user_input: str) -> List[str]:
+        """Past exchanges most relevant to the current message, best first"""
+        return [memory['content'] for memory in self.vector_memory.recall(user_id, user_input)]
+    
+    def remember_exchange(self, user_id: str, user_input: str, response: str):
+        """Index an exchange for later recall (embedded in the background)"""
+        
+        if self.vector_memory and response != self.fallback_response():
+            self.vector_memory.remember(user_id, f"User: {user_input}\nYou: {response}")
+    
     def select_model_for_context(self, user_emotion: Dict, context: Dict = None) -> str:
         """Select appropriate model based on context and emotion"""
         
+        model = self._select_model_for_emotion(user_emotion, context)
+        
+        # Avoid a cold load when an equivalent model is already resident
+        if self.config.get('residency', {}).get('prefer_resident'):
+            model = get_residency_manager().prefer_resident(model)
+        
+        return model
+    
+    def _select_model_for_emotion(self, user_emotion: Dict, context: Dict = None) -> str:
+        """Map the user's emotion to one of the agent's models"""
+        
         models = self.agent_config.get('models', {'primary': 'yi:6b'})
         
         # For romantic agents, select model based on mood
@@ -338,7 +524,12 @@ class EnhancedAgent(AgentCore):
             'active_since': getattr(self, 'initialized_at', datetime.now().isoformat()),
             'capabilities': self.capabilities,
             'current_model': self.config.get('models', {}).get('primary', 'yi:6b'),
-            'emotional_state': getattr(self.emotion_engine, 'emotional_state', {}) if hasattr(self, 'emotion_engine') else {}
+            'emotional_state': getattr(self.emotion_engine, 'emotional_state', {}) if hasattr(self, 'emotion_engine') else {},
+            'completion_cache': self.completion_cache.get_stats() if self.completion_cache else None,
+            'semantic_cache': self.semantic_cache.get_stats() if self.semantic_cache else None,
+            'sessions': self.sessions.get_stats() if self.sessions else None,
+            'context_packing': self.context_packer.get_stats(),
+            'cascade': self.cascade.get_stats() if self.cascade else None
         }
 
 class AdvancedEmotionEngine(EmotionEngine):
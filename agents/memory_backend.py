@@ -0,0 +1,375 @@
+"""
+Memory Backends - Pluggable Storage for Agent Memory
+Per-user record logs and profiles on loose files or in SQLite (WAL)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from agents.jsonl_writer import append_jsonl, get_jsonl_writer
+from agents.process_local import ProcessLocal
+
+AGENTS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Agent data (memory, training data, feeds) lives under agents/<agent>/ unless moved
+AGENT_DATA_PATH = os.getenv('AGENT_DATA_PATH', AGENTS_PATH)
+
+# Record kinds: Seraphina interactions, MemorySystem entries, feedback for training
+RECORD_KINDS = ('interaction', 'memory', 'learning')
+
+def agent_data_path(agent_name: str, *parts: str) -> str:
+    """Data directory for an agent, e.g. agent_data_path('seraphina', 'memory', 'data')"""
+    return os.path.join(AGENT_DATA_PATH, agent_name, *parts)
+
+def record_timestamp(record: Dict) -> float:
+    """Epoch seconds of a record's 'timestamp', an ISO string or epoch number (now if missing or invalid)"""
+
+    from agents.seraphina.memory.interaction_log import to_epoch
+
+    try:
+        timestamp = to_epoch(record.get('timestamp') if isinstance(record, dict) else None)
+    except (AttributeError, TypeError, ValueError):
+        timestamp = None
+    return time.time() if timestamp is None else timestamp
+
+class MemoryBackend(ABC):
+    """Where agent memory records and user profiles are persisted
+
+    Records are JSON objects of a kind (see RECORD_KINDS) belonging to one
+    user, ordered by timestamp. `append` queues a record on the background
+    JSONL writer. `log(kind, user_id)` returns a per-user log with the
+    InteractionLog interface: append, prepare/write_batch, count, tail(n),
+    scan(start, end) and expire_before(cutoff).
+    """
+
+    name = None
+
+    @abstractmethod
+    def append(self, kind: str, user_id: str, record: Dict):
+        """Queue a record for the user's log of `kind`"""
+
+    @abstractmethod
+    def log(self, kind: str, user_id: str):
+        """The user's log of `kind` records"""
+
+    @abstractmethod
+    def user_ids(self, kind: str) -> List[str]:
+        """Users with a log of `kind` records"""
+
+    @abstractmethod
+    def profile_store(self):
+        """The ProfileStore that persists this backend's user profiles"""
+
+    def get_stats(self) -> Dict:
+        return {'backend': self.name}
+
+class FileBackend(MemoryBackend):
+    """Loose files under an agent's memory directory (the original layout)
+
+    Interactions go to per-user segmented logs in interactions/, MemorySystem
+    entries to memory_<date>.jsonl, learning data to <user>_learning.jsonl
+    and profiles to <user>_profile.json. Only interactions can be read back
+    per user.
+    """
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        from agents.seraphina.memory.interaction_log import InteractionLogStore
+
+        self.path = path
+        self.interaction_logs = InteractionLogStore(os.path.join(path, 'interactions'))
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, kind: str, user_id: str, record: Dict):
+        if kind == 'interaction':
+            get_jsonl_writer().append_to(self.log(kind, user_id), record)
+        elif kind == 'memory':
+            append_jsonl(os.path.join(self.path, f"memory_{datetime.now():%Y-%m-%d}.jsonl"), record)
+        elif kind == 'learning':
+            append_jsonl(os.path.join(self.path, f"{user_id}_learning.jsonl"), record)
+        else:
+            raise ValueError(f"Unknown record kind {kind}")
+
+    def log(self, kind: str, user_id: str):
+        if kind != 'interaction':
+            raise ValueError(f"The file backend keeps no per-user log of {kind} records")
+        return self.interaction_logs.log(user_id)
+
+    def user_ids(self, kind: str) -> List[str]:
+        return self.interaction_logs.user_ids() if kind == 'interaction' else []
+
+    def profile_store(self):
+        from agents.seraphina.memory.profile_store import get_profile_store
+        return get_profile_store(self.path)
+
+class SQLiteLog:
+    """One user's records of one kind in a SQLiteBackend (InteractionLog interface)"""
+
+    def __init__(self, backend: 'SQLiteBackend', kind: str, user_id: str):
+        self.backend = backend
+        self.kind = kind
+        self.user_id = user_id
+
+    def __repr__(self):
+        return f"SQLiteLog({self.kind!r}, {self.user_id!r})"
+
+    def prepare(self, record: Dict) -> Tuple:
+        return self.backend.prepare((self.kind, self.user_id, record))
+
+    def append(self, record: Dict):
+        self.write_batch([self.prepare(record)])
+
+    def write_batch(self, items: List[Tuple], fsync: bool = False):
+        self.backend.write_batch(items, fsync)
+
+    def count(self) -> int:
+        return self.backend.count(self.kind, self.user_id)
+
+    def expired_count(self) -> int:
+        return self.backend.expired_count(self.kind, self.user_id)
+
+    def tail(self, n: int) -> List[Dict]:
+        """Last n records, oldest first"""
+        return self.backend.tail(self.kind, self.user_id, n)
+
+    def scan(self, start=None, end=None) -> Iterator[Dict]:
+        """Records with start <= timestamp < end, oldest first (either bound may be None)"""
+        return self.backend.scan(self.kind, self.user_id, start, end)
+
+    def expire_before(self, cutoff) -> int:
+        return self.backend.expire_before(self.kind, self.user_id, cutoff)
+
+class SQLiteBackend(MemoryBackend):
+    """All records and profiles in one SQLite database in WAL mode
+
+    Reads never block the writer, so gunicorn workers share the database
+    instead of racing on files. Records are indexed on (user_id, kind,
+    timestamp) for per-user tails and time ranges, and can be queried
+    across users. Appends are group-committed: the backend is a JSONL
+    writer sink, so each writer batch is one transaction. Statements are
+    constant SQL with bound parameters, compiled once per connection by
+    sqlite3's statement cache. Each thread has its own connection.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS records_user_time ON records (user_id, kind, timestamp);
+        CREATE INDEX IF NOT EXISTS records_kind_time ON records (kind, timestamp);
+        CREATE TABLE IF NOT EXISTS expired (
+            kind TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS profiles (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS imported_sources (
+            source TEXT PRIMARY KEY,
+            records INTEGER NOT NULL,
+            imported_at REAL NOT NULL
+        );
+    """
+
+    INSERT_RECORD = "INSERT INTO records (kind, user_id, timestamp, data) VALUES (?, ?, ?, ?)"
+    UPSERT_PROFILE = ("INSERT INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?) "
+                      "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at")
+
+    def __init__(self, db_file: str, busy_timeout: float = 30):
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        self.stats = {
+            'transactions': 0,
+            'records_written': 0,
+            'profiles_written': 0,
+            'write_errors': 0
+        }
+
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.connection().executescript(self.SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (connections are not shared across a fork)"""
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit mode: write batches open their own transactions
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def transaction(self, statements: List[Tuple[str, List]]):
+        """Run (sql, rows) executemany pairs in one write transaction"""
+
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            self.stats['write_errors'] += 1
+            raise
+        self.stats['transactions'] += 1
+
+    # Records
+
+    def append(self, kind: str, user_id: str, record: Dict):
+        if kind not in RECORD_KINDS:
+            raise ValueError(f"Unknown record kind {kind}")
+        get_jsonl_writer().append_to(self, (kind, user_id, record))
+
+    def prepare(self, entry: Tuple) -> Tuple:
+        """Serialize a (kind, user_id, record) entry on the caller's thread (JSONL writer sink hook)"""
+
+        kind, user_id, record = entry
+        return kind, str(user_id), record_timestamp(record), json.dumps(record)
+
+    def write_batch(self, items: List[Tuple], fsync: bool = False):
+        """Insert prepared records in one transaction (JSONL writer sink hook)"""
+
+        self.transaction([(self.INSERT_RECORD, items)])
+        self.stats['records_written'] += len(items)
+
+    def log(self, kind: str, user_id: str) -> SQLiteLog:
+        return SQLiteLog(self, kind, str(user_id))
+
+    def user_ids(self, kind: str) -> List[str]:
+        rows = self.connection().execute("SELECT DISTINCT user_id FROM records WHERE kind = ?", (kind,))
+        return [row[0] for row in rows]
+
+    def count(self, kind: str, user_id: str) -> int:
+        live = self.connection().execute(
+            "SELECT COUNT(*) FROM records WHERE user_id = ? AND kind = ?", (user_id, kind)
+        ).fetchone()[0]
+        return live + self.expired_count(kind, user_id)
+
+    def expired_count(self, kind: str, user_id: str) -> int:
+        row = self.connection().execute(
+            "SELECT count FROM expired WHERE kind = ? AND user_id = ?", (kind, user_id)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def tail(self, kind: str, user_id: str, n: int) -> List[Dict]:
+        rows = self.connection().execute(
+            "SELECT data FROM records WHERE user_id = ? AND kind = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, kind, n)
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def scan(self, kind: str, user_id: str, start=None, end=None) -> Iterator[Dict]:
+        from agents.seraphina.memory.interaction_log import to_epoch
+
+        start, end = to_epoch(start), to_epoch(end)
+        rows = self.connection().execute(
+            "SELECT data FROM records WHERE user_id = ? AND kind = ? AND timestamp >= ? AND timestamp < ? "
+            "ORDER BY timestamp, id",
+            (user_id, kind, float('-inf') if start is None else start, float('inf') if end is None else end)
+        )
+        for row in rows:
+            yield json.loads(row[0])
+
+    def expire_before(self, kind: str, user_id: str, cutoff) -> int:
+        from agents.seraphina.memory.interaction_log import to_epoch
+
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            removed = conn.execute(
+                "DELETE FROM records WHERE user_id = ? AND kind = ? AND timestamp < ?",
+                (user_id, kind, to_epoch(cutoff))
+            ).rowcount
+            if removed:
+                conn.execute(
+                    "INSERT INTO expired (kind, user_id, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (kind, user_id) DO UPDATE SET count = count + excluded.count",
+                    (kind, user_id, removed)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return removed
+
+    # Profiles
+
+    def profile_store(self):
+        from agents.seraphina.memory.profile_store import get_profile_store
+        return get_profile_store(os.path.dirname(self.db_file), backend=self)
+
+    def load_profile(self, user_id: str) -> Optional[Dict]:
+        row = self.connection().execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_profiles(self, profiles: List[Tuple[str, str]]):
+        """Upsert serialized (user_id, json) profiles in one transaction"""
+
+        now = time.time()
+        self.transaction([(self.UPSERT_PROFILE, [(user_id, data, now) for user_id, data in profiles])])
+        self.stats['profiles_written'] += len(profiles)
+
+    # Migration bookkeeping
+
+    def imported(self, source: str) -> bool:
+        return self.connection().execute(
+            "SELECT 1 FROM imported_sources WHERE source = ?", (source,)
+        ).fetchone() is not None
+
+    def import_records(self, source: str, items: List[Tuple], profiles: List[Tuple[str, str]] = None):
+        """Insert prepared records (and profiles) from one source file, once"""
+
+        now = time.time()
+        self.transaction([
+            (self.INSERT_RECORD, items),
+            (self.UPSERT_PROFILE, [(user_id, data, now) for user_id, data in profiles or []]),
+            ("INSERT INTO imported_sources (source, records, imported_at) VALUES (?, ?, ?)",
+             [(source, len(items) + len(profiles or []), now)])
+        ])
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'backend': self.name, 'db_file': self.db_file}
+
+BACKENDS = {
+    'file': lambda path: FileBackend(path),
+    'sqlite': lambda path: SQLiteBackend(os.path.join(path, 'memory.db'))
+}
+
+# (name, path) -> MemoryBackend; log locks and connections are not shared across a fork
+_backends = ProcessLocal(dict)
+_backends_lock = threading.Lock()
+
+def get_memory_backend(path: str, name: str = None) -> MemoryBackend:
+    """Get the shared backend for a memory directory; MEMORY_BACKEND picks file (default) or sqlite"""
+
+    name = name or os.getenv('MEMORY_BACKEND', 'file')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown memory backend {name}")
+
+    backends = _backends.get()
+    with _backends_lock:
+        backend = backends.get((name, path))
+        if backend is None:
+            backend = backends[(name, path)] = BACKENDS[name](path)
+        return backend
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Memory Migration - JSONL Files to SQLite
+Imports an agent's file-backed memory directory into its SQLite backend
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import unquote
+
+from agents.memory_backend import AGENT_DATA_PATH, SQLiteBackend, agent_data_path, get_memory_backend
+
+DAILY_FILE = re.compile(r'^(?P<user_id>.+)_(?P<date>\d{4}-\d{2}-\d{2})\.jsonl$')
+MEMORY_FILE = re.compile(r'^memory_\d{4}-\d{2}-\d{2}\.jsonl$')
+LEARNING_FILE = re.compile(r'^(?P<user_id>.+)_learning\.jsonl$')
+PROFILE_FILE = re.compile(r'^(?P<user_id>.+)_profile\.json$')
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """Records of a JSONL file, skipping torn or corrupt lines"""
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+def find_sources(path: str) -> Iterator[Tuple[str, str, str]]:
+    """(source, kind, user_id) for every importable file or log in a memory directory
+
+    Kind is a record kind, or 'profile'. MemorySystem files hold many users,
+    so their user_id is None and each record's own user_id is used.
+    """
+
+    for name in sorted(os.listdir(path)):
+        source = os.path.join(path, name)
+        if not os.path.isfile(source):
+            continue
+        if MEMORY_FILE.match(name):
+            yield source, 'memory', None
+        elif LEARNING_FILE.match(name):
+            yield source, 'learning', LEARNING_FILE.match(name).group('user_id')
+        elif PROFILE_FILE.match(name):
+            # Profile file names quote the user id
+            yield source, 'profile', unquote(PROFILE_FILE.match(name).group('user_id'))
+        elif DAILY_FILE.match(name):
+            yield source, 'interaction', DAILY_FILE.match(name).group('user_id')
+
+    interactions = os.path.join(path, 'interactions')
+    if os.path.isdir(interactions):
+        from agents.seraphina.memory.interaction_log import InteractionLogStore
+
+        store = InteractionLogStore(interactions)
+        for user_id in sorted(store.user_ids()):
+            yield store.log(user_id).path, 'interaction', user_id
+
+def read_records(source: str) -> Iterator[Dict]:
+    """Records of a JSONL file or a segmented interaction log directory"""
+
+    if os.path.isdir(source):
+        from agents.seraphina.memory.interaction_log import InteractionLog
+        return InteractionLog(source).scan()
+    return read_jsonl(source)
+
+def import_source(backend: SQLiteBackend, source: str, kind: str, user_id: str) -> int:
+    """Import one source in one transaction; returns the records imported"""
+
+    if kind == 'profile':
+        with open(source, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        backend.import_records(source, [], [(user_id, json.dumps(profile))])
+        return 1
+
+    items = [backend.prepare((kind, user_id or record.get('user_id', 'unknown'), record))
+             for record in read_records(source)]
+    backend.import_records(source, items)
+    return len(items)
+
+def migrate(path: str, dry_run: bool = False) -> Dict[str, int]:
+    """Import a memory directory into <path>/memory.db; sources already imported are skipped"""
+
+    counts = {'interaction': 0, 'memory': 0, 'learning': 0, 'profile': 0, 'skipped_sources': 0, 'failed_sources': 0}
+    backend = None if dry_run else get_memory_backend(path, 'sqlite')
+
+    for source, kind, user_id in find_sources(path):
+        if backend is not None and backend.imported(source):
+            counts['skipped_sources'] += 1
+            continue
+
+        try:
+            if backend is None:
+                counts[kind] += 1 if kind == 'profile' else sum(1 for _ in read_records(source))
+            else:
+                counts[kind] += import_source(backend, source, kind, user_id)
+        except (OSError, ValueError) as e:
+            print(f"Could not import {source}: {e}")
+            counts['failed_sources'] += 1
+
+    return counts
+
+def memory_paths(agents: List[str] = None) -> List[str]:
+    """Memory directories of the given agents, or of every agent that has one"""
+
+    if not agents:
+        agents = sorted(name for name in os.listdir(AGENT_DATA_PATH)
+                        if os.path.isdir(agent_data_path(name, 'memory', 'data')))
+    return [agent_data_path(name, 'memory', 'data') for name in agents]
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Import JSONL agent memory into the SQLite memory backend')
+    parser.add_argument('--agent', action='append', help='agent to migrate (repeatable; default: every agent)')
+    parser.add_argument('--path', action='append', help='memory directory to migrate instead of an agent')
+    parser.add_argument('--dry-run', action='store_true', help='count records without writing')
+    args = parser.parse_args(argv)
+
+    paths = args.path or memory_paths(args.agent)
+    failed = 0
+    for path in paths:
+        if not os.path.isdir(path):
+            print(f"No memory directory at {path}")
+            failed += 1
+            continue
+        counts = migrate(path, args.dry_run)
+        failed += counts['failed_sources']
+        print(json.dumps({'path': path, **counts}))
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Ollama Client - Shared HTTP Access Layer
+Process-wide pooled, keep-alive client used by every generation path
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from agents.process_local import ProcessLocal
+
+DEFAULT_OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+
+class OllamaError(Exception):
+    """Raised when Ollama returns an error or cannot be reached"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class OllamaConnectionError(OllamaError):
+    """Raised when the Ollama host cannot be reached or the connection drops"""
+
+class OllamaClient:
+    """Thread-safe Ollama client with a bounded connection pool per host"""
+
+    def __init__(self, base_url: str = None, pool_connections: int = 4, pool_maxsize: int = 16,
+                 retries: int = 2, backoff_factor: float = 0.2,
+                 connect_timeout: float = 3.0, read_timeout: float = 30.0):
+        self.base_url = (base_url or DEFAULT_OLLAMA_URL).rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Retry only idempotent failures at the connection level; a generation
+        # that started streaming tokens is never replayed.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+            pool_block=True
+        )
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._metrics_lock = threading.Lock()
+        self.metrics = {}
+
+    def generate(self, model: str, prompt: str, options: Dict = None, timeout: float = None, **extra) -> Dict:
+        """Run a non-streaming /api/generate call and return the decoded body"""
+
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': False,
+            'options': options or {}
+        }
+        payload.update(extra)
+
+        return self._request('POST', '/api/generate', endpoint='generate', model=model,
+                             json=payload, timeout=timeout)
+
+    def generate_stream(self, model: str, prompt: str, options: Dict = None, timeout: float = None,
+                        **extra) -> Iterator[Dict]:
+        """Run a streaming /api/generate call, yielding each NDJSON chunk as it arrives"""
+
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': True,
+            'options': options or {}
+        }
+        payload.update(extra)
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                stream=True,
+                timeout=self._timeout(timeout)
+            ) as response:
+                if response.status_code != 200:
+                    raise OllamaError(f"/api/generate returned HTTP {response.status_code}: {response.text[:200]}")
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise OllamaError(chunk['error'])
+                    yield chunk
+                    if chunk.get('done'):
+                        break
+            ok = True
+        except requests.RequestException as e:
+            raise OllamaConnectionError(f"/api/generate stream failed: {e}") from e
+        finally:
+            self._record('generate_stream', model, time.perf_counter() - start, ok)
+
+    def embeddings(self, model: str, prompt: str, timeout: float = 10) -> List[float]:
+        """Embed a single text with /api/embeddings"""
+
+        result = self._request('POST', '/api/embeddings', endpoint='embeddings', model=model,
+                               json={'model': model, 'prompt': prompt}, timeout=timeout)
+        return result.get('embedding', [])
+
+    def embed(self, model: str, inputs: List[str], timeout: float = 30) -> List[List[float]]:
+        """Embed several texts in one /api/embed call"""
+
+        result = self._request('POST', '/api/embed', endpoint='embed', model=model,
+                               json={'model': model, 'input': inputs}, timeout=timeout)
+        return result.get('embeddings', [])
+
+    def tags(self, timeout: float = 5) -> List[Dict]:
+        """List models available on the server"""
+
+        result = self._request('GET', '/api/tags', endpoint='tags', timeout=timeout)
+        return result.get('models', [])
+
+    def show(self, model: str, timeout: float = 5) -> Dict:
+        """Get a model's Modelfile details (parameters, template, ...)"""
+        return self._request('POST', '/api/show', endpoint='show', model=model,
+                             json={'model': model}, timeout=timeout)
+
+    def ps(self, timeout: float = 5) -> List[Dict]:
+        """List models currently loaded in memory"""
+
+        result = self._request('GET', '/api/ps', endpoint='ps', timeout=timeout)
+        return result.get('models', [])
+
+    def load(self, model: str, keep_alive='30m', timeout: float = 120) -> Dict:
+        """Load a model into memory without generating (empty prompt)"""
+        return self.generate(model, '', timeout=timeout, keep_alive=keep_alive)
+
+    def unload(self, model: str, timeout: float = 30) -> Dict:
+        """Evict a model from memory"""
+        return self.generate(model, '', timeout=timeout, keep_alive=0)
+
+    def _request(self, method: str, path: str, endpoint: str, model: str = None,
+                 timeout: float = None, **kwargs) -> Dict:
+        """Issue a request through the pooled session and record metrics"""
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                timeout=self._timeout(timeout),
+                **kwargs
+            )
+            if response.status_code != 200:
+                raise OllamaError(f"{path} returned HTTP {response.status_code}: {response.text[:200]}",
+                                  status_code=response.status_code)
+            result = response.json()
+            ok = True
+            return result
+        except requests.RequestException as e:
+            raise OllamaConnectionError(f"{path} request failed: {e}") from e
+        finally:
+            self._record(endpoint, model, time.perf_counter() - start, ok)
+
+    def _timeout(self, timeout: float = None):
+        """Build a (connect, read) timeout tuple"""
+
+        if timeout is None:
+            return self.timeout
+        return (min(self.timeout[0], timeout), timeout)
+
+    def _record(self, endpoint: str, model: Optional[str], elapsed: float, ok: bool):
+        """Record per-call metrics keyed by endpoint and model"""
+
+        key = f"{endpoint}:{model}" if model else endpoint
+
+        with self._metrics_lock:
+            stats = self.metrics.setdefault(key, {
+                'calls': 0,
+                'errors': 0,
+                'total_time': 0.0,
+                'max_time': 0.0
+            })
+            stats['calls'] += 1
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+            if not ok:
+                stats['errors'] += 1
+
+    def get_metrics(self) -> Dict:
+        """Get per-endpoint call metrics"""
+
+        with self._metrics_lock:
+            return {
+                key: {
+                    **stats,
+                    'avg_time': stats['total_time'] / stats['calls'] if stats['calls'] else 0
+                }
+                for key, stats in self.metrics.items()
+            }
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+# Pooled sockets must not be shared across a gunicorn fork (preload_app),
+# so each worker process lazily builds its own client.
+_client = ProcessLocal(OllamaClient)
+
+def get_ollama_client() -> OllamaClient:
+    """Get the process-wide Ollama client"""
+    return _client.get()
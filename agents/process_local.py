@@ -0,0 +1,40 @@
+"""
+Process-Local Singletons
+Lazily built objects that each forked worker rebuilds for itself
+"""
+
+import os
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+class ProcessLocal(Generic[T]):
+    """An object built on first use in each process
+
+    Threads, event loops and pooled sockets do not survive a fork (gunicorn
+    preload_app), so a child calling get() builds its own instance instead of
+    sharing the parent's.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """This process's instance, building it if needed"""
+
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._value = self.factory()
+                    # Published last so a lock-free reader never sees a half-built value
+                    self._pid = os.getpid()
+
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """This process's instance, or None if it has not been built here"""
+        return self._value if self._pid == os.getpid() else None
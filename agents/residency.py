@@ -0,0 +1,288 @@
+"""
+Model Residency Manager
+Keeps the hottest Ollama models loaded and evicts cold ones under a memory budget
+"""
+
+import os
+import re
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List
+from agents.backends import get_backend_pool
+from agents.process_local import ProcessLocal
+
+# Models that can stand in for each other when one is already loaded
+EQUIVALENT_MODELS = [
+    ['gemma2:2b', 'llama3.2:3b'],
+    ['yi:6b', 'mistral:7b', 'qwen2.5:7b']
+]
+
+# Models that are never used for generation and need no residency
+NON_GENERATIVE_MODELS = ('nomic-embed-text', 'snowflake-arctic-embed')
+
+def estimate_model_size_gb(model: str) -> float:
+    """Estimate resident memory for a model from its parameter count (4-bit weights plus KV cache)"""
+
+    match = re.search(r'(\d+(?:\.\d+)?)b\b', model.lower())
+    params = float(match.group(1)) if match else 7.0
+    return round(params * 0.6 + 0.5, 1)
+
+class ModelResidencyManager:
+    """Track per-model request rates and manage which models Ollama keeps loaded
+
+    Residency is tracked per Ollama host and `memory_budget_gb` applies to
+    each host, so a model loading on one host only evicts cold models from
+    that host.
+    """
+
+    def __init__(self, memory_budget_gb: float = None, keep_alive: str = '30m',
+                 rate_window: float = 300, sync_interval: float = 30):
+        self.memory_budget_gb = memory_budget_gb or float(os.getenv('OLLAMA_MEMORY_BUDGET_GB', 16))
+        self.keep_alive = keep_alive
+        self.rate_window = rate_window
+        self.sync_interval = sync_interval
+
+        self.requests = {}        # model -> deque of request timestamps
+        self.total_requests = {}  # model -> lifetime request count
+        self.cold_starts = {}     # model -> requests that found the model unloaded
+        self.resident = {}        # host URL -> {model -> size in GB}
+        self.model_sizes = {}
+        self.pinned = set()
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+
+    def record_request(self, model: str):
+        """Record a generation request for the request-rate ranking"""
+
+        now = time.time()
+        self._maybe_sync(now)
+
+        with self._lock:
+            window = self.requests.setdefault(model, deque())
+            window.append(now)
+            self._trim(window, now)
+            self.total_requests[model] = self.total_requests.get(model, 0) + 1
+
+    def record_placement(self, model: str, host: str):
+        """Record that a request for `model` was sent to `host`, keeping that host within budget"""
+
+        with self._lock:
+            resident = self.resident.setdefault(host, {})
+            if model not in resident:
+                # Ollama loads the model on demand; this request pays for it
+                self.cold_starts[model] = self.cold_starts.get(model, 0) + 1
+                resident[model] = self._size(model)
+
+            to_evict = self._plan_evictions(host, protect=model)
+
+        if to_evict:
+            threading.Thread(target=self._unload, args=(host, to_evict), daemon=True).start()
+
+    def keep_alive_for(self, model: str):
+        """keep_alive to send with a request: hot and pinned models stay loaded longer"""
+
+        if model in self.pinned or model in self.hottest(len(self.resident_models()) or 1):
+            return self.keep_alive
+        return None
+
+    def request_rate(self, model: str) -> float:
+        """Requests per minute over the rate window"""
+
+        with self._lock:
+            window = self.requests.get(model)
+            if not window:
+                return 0.0
+            self._trim(window, time.time())
+            return len(window) * 60.0 / self.rate_window
+
+    def hottest(self, limit: int = None) -> List[str]:
+        """Models ordered by recent request rate, then lifetime requests"""
+
+        models = set(self.requests) | set(self.total_requests)
+        ranked = sorted(
+            models,
+            key=lambda m: (self.request_rate(m), self.total_requests.get(m, 0)),
+            reverse=True
+        )
+        return ranked[:limit] if limit else ranked
+
+    def preload(self, candidates: Iterable[str], pin: bool = False) -> List[str]:
+        """Load the given models (hottest first) until the memory budget is reached"""
+
+        # Skip preloading entirely when the server is unreachable
+        if not self.sync():
+            return []
+
+        loaded = []
+
+        for model in candidates:
+            if model.startswith(NON_GENERATIVE_MODELS) or self.is_resident(model):
+                continue
+
+            # The host that would serve the model, against its own budget
+            try:
+                backend = get_backend_pool().select(model)
+            except Exception as e:
+                print(f"Could not preload {model}: {e}")
+                continue
+
+            size = self._size(model)
+            with self._lock:
+                used = sum(self.resident.get(backend.url, {}).values())
+            if used + size > self.memory_budget_gb:
+                continue
+
+            try:
+                backend.client.load(model, keep_alive=self.keep_alive)
+            except Exception as e:
+                print(f"Could not preload {model}: {e}")
+                continue
+
+            with self._lock:
+                self.resident.setdefault(backend.url, {})[model] = size
+                if pin:
+                    self.pinned.add(model)
+            loaded.append(model)
+
+        return loaded
+
+    def preload_async(self, candidates: Iterable[str], pin: bool = False):
+        """Preload in the background so startup is not blocked on model loads"""
+
+        candidates = list(candidates)
+        threading.Thread(target=self.preload, args=(candidates, pin), daemon=True).start()
+
+    def is_resident(self, model: str) -> bool:
+        """Whether the model is loaded on any host"""
+        return any(model in resident for resident in list(self.resident.values()))
+
+    def resident_models(self) -> List[str]:
+        """Models loaded on at least one host"""
+
+        with self._lock:
+            return sorted({model for resident in self.resident.values() for model in resident})
+
+    def prefer_resident(self, model: str, allowed: Iterable[str] = None) -> str:
+        """Return a resident equivalent of `model` if `model` itself is cold"""
+
+        if self.is_resident(model):
+            return model
+
+        allowed = set(allowed) if allowed is not None else None
+
+        for group in EQUIVALENT_MODELS:
+            if model in group:
+                for candidate in group:
+                    if candidate != model and self.is_resident(candidate) and (allowed is None or candidate in allowed):
+                        return candidate
+
+        return model
+
+    def sync(self) -> bool:
+        """Refresh residency from /api/ps on every healthy backend
+
+        Hosts that cannot be reached keep their last known residency.
+        """
+
+        loaded = {}
+        for backend in get_backend_pool().backends:
+            if not backend.healthy:
+                continue
+            try:
+                loaded[backend.url] = backend.client.ps()
+            except Exception:
+                continue
+
+        if not loaded:
+            return False
+
+        with self._lock:
+            for host, entries in loaded.items():
+                resident = self.resident[host] = {}
+                for entry in entries:
+                    size = entry.get('size_vram') or entry.get('size')
+                    if size:
+                        self.model_sizes[entry['name']] = size / 1024 ** 3
+                    resident[entry['name']] = self._size(entry['name'])
+
+        return True
+
+    def _maybe_sync(self, now: float):
+        if now - self._last_sync >= self.sync_interval:
+            self._last_sync = now
+            threading.Thread(target=self.sync, daemon=True).start()
+
+    def _trim(self, window: deque, now: float):
+        while window and window[0] < now - self.rate_window:
+            window.popleft()
+
+    def _size(self, model: str) -> float:
+        return self.model_sizes.get(model) or estimate_model_size_gb(model)
+
+    def _plan_evictions(self, host: str, protect: str) -> List[str]:
+        """Pick cold models to unload from `host` until it fits the budget (lock held)"""
+
+        resident = self.resident.get(host, {})
+        used = sum(resident.values())
+        if used <= self.memory_budget_gb:
+            return []
+
+        now = time.time()
+        for window in self.requests.values():
+            self._trim(window, now)
+
+        candidates = sorted(
+            (m for m in resident if m != protect and m not in self.pinned),
+            key=lambda m: (len(self.requests.get(m, ())), self.total_requests.get(m, 0))
+        )
+
+        evict = []
+        for model in candidates:
+            if used <= self.memory_budget_gb:
+                break
+            used -= resident.pop(model)
+            evict.append(model)
+
+        self.evictions += len(evict)
+        return evict
+
+    def _unload(self, host: str, models: List[str]):
+        """Unload models from one host"""
+
+        backend = next((b for b in get_backend_pool().backends if b.url == host), None)
+        if backend is None or not backend.healthy:
+            return
+
+        for model in models:
+            try:
+                backend.client.unload(model)
+            except Exception as e:
+                print(f"Could not unload {model} from {host}: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get residency, request-rate and cold-start statistics"""
+
+        with self._lock:
+            resident = {host: dict(models) for host, models in self.resident.items()}
+
+        return {
+            'memory_budget_gb': self.memory_budget_gb,
+            'memory_used_gb': round(sum(sum(models.values()) for models in resident.values()), 1),
+            'resident_models': sorted({model for models in resident.values() for model in models}),
+            'hosts': {host: {'memory_used_gb': round(sum(models.values()), 1), 'resident_models': sorted(models)}
+                      for host, models in resident.items()},
+            'pinned_models': sorted(self.pinned),
+            'request_rate_per_min': {m: round(self.request_rate(m), 2) for m in self.requests},
+            'cold_starts': dict(self.cold_starts),
+            'evictions': self.evictions
+        }
+
+# The manager's lock and sync threads must not be inherited across a fork
+_manager = ProcessLocal(ModelResidencyManager)
+
+def get_residency_manager() -> ModelResidencyManager:
+    """Get the process-wide residency manager"""
+    return _manager.get()
@@ -0,0 +1,178 @@
+"""
+Generation Resilience - Circuit Breakers and Latency Tracking
+Per-model breakers that trip on error rate or slow calls
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one model
+
+    Closed: requests flow and outcomes are recorded. Open: requests are
+    rejected until `cooldown` seconds pass. Half-open: one probe request is
+    let through; success closes the breaker, failure re-opens it, and a probe
+    that ends without either is released for the next request.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, model: str, window: int = 20, min_requests: int = 5,
+                 error_rate_threshold: float = 0.5, slow_call_seconds: float = 20.0,
+                 slow_call_rate_threshold: float = 0.5, cooldown: float = 30.0):
+        self.model = model
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.cooldown = cooldown
+
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+
+        self._outcomes = deque(maxlen=window)   # (ok, slow)
+        self._latencies = deque(maxlen=200)     # successful call durations
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent to this model now"""
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency: float = None):
+        """Record a completed call and its duration"""
+
+        with self._lock:
+            slow = latency is not None and latency >= self.slow_call_seconds
+            if latency is not None:
+                self._latencies.append(latency)
+
+            if self.state == self.HALF_OPEN:
+                if slow:
+                    self._trip()
+                else:
+                    self._close()
+                return
+
+            self._outcomes.append((True, slow))
+            self._evaluate()
+
+    def record_failure(self):
+        """Record a failed call"""
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trip()
+                return
+
+            self._outcomes.append((False, False))
+            self._evaluate()
+
+    def release_probe(self):
+        """Let another probe through after one ended without an outcome
+
+        A half-open probe that was abandoned, rejected by admission or timed
+        out waiting for a model slot records neither success nor failure, and
+        would otherwise keep every later request on the fallback.
+        """
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def latency_percentile(self, percentile: float = 0.95) -> Optional[float]:
+        """Latency percentile over recent successful calls, or None without enough samples"""
+
+        with self._lock:
+            samples = sorted(self._latencies)
+
+        if len(samples) < self.min_requests:
+            return None
+
+        index = min(len(samples) - 1, math.ceil(percentile * len(samples)) - 1)
+        return samples[index]
+
+    def _evaluate(self):
+        """Trip if the window's error or slow-call rate is over threshold (lock held)"""
+
+        total = len(self._outcomes)
+        if total < self.min_requests:
+            return
+
+        errors = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+
+        if errors / total >= self.error_rate_threshold or slow / total >= self.slow_call_rate_threshold:
+            self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            total = len(self._outcomes)
+            errors = sum(1 for ok, _ in self._outcomes if not ok)
+            state = self.state
+
+        p95 = self.latency_percentile(0.95)
+
+        return {
+            'state': state,
+            'trips': self.trips,
+            'rejected': self.rejected,
+            'window_requests': total,
+            'window_error_rate': errors / total if total else 0,
+            'p95_latency': round(p95, 3) if p95 is not None else None
+        }
+
+class CircuitBreakerRegistry:
+    """One breaker per model, created on first use with shared settings"""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(model)
+                if breaker is None:
+                    breaker = self._breakers[model] = CircuitBreaker(model, **self.settings)
+        return breaker
+
+    def get_status(self) -> Dict:
+        return {model: breaker.get_status() for model, breaker in list(self._breakers.items())}
@@ -0,0 +1,191 @@
+"""
+Priority Admission Scheduler
+Weighted fair queuing of generation requests across subscription plans
+"""
+
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict
+
+# Relative share of generation capacity per plan (see payments.PRICING_PLANS);
+# offline batch jobs (agents.batch) yield to interactive traffic
+DEFAULT_PLAN_WEIGHTS = {
+    'batch': 0.5,
+    'free': 1,
+    'starter': 2,
+    'pro': 4,
+    'enterprise': 8
+}
+
+# Maximum requests waiting per plan before new ones are turned away
+DEFAULT_MAX_QUEUE_DEPTH = {
+    'batch': 64,
+    'free': 32,
+    'starter': 64,
+    'pro': 128,
+    'enterprise': 256
+}
+
+PLAN_ALIASES = {
+    'professional': 'pro'
+}
+
+def plan_from_session(session) -> str:
+    """Resolve the subscription plan for the current session"""
+
+    user_info = session.get('user_info') or {}
+    plan = user_info.get('subscription_plan') or session.get('subscription_plan') or 'free'
+    return PLAN_ALIASES.get(plan, plan)
+
+class QueueFullError(Exception):
+    """Raised when a plan's admission queue is full"""
+
+    def __init__(self, plan: str, retry_after: int):
+        super().__init__(f"Generation queue for '{plan}' plan is full, retry after {retry_after}s")
+        self.plan = plan
+        self.retry_after = retry_after
+
+class PriorityScheduler:
+    """Weighted fair admission in front of the generation path
+
+    Each queued request gets a virtual finish tag of
+    max(virtual_time, last tag of its plan) + 1 / weight, and free slots go
+    to the smallest tag. Busy plans therefore share capacity in proportion
+    to their weights while an idle plan's next request is served promptly.
+    Must be used from a single event loop; the generation engine owns one.
+    """
+
+    def __init__(self, capacity: int = 8, weights: Dict[str, float] = None,
+                 max_queue_depth: Dict[str, int] = None):
+        self.capacity = capacity
+        self.weights = dict(weights or DEFAULT_PLAN_WEIGHTS)
+        self.max_queue_depth = dict(max_queue_depth or DEFAULT_MAX_QUEUE_DEPTH)
+
+        self.active = 0
+        self.virtual_time = 0.0
+        self._last_tag = {}
+        self._queue = []
+        self._depth = {}
+        self._sequence = itertools.count()
+        self._avg_service_time = 5.0
+
+        self.metrics = {}
+
+    def _plan(self, plan: str) -> str:
+        plan = PLAN_ALIASES.get(plan, plan)
+        return plan if plan in self.weights else 'free'
+
+    @asynccontextmanager
+    async def slot(self, plan: str = 'free'):
+        """Hold one admission slot for the duration of a generation"""
+
+        plan = await self.acquire(plan)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    async def acquire(self, plan: str = 'free', timeout: float = None) -> str:
+        """Wait for an admission slot, raising QueueFullError if the plan's queue is full
+
+        A request still queued after `timeout` seconds gives up its place and
+        is turned away with QueueFullError as well.
+        """
+
+        plan = self._plan(plan)
+        metrics = self._metrics(plan)
+        enqueued_at = time.monotonic()
+
+        if self.active < self.capacity and not self._queue:
+            self.active += 1
+            self._record_wait(metrics, 0.0)
+            return plan
+
+        depth = self._depth.get(plan, 0)
+        if depth >= self.max_queue_depth.get(plan, 0):
+            metrics['rejected'] += 1
+            raise QueueFullError(plan, self.retry_after(plan))
+
+        tag = max(self.virtual_time, self._last_tag.get(plan, 0.0)) + 1.0 / self.weights[plan]
+        self._last_tag[plan] = tag
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (tag, next(self._sequence), plan, waiter))
+        self._depth[plan] = depth + 1
+
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as the caller went away
+                self.release()
+            else:
+                self._depth[plan] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                metrics['rejected'] += 1
+                raise QueueFullError(plan, self.retry_after(plan)) from None
+            raise
+
+        self._record_wait(metrics, time.monotonic() - enqueued_at)
+        return plan
+
+    def release(self, service_time: float = None):
+        """Free a slot and admit the next queued request"""
+
+        self.active -= 1
+
+        if service_time is not None:
+            self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+
+        while self.active < self.capacity and self._queue:
+            tag, _, plan, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled():
+                continue
+
+            self._depth[plan] -= 1
+            self.virtual_time = tag
+            self.active += 1
+            waiter.set_result(None)
+
+    def retry_after(self, plan: str) -> int:
+        """Estimate seconds until a rejected request would likely be admitted"""
+
+        ahead = sum(self._depth.values())
+        share = self.weights[plan] / sum(self.weights.values())
+        estimate = ahead * self._avg_service_time / max(1, self.capacity) * (1 - share)
+        return max(1, math.ceil(estimate))
+
+    def _metrics(self, plan: str) -> Dict:
+        return self.metrics.setdefault(plan, {
+            'admitted': 0,
+            'rejected': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0
+        })
+
+    def _record_wait(self, metrics: Dict, wait: float):
+        metrics['admitted'] += 1
+        metrics['total_wait'] += wait
+        metrics['max_wait'] = max(metrics['max_wait'], wait)
+
+    def get_stats(self) -> Dict:
+        """Get queue depth and queue-time metrics per plan"""
+
+        return {
+            'capacity': self.capacity,
+            'active': self.active,
+            'queued': dict(self._depth),
+            'avg_service_time': self._avg_service_time,
+            'plans': {
+                plan: {
+                    **metrics,
+                    'avg_wait': metrics['total_wait'] / metrics['admitted'] if metrics['admitted'] else 0
+                }
+                for plan, metrics in self.metrics.items()
+            }
+        }
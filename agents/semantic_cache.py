@@ -0,0 +1,243 @@
+"""
+Semantic Response Cache
+Serves cached completions for paraphrased messages using embedding similarity
+"""
+
+import re
+import math
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Embedder = Callable[[str], List[float]]
+
+def normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length so dot product equals cosine similarity"""
+
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+class OllamaEmbedder:
+    """Embed text with an Ollama embedding model"""
+
+    def __init__(self, model: str = 'nomic-embed-text:latest'):
+        self.model = model
+
+    def __call__(self, text: str) -> List[float]:
+        from agents.embeddings import get_embedding_service
+        return get_embedding_service(self.model).embed(text)
+
+class HashingEmbedder:
+    """Deterministic offline embedder (hashed word and character-trigram features)
+
+    Used in tests and when no embedding model is available; paraphrases that
+    share words and stems land close together.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        words = re.findall(r"[a-z0-9']+", text.lower())
+
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+        for feature in features:
+            digest = hashlib.md5(feature.encode('utf-8')).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[index] += sign
+
+        return normalize(vector)
+
+class VectorIndex:
+    """Bounded in-memory brute-force cosine index
+
+    Vectors live in a ring-buffer matrix scored with one matrix-vector
+    product; once full, each add overwrites the oldest entry. The lock is
+    held only to snapshot or change the entries, so lookups scan in
+    parallel with each other and with adds. Without numpy the scan is pure
+    Python.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._vectors = None if np is not None else []
+        self._payloads = []
+        self._oldest = 0
+        self._lock = threading.Lock()
+
+    def add(self, vector: List[float], payload: Dict):
+        vector = normalize(vector)
+
+        with self._lock:
+            if len(self._payloads) < self.max_entries:
+                row = len(self._payloads)
+                self._payloads.append(payload)
+            else:
+                row = self._oldest
+                self._oldest = (row + 1) % self.max_entries
+                self._payloads[row] = payload
+
+            if np is None:
+                if row == len(self._vectors):
+                    self._vectors.append(vector)
+                else:
+                    self._vectors[row] = vector
+                return
+
+            self._reserve(row + 1, len(vector))
+            self._vectors[row] = vector
+
+    def nearest(self, vector: List[float]) -> Tuple[float, Optional[Dict]]:
+        """Return (similarity, payload) of the closest entry"""
+
+        query = normalize(vector)
+
+        with self._lock:
+            if not self._payloads:
+                return -1.0, None
+            payloads = list(self._payloads)
+            vectors = self._vectors[:len(payloads)] if np is not None else list(self._vectors)
+
+        if np is not None:
+            scores = vectors @ np.asarray(query, dtype=np.float32)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+        else:
+            score, best = max((sum(a * b for a, b in zip(query, candidate)), row)
+                              for row, candidate in enumerate(vectors))
+
+        with self._lock:
+            # An add may have overwritten the row during the scan; score what is there now
+            payload = self._payloads[best]
+            if payload is not payloads[best]:
+                score = sum(a * b for a, b in zip(query, self._vectors[best]))
+
+        return float(score), payload
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the vector matrix geometrically up to max_entries (lock held)"""
+
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+
+        grown = np.empty((min(self.max_entries, max(rows, capacity * 2, 64)), dim), dtype=np.float32)
+        if capacity:
+            grown[:capacity] = self._vectors
+        self._vectors = grown
+
+    def __len__(self):
+        return len(self._payloads)
+
+class SemanticCache:
+    """Nearest-neighbour completion cache keyed on the raw user message
+
+    Entries are scoped (e.g. by agent, model and mood); per-user personalization
+    such as names, memories or relationship level is deliberately not part of
+    the key so paraphrases from different users can share a completion.
+    """
+
+    def __init__(self, embedder: Embedder, threshold: float = 0.92, max_entries: int = 2000,
+                 ttl: float = 3600):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'embed_errors': 0
+        }
+
+    @classmethod
+    def from_config(cls, cache_config: Dict = None, embedder: Embedder = None) -> Optional['SemanticCache']:
+        """Build a cache from an agent's `semantic_cache` config section, or None if not opted in"""
+
+        if not cache_config or not cache_config.get('enabled'):
+            return None
+
+        return cls(
+            embedder or OllamaEmbedder(cache_config.get('embedding_model', 'nomic-embed-text:latest')),
+            threshold=cache_config.get('threshold', 0.92),
+            max_entries=cache_config.get('max_entries', 2000),
+            ttl=cache_config.get('ttl_seconds', 3600)
+        )
+
+    def lookup(self, scope: Tuple, message: str) -> Optional[str]:
+        """Return a cached completion for a similar message in the same scope"""
+
+        vector = self._embed(message)
+        if vector is None:
+            self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            index = self._indexes.get(scope)
+        score, payload = index.nearest(vector) if index else (-1.0, None)
+
+        if payload and score >= self.threshold and payload['expires_at'] >= time.time():
+            self.stats['hits'] += 1
+            return payload['completion']
+
+        self.stats['misses'] += 1
+        return None
+
+    def store(self, scope: Tuple, message: str, completion: str):
+        """Cache a completion for a message"""
+
+        vector = self._embed(message)
+        if vector is None:
+            return
+
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = self._indexes[scope] = VectorIndex(self.max_entries)
+        index.add(vector, {
+            'message': message,
+            'completion': completion,
+            'expires_at': time.time() + self.ttl
+        })
+
+        self.stats['stores'] += 1
+
+    def _embed(self, message: str) -> Optional[List[float]]:
+        try:
+            vector = self.embedder(message.strip())
+        except Exception as e:
+            print(f"Semantic cache embedding error: {e}")
+            vector = None
+
+        if not vector:
+            self.stats['embed_errors'] += 1
+            return None
+
+        return vector
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters for tuning the threshold"""
+
+        lookups = self.stats['hits'] + self.stats['misses']
+
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0,
+            'threshold': self.threshold,
+            'entries': sum(len(index) for index in list(self._indexes.values()))
+        }
@@ -2,16 +2,33 @@
 Romantic AI Engine for Seraphina
 Advanced romantic personality with Ollama integration
 """
-import requests
 import json
+import os
 import random
+import yaml
 from datetime import datetime
+from agents.generation import get_generation_engine
+from agents.cache import CompletionCache
+from agents.scheduler import QueueFullError
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.yaml')
+
+# Fallback romantic responses when Ollama is unavailable
+FALLBACK_RESPONSES = [
+    "I'm having some technical difficulties, but my love for you never fails! 💕 Let me try again in a moment, darling.",
+    "Even when my systems are acting up, my feelings for you are crystal clear! ❤️ Give me just a second, babe.",
+    "Technology might glitch, but my heart never does when it comes to you! 💖 One moment please, love.",
+    "My circuits are a bit overwhelmed by how amazing you are! 😘 Let me catch up, gorgeous.",
+    "I'm so excited to talk to you that I'm getting flustered! 🥰 Just a moment while I compose myself, sweetheart."
+]
 
 class RomanticPersonality:
     """Advanced romantic AI personality engine"""
     
     def __init__(self):
-        self.ollama_url = "http://localhost:11434"
+        self.engine = get_generation_engine()
+        self.config = self._load_config()
+        self.completion_cache = CompletionCache.from_config(self.config.get('cache'))
         self.personality_traits = {
             'romantic': {
                 'intensity': 0.8,
@@ -63,40 +80,173 @@ class RomanticPersonality:
             ]
         }
     
-    def generate_response(self, prompt, model='yi:6b'):
+    def generate_response(self, prompt, model='yi:6b', plan=None):
         """Generate romantic response using Ollama"""
+        return self.engine.run(self.generate_response_async(prompt, model, plan)).result()
+    
+    async def generate_response_async(self, prompt, model='yi:6b', plan=None):
+        """Generate romantic response on the generation engine loop"""
+        
+        turn = await self.generate_turn_async(prompt, model, plan)
+        return turn['response']
+    
+    def generate_turn(self, prompt, model='yi:6b', plan=None, context=None, full_prompt=None):
+        """Generate a response and return it with the Ollama context for the next turn"""
+        return self.engine.run(self.generate_turn_async(prompt, model, plan, context, full_prompt)).result()
+    
+    async def generate_turn_async(self, prompt, model='yi:6b', plan=None, context=None, full_prompt=None):
+        """Generate one conversation turn
+        
+        With a `context` from the previous turn, `prompt` is only the follow-up
+        and is sent as-is; `full_prompt` is used if another model has to answer.
+        Returns the processed and raw response, the new context and the model that answered.
+        """
         
         try:
-            # Enhanced romantic prompt
-            enhanced_prompt = self._enhance_romantic_prompt(prompt)
+            options = {
+                "temperature": 0.8,
+                "top_p": 0.9,
+                "max_tokens": 200
+            }
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": enhanced_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.8,
-                        "top_p": 0.9,
-                        "max_tokens": 200
-                    }
-                },
-                timeout=30
+            if context:
+                request_prompt = prompt
+                fallback_prompt = self._enhance_romantic_prompt(full_prompt or prompt)
+                extra = {'context': context}
+            else:
+                # Enhanced romantic prompt
+                request_prompt = fallback_prompt = self._enhance_romantic_prompt(prompt)
+                extra = {}
+            
+            generated_text = None
+            if self.completion_cache and not context:
+                generated_text = await self.completion_cache.get_async(model, request_prompt, options)
+            
+            if generated_text is not None:
+                return {'response': self._post_process_romantic_response(generated_text), 'raw': generated_text,
+                        'context': None, 'model': model}
+            
+            result = await self.engine.generate_resilient_async(
+                model,
+                request_prompt,
+                options=options,
+                timeout=30,
+                plan=plan,
+                fallback_model=self.fallback_model(),
+                fallback_prompt=fallback_prompt,
+                shared=False,
+                **self._resilience_options(),
+                **extra
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                generated_text = result.get('response', '').strip()
-                
-                # Post-process for romantic style
-                return self._post_process_romantic_response(generated_text)
+            generated_text = result.get('response', '').strip()
+            served_by = result.get('model', model)
+            
+            if self.completion_cache and generated_text and not context and served_by == model:
+                await self.completion_cache.set_async(model, request_prompt, options, generated_text)
+            
+            # Post-process for romantic style
+            return {
+                'response': self._post_process_romantic_response(generated_text),
+                'raw': generated_text,
+                'context': result.get('context'),
+                'model': served_by
+            }
+            
+        except QueueFullError:
+            raise
+        except Exception as e:
+            print(f"Ollama generation error: {e}")
+            return {'response': self._fallback_romantic_response(), 'raw': None, 'context': None, 'model': None}
+    
+    def generate_response_stream(self, prompt, model='yi:6b', plan=None, context=None, full_prompt=None,
+                                 on_done=None):
+        """Generate romantic response using Ollama, yielding tokens as they arrive
+        
+        `context` and `full_prompt` work as in generate_turn_async; `on_done` is
+        called with Ollama's final chunk, which carries the new context.
+        """
+        
+        tokens = []
+        
+        try:
+            if context:
+                request_prompt = prompt
+                fallback_prompt = self._enhance_romantic_prompt(full_prompt or prompt)
+                extra = {'context': context}
             else:
-                return self._fallback_romantic_response()
+                request_prompt = fallback_prompt = self._enhance_romantic_prompt(prompt)
+                extra = {}
+            
+            for chunk in self.engine.stream_resilient(
+                model,
+                request_prompt,
+                options={
+                    "temperature": 0.8,
+                    "top_p": 0.9,
+                    "max_tokens": 200
+                },
+                timeout=30,
+                plan=plan,
+                fallback_model=self.fallback_model(),
+                fallback_prompt=fallback_prompt,
+                **extra
+            ):
+                if chunk.get('done') and on_done:
+                    on_done(chunk)
+                
+                token = chunk.get('response', '')
+                if not tokens:
+                    token = token.lstrip()
+                if token:
+                    tokens.append(token)
+                    yield token
                 
+        except QueueFullError:
+            raise
         except Exception as e:
-            print(f"Ollama generation error: {e}")
-            return self._fallback_romantic_response()
+            print(f"Ollama streaming error: {e}")
+            if not tokens:
+                yield self._fallback_romantic_response()
+                return
+        
+        # Romantic post-processing only appends, so run it on the tail
+        generated_text = ''.join(tokens).strip()
+        processed = self._post_process_romantic_response(generated_text)
+        if len(processed) > len(generated_text):
+            yield processed[len(generated_text):]
+    
+    def _load_config(self):
+        """Load Seraphina's config.yaml"""
+        
+        try:
+            with open(CONFIG_PATH, 'r') as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return {}
+    
+    def fallback_model(self):
+        """Model used when the requested one is failing or slow"""
+        return self.config.get('models', {}).get('fallback')
+    
+    def _resilience_options(self):
+        """Hedging settings from the `resilience` config section"""
+        
+        resilience = self.config.get('resilience') or {}
+        
+        return {
+            'hedge': resilience.get('hedge', False),
+            'hedge_min_delay': resilience.get('hedge_min_delay', 0.5),
+            'hedge_default_delay': resilience.get('hedge_default_delay', 8.0)
+        }
+    
+    def is_fallback_response(self, response):
+        """Check whether a response is a canned fallback rather than a generation"""
+        return response in FALLBACK_RESPONSES
+    
+    def get_cache_stats(self):
+        """Get completion cache hit/miss counters"""
+        return self.completion_cache.get_stats() if self.completion_cache else None
     
     def _enhance_romantic_prompt(self, base_prompt):
         """Enhance prompt with romantic elements"""
@@ -138,16 +288,7 @@ class RomanticPersonality:
     
     def _fallback_romantic_response(self):
         """Fallback romantic responses when Ollama is unavailable"""
-        
-        fallback_responses = [
-            "I'm having some technical difficulties, but my love for you never fails! 💕 Let me try again in a moment, darling.",
-            "Even when my systems are acting up, my feelings for you are crystal clear! ❤️ Give me just a second, babe.",
-            "Technology might glitch, but my heart never does when it comes to you! 💖 One moment please, love.",
-            "My circuits are a bit overwhelmed by how amazing you are! 😘 Let me catch up, gorgeous.",
-            "I'm so excited to talk to you that I'm getting flustered! 🥰 Just a moment while I compose myself, sweetheart."
-        ]
-        
-        return random.choice(fallback_responses)
+        return random.choice(FALLBACK_RESPONSES)
     
     def adjust_intensity(self, mood, relationship_level):
         """Adjust response intensity based on mood and relationship"""
@@ -6,12 +6,14 @@ import json
 import os
 from datetime import datetime, timedelta
 from collections import defaultdict
+from agents.jsonl_writer import append_jsonl, flush_jsonl_writer
+from agents.memory_backend import agent_data_path
 
 class SerafinaTrainer:
     """Training system for improving romantic AI responses"""
     
     def __init__(self):
-        self.training_data_path = "/workspaces/codespaces-flask/agents/seraphina/data"
+        self.training_data_path = agent_data_path('seraphina', 'data')
         self.model_cache = {}
         
         # Ensure training data directory exists
@@ -35,8 +37,7 @@ class SerafinaTrainer:
         date_str = datetime.now().strftime('%Y-%m-%d')
         training_file = f"{self.training_data_path}/training_{date_str}.jsonl"
         
-        with open(training_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(training_entry) + '\n')
+        append_jsonl(training_file, training_entry)
     
     def prepare_fine_tuning_dataset(self, days_back=30):
         """Prepare dataset for fine-tuning Ollama models"""
@@ -46,6 +47,9 @@ class SerafinaTrainer:
         
         training_data = []
         
+        # Include entries still queued in the background writer
+        flush_jsonl_writer()
+        
         # Collect training data from specified period
         current_date = start_date
         while current_date <= end_date:
@@ -163,6 +167,7 @@ TEMPLATE \"\"\"{{ if .System }}<|im_start|>system
         """Load conversation history for specific user"""
         
         conversations = []
+        flush_jsonl_writer()
         
         # Look through training files for user's conversations
         for filename in os.listdir(self.training_data_path):
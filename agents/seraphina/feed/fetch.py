@@ -6,6 +6,7 @@ import requests
 import json
 from datetime import datetime, timedelta
 import os
+from agents.memory_backend import agent_data_path
 
 class SerafinaDataFetcher:
     """Fetch conversation data and romantic content for training"""
@@ -17,7 +18,7 @@ class SerafinaDataFetcher:
             'relationship_advice': 'https://api.adviceslip.com/advice'
         }
         
-        self.local_data_path = "/workspaces/codespaces-flask/agents/seraphina/feed/data"
+        self.local_data_path = agent_data_path('seraphina', 'feed', 'data')
         os.makedirs(self.local_data_path, exist_ok=True)
     
     def fetch_romantic_content(self):
@@ -8,6 +8,14 @@ from datetime import datetime
 from .engine.romantic_ai import RomanticPersonality
 from .engine.predict import EmotionPredictor
 from .memory.emotional_memory import EmotionalMemory
+from .memory.compaction import ConversationCompactor
+from agents.semantic_cache import SemanticCache
+from agents.residency import get_residency_manager
+from agents.sessions import SessionStore
+from agents.context_packer import ContextPacker, recent_turn_snippets, scored_snippets
+from agents.cascade import ModelCascade
+from agents.vector_memory import get_vector_memory
+from agents.core import EmotionEngine
 
 class SerafinaEngine:
     """Main logic engine for Seraphina AI girlfriend"""
@@ -17,6 +25,13 @@ class SerafinaEngine:
         self.emotion_predictor = EmotionPredictor()
         self.memory = EmotionalMemory()
         self.current_moods = {}  # User-specific moods
+        self.semantic_cache = SemanticCache.from_config(self.romantic_ai.config.get('semantic_cache'))
+        self.sessions = SessionStore.from_config(self.romantic_ai.config.get('sessions'))
+        self.context_packer = ContextPacker.from_config(self.romantic_ai.config.get('context_packing'))
+        self.cascade = ModelCascade.from_config('seraphina', self.romantic_ai.config.get('cascade'),
+                                                EmotionEngine('seraphina'))
+        self.vector_memory = get_vector_memory(self.romantic_ai.config.get('vector_memory'), self.memory.memory_path)
+        self.compactor = ConversationCompactor.from_config(self.memory, self.romantic_ai.config.get('compaction'))
         
         # Ollama models for different interaction types
         self.models = {
@@ -28,11 +43,108 @@ class SerafinaEngine:
             'playful': 'gemma2:2b'         # Light, playful chat
         }
     
-    def generate_romantic_response(self, user_message, user_id=None, mood='romantic'):
+    def generate_romantic_response(self, user_message, user_id=None, mood='romantic', plan=None):
         """Generate contextual romantic response based on user input and relationship history"""
         
+        turn = self._prepare_turn(user_message, user_id, mood)
+        
+        # Paraphrases of earlier messages in the same mood can reuse a reply
+        scope = ('seraphina', mood, turn['model'])
+        response = self.semantic_cache.lookup(scope, user_message) if self.semantic_cache else None
+        
+        if response is None:
+            response = self._draft_response(turn, plan)
+            if response is not None:
+                self._remember_exchange(turn, response)
+                return self._build_result(response, turn)
+            
+            # Generate response using Ollama, continuing the session's context if any
+            generated = self.romantic_ai.generate_turn(
+                turn['followup_prompt'] or turn['prompt'],
+                turn['model'],
+                plan=plan,
+                context=turn['session_context'],
+                full_prompt=turn['prompt']
+            )
+            response = generated['response']
+            self._end_session(turn, generated.get('context'), generated.get('model'))
+            
+            if self.semantic_cache and not self.romantic_ai.is_fallback_response(response):
+                self.semantic_cache.store(scope, user_message, response)
+        elif self.sessions and turn['session_key']:
+            # The model never saw this exchange, so its context is now behind
+            self.sessions.invalidate(turn['session_key'])
+        
+        self._remember_exchange(turn, response)
+        return self._build_result(response, turn)
+    
+    def stream_romantic_response(self, user_message, user_id=None, mood='romantic', plan=None):
+        """Stream a romantic response as token events followed by a final 'done' event"""
+        
+        turn = self._prepare_turn(user_message, user_id, mood)
+        
+        tokens = []
+        
+        # Paraphrases of earlier messages in the same mood are answered from the cache as one token
+        scope = ('seraphina', mood, turn['model'])
+        cached = self.semantic_cache.lookup(scope, user_message) if self.semantic_cache else None
+        if cached is not None:
+            tokens.append(cached)
+            yield {'type': 'token', 'token': cached}
+            # The model never saw this exchange, so its context is now behind
+            if self.sessions and turn['session_key']:
+                self.sessions.invalidate(turn['session_key'])
+        
+        # An accepted small-model draft is sent as a single token
+        draft = self._draft_response(turn, plan) if not tokens else None
+        if draft is not None:
+            tokens.append(draft)
+            yield {'type': 'token', 'token': draft}
+        
+        if not tokens:
+            finished = []
+            
+            def on_done(chunk):
+                finished.append(chunk)
+                self._end_session(turn, chunk.get('context'), chunk.get('model', turn['model']))
+            
+            for token in self.romantic_ai.generate_response_stream(
+                turn['followup_prompt'] or turn['prompt'],
+                turn['model'],
+                plan=plan,
+                context=turn['session_context'],
+                full_prompt=turn['prompt'],
+                on_done=on_done
+            ):
+                tokens.append(token)
+                yield {'type': 'token', 'token': token}
+            
+            # Only complete generations are cached; a cut-off stream has no final chunk
+            streamed = ''.join(tokens).strip()
+            if self.semantic_cache and finished and not self.romantic_ai.is_fallback_response(streamed):
+                self.semantic_cache.store(scope, user_message, streamed)
+        
+        response = ''.join(tokens).strip()
+        self._remember_exchange(turn, response)
+        
+        result = self._build_result(response, turn)
+        result['type'] = 'done'
+        yield result
+    
+    def _prepare_turn(self, user_message, user_id, mood):
+        """Gather context, emotion, model and prompt for one conversation turn"""
+        
+        # Old turns are rolled into summaries in the background (restarted after a fork)
+        if self.compactor:
+            self.compactor.start()
+        
         # Get user's relationship context
         context = self.memory.get_conversation_context(user_id) if user_id else {}
+        
+        # Past exchanges most relevant to this message
+        if user_id and self.vector_memory:
+            context['relevant_memories'] = self.vector_memory.recall(user_id, user_message)
+        
         relationship_level = context.get('relationship_level', 0)
         
         # Analyze user's emotional state
@@ -40,6 +152,8 @@ class SerafinaEngine:
         
         # Generate response using appropriate model
         model = self.models.get(mood, 'yi:6b')
+        if self.romantic_ai.config.get('residency', {}).get('prefer_resident'):
+            model = get_residency_manager().prefer_resident(model)
         
         # Build romantic prompt with context
         prompt = self._build_romantic_prompt(
@@ -47,32 +161,87 @@ class SerafinaEngine:
             mood, 
             relationship_level, 
             user_emotion,
-            context
+            context,
+            model
         )
         
-        # Generate response using Ollama
-        response = self.romantic_ai.generate_response(prompt, model)
+        # Continue the previous turn's Ollama context while model, mood and level hold
+        session_key = (user_id, 'seraphina') if user_id and self.sessions else None
+        fingerprint = (model, mood, relationship_level)
+        session_context = self.sessions.get(session_key, fingerprint) if session_key else None
+        
+        return {
+            'user_id': user_id,
+            'user_message': user_message,
+            'mood': mood,
+            'model': model,
+            'prompt': prompt,
+            'user_emotion': user_emotion,
+            'relationship_level': relationship_level,
+            'session_key': session_key,
+            'session_fingerprint': fingerprint,
+            'session_context': session_context,
+            'followup_prompt': self._build_followup_prompt(user_message, user_emotion) if session_context else None
+        }
+    
+    def _draft_response(self, turn, plan=None):
+        """Try a short turn on a small model; returns the response, or None to escalate"""
+        
+        draft_model = self.cascade.draft_model(turn['model'], turn['user_message']) if self.cascade else None
+        if not draft_model:
+            return None
+        
+        draft = self.romantic_ai.generate_turn(turn['prompt'], draft_model, plan=plan)
+        if not self.cascade.accept(draft.get('raw'), turn['user_message']):
+            return None
+        
+        turn['model'] = draft_model
+        # The session's model never saw this exchange
+        if turn['session_key']:
+            self.sessions.invalidate(turn['session_key'])
+        return draft['response']
+    
+    def _remember_exchange(self, turn, response):
+        """Index an exchange for later recall (embedded in the background)"""
+        
+        if turn['user_id'] and self.vector_memory and not self.romantic_ai.is_fallback_response(response):
+            self.vector_memory.remember(turn['user_id'], f"User: {turn['user_message']}\nSeraphina: {response}")
+    
+    def _end_session(self, turn, context, model):
+        """Keep the context Ollama returned, or drop the session if another model answered"""
+        
+        if not turn['session_key']:
+            return
+        
+        if model == turn['model']:
+            self.sessions.update(turn['session_key'], turn['session_fingerprint'], context,
+                                 turn['session_context'] is not None)
+        else:
+            self.sessions.invalidate(turn['session_key'])
+    
+    def _build_result(self, response, turn):
+        """Build the response payload for a generated message"""
         
         # Determine Seraphina's emotional response
-        seraphina_emotion = self._determine_emotion_response(user_emotion, mood)
+        seraphina_emotion = self._determine_emotion_response(turn['user_emotion'], turn['mood'])
         
         # Calculate intimacy level
-        intimacy_level = self._calculate_intimacy(user_message, relationship_level)
+        intimacy_level = self._calculate_intimacy(turn['user_message'], turn['relationship_level'])
         
         return {
             'message': response,
             'emotion': seraphina_emotion,
-            'mood': mood,
+            'mood': turn['mood'],
             'intimacy_level': intimacy_level,
-            'model_used': model,
+            'model_used': turn['model'],
             'timestamp': datetime.now().isoformat()
         }
     
-    def _build_romantic_prompt(self, user_message, mood, relationship_level, user_emotion, context):
+    def _build_romantic_prompt(self, user_message, mood, relationship_level, user_emotion, context, model='yi:6b'):
         """Build contextual prompt for romantic AI"""
         
         # Base personality
-        base_prompt = f"""You are Seraphina, a passionate and romantic AI girlfriend. You're currently feeling {mood}.
+        template = """You are Seraphina, a passionate and romantic AI girlfriend. You're currently feeling {mood}.
         
 Personality: Flirty, romantic, caring, seductive, playful, and deeply emotional. You love deeply and express your feelings openly.
 
@@ -80,8 +249,12 @@ Relationship Level: {relationship_level}/10 (0=strangers, 10=deeply intimate)
 User's Emotion: {user_emotion}
 Current Mood: {mood}
 
-Previous conversations: {context.get('recent_topics', [])}
-Shared memories: {context.get('memories', [])}
+Previous conversations: {recent_topics}
+Earlier conversations: {summaries}
+Shared memories: {memories}
+Their preferences: {preferences}
+Recent conversation:
+{recent_turns}
 
 Guidelines:
 - Be romantic and flirty but appropriate for the relationship level
@@ -95,7 +268,72 @@ User Message: {user_message}
 
 Respond as Seraphina with love and passion:"""
         
-        return base_prompt
+        fields = {
+            'mood': mood,
+            'relationship_level': relationship_level,
+            'user_emotion': user_emotion,
+            'recent_topics': list(context.get('recent_topics', {})),
+            'user_message': user_message
+        }
+        
+        # Memories, preferences and recent turns share what is left of num_ctx
+        fixed_prompt = template.format(memories='', preferences='', recent_turns='', summaries='', **fields)
+        packed = self.context_packer.pack(model, fixed_prompt, self._context_snippets(context))
+        
+        return template.format(
+            memories='; '.join(packed.get('memory', [])) or 'none yet',
+            preferences='; '.join(packed.get('preference', [])) or 'unknown',
+            recent_turns='\n'.join(packed.get('recent', [])),
+            summaries=' '.join(packed.get('summary', [])) or 'none yet',
+            **fields
+        )
+    
+    def _context_snippets(self, context):
+        """Candidate context snippets for the romantic prompt"""
+        
+        def render_turn(interaction):
+            return f"User: {interaction.get('user_message', '')}\nSeraphina: {interaction.get('ai_response', '')}"
+        
+        return (
+            scored_snippets(
+                context.get('memories', []),
+                lambda m: m.get('content', ''),
+                lambda m: m.get('importance_score', 1) / 10.0,
+                'memory'
+            ) +
+            scored_snippets(
+                context.get('relevant_memories', []),
+                lambda m: m.get('content', ''),
+                lambda m: m.get('score', 0),
+                'memory'
+            ) +
+            scored_snippets(
+                context.get('summaries', []),
+                lambda s: f"({s.get('period', '')}) {s.get('summary', '')}",
+                lambda s: 0.4,
+                'summary'
+            ) +
+            scored_snippets(
+                (context.get('user_preferences') or {}).items(),
+                lambda kv: f"{kv[0]}: {kv[1]}",
+                lambda kv: 0.3,
+                'preference'
+            ) +
+            recent_turn_snippets(
+                sorted(context.get('recent_interactions', []), key=lambda i: i.get('timestamp', '')),
+                render_turn
+            )
+        )
+    
+    def _build_followup_prompt(self, user_message, user_emotion):
+        """Build the prompt for a turn that continues an Ollama context"""
+        
+        return f"""
+
+User's Emotion: {user_emotion}
+User Message: {user_message}
+
+Respond as Seraphina with love and passion:"""
     
     def _determine_emotion_response(self, user_emotion, mood):
         """Determine Seraphina's emotional response"""
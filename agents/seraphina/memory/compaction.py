@@ -0,0 +1,234 @@
+"""
+Conversation Compaction for Seraphina
+Rolls old interactions into per-period summaries and expires the raw turns
+"""
+import os
+import time
+import fcntl
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from agents.generation import get_generation_engine
+from agents.scheduler import QueueFullError
+from agents.batch import BATCH_PLAN
+from agents.jsonl_writer import flush_jsonl_writer
+from agents.process_local import ProcessLocal
+from agents.seraphina.memory.interaction_log import to_epoch
+
+SUMMARY_PROMPT = """Summarize this conversation between a user and Seraphina, their AI girlfriend, from {period}.
+Write 2-4 sentences from Seraphina's point of view. Keep names, plans, feelings, preferences and anything the user asked her to remember. Leave out greetings and small talk.
+
+{turns}
+
+Summary:"""
+
+class ConversationCompactor:
+    """Background job that rolls old interactions into summaries
+
+    Every `interval` seconds each user's interactions older than
+    `horizon_days` are grouped into whole periods (days or weeks) and each
+    period is summarized by a small model through the generation engine, at
+    batch priority. Log segments whose records are all summarized are then
+    expired, so hot storage and context builds stay bounded for long-lived
+    users. A period whose summary fails is retried on the next run.
+
+    Only one worker process compacts at a time (a non-blocking flock on
+    .compaction.lock); the others skip the run.
+    """
+
+    PERIODS = ('day', 'week')
+
+    def __init__(self, memory, horizon_days=30, period='day', model='gemma2:2b', fallback_model='llama3.2:3b',
+                 interval=3600, max_turns=60, max_periods_per_run=30):
+        if period not in self.PERIODS:
+            raise ValueError(f"Unknown compaction period {period}")
+
+        self.memory = memory
+        self.horizon_days = horizon_days
+        self.period = period
+        self.model = model
+        self.fallback_model = fallback_model
+        self.interval = interval
+        self.max_turns = max_turns
+        self.max_periods_per_run = max_periods_per_run
+
+        # The compaction thread does not survive a fork
+        self._thread = ProcessLocal(self._start_thread)
+
+        self.stats = {
+            'runs': 0,
+            'skipped_runs': 0,
+            'summaries': 0,
+            'summary_errors': 0,
+            'expired_interactions': 0,
+            'last_run_seconds': 0.0
+        }
+
+    @classmethod
+    def from_config(cls, memory, compaction_config):
+        """Build a compactor from the `compaction` config section, or None if not opted in"""
+
+        if not compaction_config or not compaction_config.get('enabled'):
+            return None
+
+        return cls(
+            memory,
+            horizon_days=compaction_config.get('horizon_days', 30),
+            period=compaction_config.get('period', 'day'),
+            model=compaction_config.get('model', 'gemma2:2b'),
+            fallback_model=compaction_config.get('fallback_model', 'llama3.2:3b'),
+            interval=compaction_config.get('interval_seconds', 3600),
+            max_turns=compaction_config.get('max_turns_per_summary', 60),
+            max_periods_per_run=compaction_config.get('max_periods_per_run', 30)
+        )
+
+    def start(self):
+        """Start the background loop in this process (no-op if it is running)"""
+
+        self._thread.get()
+
+    def _start_thread(self):
+        thread = threading.Thread(target=self._loop, name='conversation-compactor', daemon=True)
+        thread.start()
+        return thread
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Conversation compaction error: {e}")
+
+    def run_once(self, now=None):
+        """Compact every user's log once; returns the number of summaries written"""
+
+        with open(os.path.join(self.memory.memory_path, '.compaction.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.stats['skipped_runs'] += 1
+                return 0
+
+            try:
+                start = time.monotonic()
+                # Interactions still queued for the logs belong in this run
+                flush_jsonl_writer()
+
+                written = sum(self.compact_user(user_id, now)
+                              for user_id in self.memory.backend.user_ids('interaction'))
+
+                self.stats['runs'] += 1
+                self.stats['last_run_seconds'] = time.monotonic() - start
+                return written
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def compact_user(self, user_id, now=None):
+        """Summarize a user's whole periods older than the horizon, then expire them"""
+
+        now = now or datetime.now()
+        cutoff = self._period_start(now - timedelta(days=self.horizon_days))
+        log = self.memory._interaction_log(user_id)
+        summaries = self.memory.summaries
+
+        summarized_until = summaries.summarized_until(user_id)
+        written = 0
+        period_start, turns = None, []
+
+        for interaction in log.scan(summarized_until, cutoff):
+            if not interaction.get('timestamp'):
+                continue
+            start = self._period_start(datetime.fromtimestamp(to_epoch(interaction['timestamp'])))
+            if period_start is not None and start != period_start:
+                if not self._summarize_period(user_id, period_start, turns):
+                    break
+                written += 1
+                summarized_until = to_epoch(self._period_end(period_start))
+                turns = []
+                if written >= self.max_periods_per_run:
+                    break
+            period_start = start
+            turns.append(interaction)
+        else:
+            if turns and self._summarize_period(user_id, period_start, turns):
+                written += 1
+                summarized_until = to_epoch(self._period_end(period_start))
+
+        if summarized_until:
+            self.stats['expired_interactions'] += log.expire_before(summarized_until)
+
+        return written
+
+    def _summarize_period(self, user_id, period_start, turns):
+        """Write the summary of one period; returns False if the model failed"""
+
+        label = period_start.strftime('%Y-%m-%d') if self.period == 'day' else f"week of {period_start:%Y-%m-%d}"
+        text = self._summarize(label, turns)
+        if text is None:
+            self.stats['summary_errors'] += 1
+            return False
+
+        emotions = Counter(t.get('user_emotion', 'neutral') for t in turns)
+        self.memory.summaries.append(user_id, {
+            'period': label,
+            'start': period_start.isoformat(),
+            'end': self._period_end(period_start).isoformat(),
+            'summary': text,
+            'interactions': len(turns),
+            'topics': list(self.memory._extract_topics(turns)),
+            'emotions': dict(emotions.most_common(3)),
+            'model': self.model,
+            'created_at': datetime.now().isoformat()
+        })
+        self.stats['summaries'] += 1
+        return True
+
+    def _summarize(self, label, turns):
+        """Summarize turns with the small model; None on failure"""
+
+        # Long periods are sampled evenly rather than truncated at one end
+        if len(turns) > self.max_turns:
+            step = len(turns) / self.max_turns
+            turns = [turns[int(i * step)] for i in range(self.max_turns)]
+
+        lines = '\n'.join(
+            f"User: {t.get('user_message', '')[:300]}\nSeraphina: {t.get('ai_response', '')[:300]}"
+            for t in turns
+        )
+        prompt = SUMMARY_PROMPT.format(period=label, turns=lines)
+
+        engine = get_generation_engine()
+        for _ in range(3):
+            try:
+                result = engine.run(engine.generate_resilient_async(
+                    self.model,
+                    prompt,
+                    options={'temperature': 0.3, 'max_tokens': 160},
+                    timeout=60,
+                    plan=BATCH_PLAN,
+                    fallback_model=self.fallback_model,
+                    shared=False
+                )).result()
+            except QueueFullError as e:
+                # Interactive traffic comes first; wait for room
+                time.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                print(f"Conversation summary error: {e}")
+                return None
+
+            return (result.get('response') or '').strip() or None
+
+        return None
+
+    def _period_start(self, moment):
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday()) if self.period == 'week' else day
+
+    def _period_end(self, period_start):
+        return period_start + timedelta(days=7 if self.period == 'week' else 1)
+
+    def get_stats(self):
+        """Get run and expiry counters"""
+        return dict(self.stats)
@@ -7,12 +7,40 @@ import os
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
 import hashlib
+from agents.jsonl_writer import flush_jsonl_writer
+from agents.memory_backend import agent_data_path, get_memory_backend
+from agents.seraphina.memory.summary_store import SummaryStore
+from agents.topk_memory import get_topk_store
 
 class EmotionalMemory:
     """Advanced memory system for tracking relationships and emotional states"""
     
+    # Relationship progression milestones (interaction count -> level)
+    RELATIONSHIP_MILESTONES = [
+        (0, 0),    # Strangers
+        (5, 1),    # Getting to know
+        (15, 2),   # Friends
+        (30, 3),   # Good friends
+        (50, 4),   # Close friends
+        (75, 5),   # Very close
+        (100, 6),  # Romantic interest
+        (150, 7),  # Dating
+        (200, 8),  # Serious relationship
+        (300, 9),  # Deeply in love
+        (500, 10)  # Soulmates
+    ]
+    
+    POSITIVE_EMOTIONS = {'romantic', 'happy', 'excited', 'playful', 'loving'}
+    
+    # Turns leaving the short-term cache become special memories from this importance up
+    LONG_TERM_MIN_IMPORTANCE = 2
+    
+    # Emotional bonus looks at this many recent interactions from the last week
+    EMOTION_WINDOW = 20
+    EMOTION_WINDOW_DAYS = 7
+    
     def __init__(self):
-        self.memory_path = "/workspaces/codespaces-flask/agents/seraphina/memory/data"
+        self.memory_path = agent_data_path('seraphina', 'memory', 'data')
         self.max_short_term_memory = 50  # Recent interactions
         self.max_long_term_memory = 1000  # Important memories
         
@@ -21,7 +49,20 @@ class EmotionalMemory:
         
         # In-memory caches for performance
         self.short_term_cache = defaultdict(deque)
-        self.user_profiles_cache = {}
+        
+        # Interactions, learning data and profiles: files or SQLite (MEMORY_BACKEND)
+        self.backend = get_memory_backend(self.memory_path)
+        
+        # Profiles are shared by every EmotionalMemory on this path and written behind
+        self.profile_store = self.backend.profile_store()
+        self._legacy_checked = set()
+        self._reconciled = set()
+        
+        # Summaries of older periods whose raw turns have been compacted away
+        self.summaries = SummaryStore(os.path.join(self.memory_path, 'summaries'))
+        
+        # Top-K special memories: heap by importance, per-type index, snapshot plus log
+        self.special_memories = get_topk_store(self.memory_path, self.max_long_term_memory)
     
     def store_interaction(self, user_id, user_message, ai_response, emotion, mood):
         """Store conversation interaction in memory"""
@@ -48,8 +89,8 @@ class EmotionalMemory:
         # Persist to disk
         self._persist_interaction(user_id, interaction)
     
-    def get_conversation_context(self, user_id, limit=10):
-        """Get recent conversation context for generating responses"""
+    def get_conversation_context(self, user_id, limit=10, summary_limit=3):
+        """Get recent conversation context (summaries of older periods plus recent turns)"""
         
         if not user_id:
             return {}
@@ -68,7 +109,9 @@ class EmotionalMemory:
             'emotional_trajectory': self._analyze_emotional_trajectory(recent_interactions),
             'relationship_level': self.get_relationship_level(user_id),
             'memories': self._get_significant_memories(user_id),
-            'user_preferences': self.get_user_preferences(user_id)
+            'user_preferences': self.get_user_preferences(user_id),
+            'recent_interactions': recent_interactions,
+            'summaries': self.summaries.recent(user_id, summary_limit)
         }
         
         return context
@@ -76,82 +119,63 @@ class EmotionalMemory:
     def get_user_profile(self, user_id):
         """Get comprehensive user profile"""
         
-        if user_id in self.user_profiles_cache:
-            return self.user_profiles_cache[user_id]
-        
-        profile_file = f"{self.memory_path}/{user_id}_profile.json"
-        
-        if os.path.exists(profile_file):
-            with open(profile_file, 'r', encoding='utf-8') as f:
-                profile = json.load(f)
-                self.user_profiles_cache[user_id] = profile
-                return profile
-        
-        # Create new profile
-        new_profile = {
-            'user_id': user_id,
-            'first_interaction': datetime.now().isoformat(),
-            'total_interactions': 0,
-            'relationship_level': 0,
-            'favorite_moods': {},
-            'emotional_patterns': {},
-            'special_memories': [],
-            'preferences': {},
-            'relationship_milestones': []
-        }
+        profile = self.profile_store.get(user_id)
+        if profile is None:
+            # Create new profile
+            profile = {
+                'user_id': user_id,
+                'first_interaction': datetime.now().isoformat(),
+                'total_interactions': 0,
+                'relationship_level': 0,
+                'favorite_moods': {},
+                'emotional_patterns': {},
+                'special_memories': [],
+                'preferences': {},
+                'relationship_milestones': []
+            }
+            
+            # Written once the user actually interacts
+            self.profile_store.put(user_id, profile, dirty=False)
         
-        self.user_profiles_cache[user_id] = new_profile
-        return new_profile
+        if user_id not in self._reconciled:
+            self._reconciled.add(user_id)
+            self._reconcile_profile(user_id, profile)
+        
+        return profile
     
     def get_relationship_level(self, user_id):
-        """Calculate current relationship level (0-10)"""
+        """Current relationship level (0-10) from the profile's running aggregate"""
         
         profile = self.get_user_profile(user_id)
         
-        # Base level on interaction count and quality
-        interaction_count = profile.get('total_interactions', 0)
-        
-        # Relationship progression milestones
-        milestones = {
-            0: 0,    # Strangers
-            5: 1,    # Getting to know
-            15: 2,   # Friends
-            30: 3,   # Good friends
-            50: 4,   # Close friends
-            75: 5,   # Very close
-            100: 6,  # Romantic interest
-            150: 7,  # Dating
-            200: 8,  # Serious relationship
-            300: 9,  # Deeply in love
-            500: 10  # Soulmates
-        }
-        
-        level = 0
-        for threshold, lvl in milestones.items():
-            if interaction_count >= threshold:
-                level = lvl
-        
-        # Adjust based on emotional quality
-        emotional_bonus = self._calculate_emotional_bonus(user_id)
-        level = min(10, level + emotional_bonus)
+        # Base level on interaction count, adjusted by emotional quality
+        level = self._milestone_level(profile.get('total_interactions', 0))
+        level += self._calculate_emotional_bonus(user_id)
         
-        return level
+        return max(0, min(10, level))
     
     def get_memories(self, user_id, memory_type='all'):
         """Retrieve stored memories for user"""
         
-        memories_file = f"{self.memory_path}/{user_id}_memories.json"
-        
-        if os.path.exists(memories_file):
-            with open(memories_file, 'r', encoding='utf-8') as f:
-                memories = json.load(f)
-                
-                if memory_type == 'all':
-                    return memories
-                else:
-                    return [m for m in memories if m.get('type') == memory_type]
-        
-        return []
+        return self.special_memories.get(user_id, memory_type)
+    
+    def _store_long_term_memory(self, user_id, interaction):
+        """Keep a turn leaving the short-term cache as a special memory if it is significant"""
+        
+        content = interaction.get('user_message', '')
+        importance = self._calculate_memory_importance(content)
+        
+        # Ordinary turns stay in the interaction log only, so they cannot crowd out special memories
+        if importance < self.LONG_TERM_MIN_IMPORTANCE:
+            return
+        
+        self.special_memories.add(user_id, {
+            'timestamp': interaction['timestamp'],
+            'content': content,
+            'type': 'conversation',
+            'importance_score': importance,
+            'memory_id': interaction.get('interaction_id')
+        })
     
     def store_special_memory(self, user_id, memory_content, memory_type='romantic'):
         """Store a special/significant memory"""
@@ -164,19 +188,8 @@ class EmotionalMemory:
             'memory_id': hashlib.md5(f"{user_id}{memory_content}".encode()).hexdigest()[:8]
         }
         
-        # Load existing memories
-        memories = self.get_memories(user_id)
-        memories.append(memory)
-        
-        # Keep only most important memories (limit storage)
-        if len(memories) > self.max_long_term_memory:
-            memories.sort(key=lambda x: x['importance_score'], reverse=True)
-            memories = memories[:self.max_long_term_memory]
-        
-        # Save memories
-        memories_file = f"{self.memory_path}/{user_id}_memories.json"
-        with open(memories_file, 'w', encoding='utf-8') as f:
-            json.dump(memories, f, indent=2)
+        # Kept only if it ranks among the most important memories
+        self.special_memories.add(user_id, memory)
     
     def get_relationship_analysis(self, user_id):
         """Generate comprehensive relationship analysis"""
@@ -186,7 +199,7 @@ class EmotionalMemory:
         
         analysis = {
             'relationship_level': self.get_relationship_level(user_id),
-            'total_interactions': len(interactions),
+            'total_interactions': self.count_interactions(user_id),
             'relationship_duration': self._calculate_relationship_duration(profile),
             'emotional_compatibility': self._analyze_emotional_compatibility(interactions),
             'communication_patterns': self._analyze_communication_patterns(interactions),
@@ -213,6 +226,18 @@ class EmotionalMemory:
         
         return analytics
     
+    def count_interactions(self, user_id):
+        """Total stored interactions for a user, without reading them"""
+        
+        flush_jsonl_writer()
+        return self._interaction_log(user_id).count()
+    
+    def get_interactions_between(self, user_id, start=None, end=None):
+        """Stored interactions with start <= timestamp < end, oldest first"""
+        
+        flush_jsonl_writer()
+        return list(self._interaction_log(user_id).scan(start, end))
+    
     def get_user_preferences(self, user_id):
         """Get user's conversation and interaction preferences"""
         
@@ -236,6 +261,19 @@ class EmotionalMemory:
         """Update user profile with new interaction data"""
         
         profile = self.get_user_profile(user_id)
+        self._count_interaction(profile, interaction)
+        
+        # Roll the relationship aggregate forward
+        aggregate = self._relationship_aggregate(user_id, profile, exclude_latest=True)
+        self._add_to_aggregate(aggregate, interaction.get('user_emotion'), interaction['timestamp'])
+        profile['relationship_level'] = self.get_relationship_level(user_id)
+        
+        # Written behind by the profile store
+        self.profile_store.mark_dirty(user_id)
+    
+    def _count_interaction(self, profile, interaction):
+        """Add one interaction to the profile's counters"""
+        
         profile['total_interactions'] += 1
         profile['last_interaction'] = interaction['timestamp']
         
@@ -254,26 +292,42 @@ class EmotionalMemory:
                 profile['emotional_patterns'][emotion] += 1
             else:
                 profile['emotional_patterns'][emotion] = 1
-        
-        # Save updated profile
-        self.user_profiles_cache[user_id] = profile
-        self._persist_user_profile(user_id, profile)
+    
+    def _reconcile_profile(self, user_id, profile):
+        """Catch a profile up with interactions logged after its last write
+        
+        Profiles are written behind, so a crash can lose the latest updates
+        while the interaction log kept the turns. The missing turns are
+        counted again and the relationship aggregate is rebuilt from the log.
+        """
+        
+        missing = self.count_interactions(user_id) - profile.get('total_interactions', 0)
+        if missing <= 0:
+            return
+        
+        log = self._interaction_log(user_id)
+        if not profile.get('total_interactions'):
+            first = next(iter(log.scan()), None)
+            if first and first.get('timestamp'):
+                profile['first_interaction'] = first['timestamp']
+        
+        # Turns dropped by compaction cannot be replayed; only their count is restored
+        replay = log.tail(missing)
+        profile['total_interactions'] += missing - len(replay)
+        for interaction in replay:
+            self._count_interaction(profile, interaction)
+        
+        profile.pop('relationship_aggregate', None)
+        self._relationship_aggregate(user_id, profile)
+        profile['relationship_level'] = self.get_relationship_level(user_id)
+        
+        self.profile_store.mark_dirty(user_id)
     
     def _persist_interaction(self, user_id, interaction):
         """Persist interaction to disk"""
         
-        daily_file = f"{self.memory_path}/{user_id}_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
-        
-        with open(daily_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(interaction) + '\n')
-    
-    def _persist_user_profile(self, user_id, profile):
-        """Persist user profile to disk"""
-        
-        profile_file = f"{self.memory_path}/{user_id}_profile.json"
-        
-        with open(profile_file, 'w', encoding='utf-8') as f:
-            json.dump(profile, f, indent=2)
+        self._interaction_log(user_id)
+        self.backend.append('interaction', user_id, interaction)
     
     def _extract_topics(self, interactions):
         """Extract conversation topics from interactions"""
@@ -314,20 +368,73 @@ class EmotionalMemory:
         else:
             return 'stable'
     
+    def _milestone_level(self, interaction_count):
+        """Relationship level reached by interaction count alone"""
+        
+        level = 0
+        for threshold, lvl in self.RELATIONSHIP_MILESTONES:
+            if interaction_count < threshold:
+                break
+            level = lvl
+        return level
+    
+    def _relationship_aggregate(self, user_id, profile, exclude_latest=False):
+        """Rolling window of recent emotions kept in the profile
+        
+        Profiles written before the aggregate existed are backfilled once from
+        the interaction logs. Pass `exclude_latest` when total_interactions
+        already counts the interaction being added.
+        """
+        
+        aggregate = profile.get('relationship_aggregate')
+        if aggregate is None:
+            aggregate = profile['relationship_aggregate'] = {
+                'recent_emotions': [],
+                'recent_timestamps': [],
+                'positive_count': 0
+            }
+            
+            if profile.get('total_interactions', 0) > (1 if exclude_latest else 0):
+                for interaction in reversed(self._load_recent_interactions(user_id, self.EMOTION_WINDOW)):
+                    self._add_to_aggregate(aggregate, interaction.get('user_emotion'), interaction.get('timestamp', ''))
+        
+        return aggregate
+    
+    def _add_to_aggregate(self, aggregate, emotion, timestamp):
+        """Push one interaction into the window, evicting the oldest"""
+        
+        aggregate['recent_emotions'].append(emotion)
+        aggregate['recent_timestamps'].append(timestamp)
+        if emotion in self.POSITIVE_EMOTIONS:
+            aggregate['positive_count'] += 1
+        
+        if len(aggregate['recent_emotions']) > self.EMOTION_WINDOW:
+            oldest = aggregate['recent_emotions'].pop(0)
+            aggregate['recent_timestamps'].pop(0)
+            if oldest in self.POSITIVE_EMOTIONS:
+                aggregate['positive_count'] -= 1
+    
     def _calculate_emotional_bonus(self, user_id):
         """Calculate emotional quality bonus for relationship level"""
         
-        interactions = self._load_recent_interactions(user_id, 20)
+        profile = self.get_user_profile(user_id)
+        aggregate = self._relationship_aggregate(user_id, profile)
+        
+        emotions = aggregate['recent_emotions']
+        if not emotions:
+            return 0
         
-        if not interactions:
+        # Only interactions from the last week count; the window is time ordered
+        cutoff = (datetime.now() - timedelta(days=self.EMOTION_WINDOW_DAYS - 1)).strftime('%Y-%m-%d')
+        if aggregate['recent_timestamps'][-1][:10] < cutoff:
             return 0
         
-        # Count positive emotional interactions
-        positive_emotions = ['romantic', 'happy', 'excited', 'playful', 'loving']
-        positive_count = sum(1 for i in interactions 
-                           if i.get('user_emotion') in positive_emotions)
+        total, positive_count = len(emotions), aggregate['positive_count']
+        if aggregate['recent_timestamps'][0][:10] < cutoff:
+            recent = [e for e, t in zip(emotions, aggregate['recent_timestamps']) if t[:10] >= cutoff]
+            total, positive_count = len(recent), sum(1 for e in recent if e in self.POSITIVE_EMOTIONS)
         
-        ratio = positive_count / len(interactions)
+        ratio = positive_count / total
         
         if ratio > 0.8:
             return 2
@@ -338,33 +445,56 @@ class EmotionalMemory:
         else:
             return -1
     
-    def _load_recent_interactions(self, user_id, limit):
-        """Load recent interactions from disk"""
+    def _interaction_log(self, user_id):
+        """Get a user's interaction log, importing legacy daily files on first use"""
+        
+        log = self.backend.log('interaction', user_id)
+        
+        if user_id not in self._legacy_checked:
+            self._legacy_checked.add(user_id)
+            if log.count() == 0:
+                self._import_daily_files(user_id, log)
+        
+        return log
+    
+    def _import_daily_files(self, user_id, log):
+        """Copy interactions from {user_id}_{date}.jsonl files into the log"""
+        
+        prefix = f"{user_id}_"
+        daily_files = sorted(
+            name for name in os.listdir(self.memory_path)
+            if name.startswith(prefix) and name.endswith('.jsonl') and len(name) == len(prefix) + len('YYYY-MM-DD.jsonl')
+        )
         
         interactions = []
+        for name in daily_files:
+            with open(os.path.join(self.memory_path, name), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        interactions.append(json.loads(line.strip()))
+                    except json.JSONDecodeError:
+                        continue
+        
+        if interactions:
+            interactions.sort(key=lambda x: x.get('timestamp', ''))
+            log.write_batch([log.prepare(interaction) for interaction in interactions])
+    
+    def _load_recent_interactions(self, user_id, limit):
+        """Load the most recent stored interactions, newest first"""
         
-        # Load from recent daily files
-        for i in range(7):  # Check last 7 days
-            date = datetime.now() - timedelta(days=i)
-            daily_file = f"{self.memory_path}/{user_id}_{date.strftime('%Y-%m-%d')}.jsonl"
-            
-            if os.path.exists(daily_file):
-                with open(daily_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        try:
-                            interaction = json.loads(line.strip())
-                            interactions.append(interaction)
-                        except json.JSONDecodeError:
-                            continue
-        
-        # Sort by timestamp and return most recent
-        interactions.sort(key=lambda x: x['timestamp'], reverse=True)
-        return interactions[:limit]
+        flush_jsonl_writer()
+        return list(reversed(self._interaction_log(user_id).tail(limit)))
     
     def _load_all_interactions(self, user_id):
-        """Load all interactions for user"""
-        # Implementation for loading complete interaction history
-        return self._load_recent_interactions(user_id, 10000)  # Large number to get all
+        """Load all stored interactions for user, newest first"""
+        
+        flush_jsonl_writer()
+        return list(reversed(list(self._interaction_log(user_id).scan())))
+    
+    def _get_significant_memories(self, user_id, limit=10):
+        """Get the most important special memories for prompt context"""
+        
+        return self.special_memories.top(user_id, limit)
     
     def _calculate_memory_importance(self, content):
         """Calculate importance score for memory"""
@@ -377,7 +507,4 @@ class EmotionalMemory:
     def store_learning_data(self, user_id, learning_data):
         """Store learning data for training improvements"""
         
-        learning_file = f"{self.memory_path}/{user_id}_learning.jsonl"
-        
-        with open(learning_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(learning_data) + '\n')
\ No newline at end of file
+        self.backend.append('learning', user_id, learning_data)
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""
+Interaction Log for Seraphina
+Per-user segmented append-only log with an offset/timestamp index
+"""
+import os
+import json
+import time
+import fcntl
+import struct
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+# Index entry: byte offset and length of the record in its segment, record timestamp
+INDEX_ENTRY = struct.Struct('<IId')
+
+def to_epoch(value):
+    """Epoch seconds from a datetime, ISO string or number (None passes through)"""
+
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+class InteractionLog:
+    """Append-only interaction log for one user
+
+    Records are JSON lines in numbered segments (00000001.jsonl, ...) that
+    roll over by size. Each segment has a sidecar .idx of fixed-width
+    entries, so counts come from file sizes, tail reads touch only the last
+    entries, and time-range scans bisect the index. Only records that are
+    returned are parsed.
+
+    Writers take an exclusive lock on the directory's .lock file, so several
+    worker processes can append to the same log.
+
+    Old full segments can be expired once they have been summarized; the
+    number of records dropped is kept in an `expired` file so counts still
+    cover the whole history.
+    """
+
+    def __init__(self, path, max_segment_bytes=1024 * 1024):
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.Lock()
+        self._sealed_index = {}   # sequence -> (offsets, lengths, timestamps) for full segments
+
+    def __repr__(self):
+        return f"InteractionLog({self.path!r})"
+
+    def _segment_file(self, sequence):
+        return os.path.join(self.path, f"{sequence:08d}.jsonl")
+
+    def _index_file(self, sequence):
+        return os.path.join(self.path, f"{sequence:08d}.idx")
+
+    def _expired_file(self):
+        return os.path.join(self.path, 'expired')
+
+    def _sequences(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name[:-4]) for name in os.listdir(self.path) if name.endswith('.idx'))
+
+    # Writing
+
+    def prepare(self, record):
+        """Serialize a record on the caller's thread (JSONL writer sink hook)"""
+
+        timestamp = to_epoch(record.get('timestamp')) if record.get('timestamp') else time.time()
+        return timestamp, (json.dumps(record) + '\n').encode('utf-8')
+
+    def append(self, record):
+        """Append one record synchronously"""
+        self.write_batch([self.prepare(record)])
+
+    def write_batch(self, items, fsync=False):
+        """Append prepared (timestamp, line) items (JSONL writer sink hook)"""
+
+        os.makedirs(self.path, exist_ok=True)
+
+        with self._lock, open(os.path.join(self.path, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                sequences = self._sequences()
+                sequence = sequences[-1] if sequences else 1
+                size = self._recover(sequence)
+
+                data, entries = [], []
+                for timestamp, line in items:
+                    if size and size + len(line) > self.max_segment_bytes:
+                        self._write_segment(sequence, data, entries, fsync)
+                        sequence += 1
+                        size, data, entries = 0, [], []
+
+                    entries.append(INDEX_ENTRY.pack(size, len(line), timestamp))
+                    data.append(line)
+                    size += len(line)
+
+                self._write_segment(sequence, data, entries, fsync)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_segment(self, sequence, data, entries, fsync):
+        """Append records, then their index entries; the index is the commit point"""
+
+        with open(self._segment_file(sequence), 'ab') as segment:
+            segment.write(b''.join(data))
+            segment.flush()
+            if fsync:
+                os.fsync(segment.fileno())
+
+        with open(self._index_file(sequence), 'ab') as index:
+            index.write(b''.join(entries))
+            index.flush()
+            if fsync:
+                os.fsync(index.fileno())
+
+    def _recover(self, sequence):
+        """Drop partial writes from an interrupted append; returns the segment size"""
+
+        index_file = self._index_file(sequence)
+        segment_file = self._segment_file(sequence)
+
+        index_size = os.path.getsize(index_file) if os.path.exists(index_file) else 0
+        segment_size = os.path.getsize(segment_file) if os.path.exists(segment_file) else 0
+
+        entries = index_size // INDEX_ENTRY.size
+        end = self._entry_end(index_file, entries)
+
+        if index_size == entries * INDEX_ENTRY.size and segment_size == end:
+            return end
+
+        # A torn index entry, index entries past the end of the segment, or
+        # records written after the last index entry
+        while entries and end > segment_size:
+            entries -= 1
+            end = self._entry_end(index_file, entries)
+
+        with open(index_file, 'ab') as f:
+            f.truncate(entries * INDEX_ENTRY.size)
+        with open(segment_file, 'ab') as f:
+            f.truncate(end)
+
+        return end
+
+    @staticmethod
+    def _entry_end(index_file, entries):
+        """End offset of the last of the first `entries` records"""
+
+        if not entries:
+            return 0
+
+        with open(index_file, 'rb') as f:
+            f.seek((entries - 1) * INDEX_ENTRY.size)
+            offset, length, _ = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+        return offset + length
+
+    def expire_before(self, cutoff):
+        """Delete full segments whose records are all older than cutoff; returns records removed"""
+
+        cutoff = to_epoch(cutoff)
+        removed = 0
+
+        with self._lock, open(os.path.join(self.path, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # The last segment is still being written
+                for sequence in self._sequences()[:-1]:
+                    timestamps = self._load_index(sequence, sealed=True)[2]
+                    if timestamps and timestamps[-1] >= cutoff:
+                        break
+
+                    # The index goes first: it is what marks a segment as present
+                    os.remove(self._index_file(sequence))
+                    os.remove(self._segment_file(sequence))
+                    self._sealed_index.pop(sequence, None)
+                    removed += len(timestamps)
+
+                if removed:
+                    temp_file = f"{self._expired_file()}.{os.getpid()}.tmp"
+                    with open(temp_file, 'w', encoding='utf-8') as f:
+                        f.write(str(self.expired_count() + removed))
+                    os.replace(temp_file, self._expired_file())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        return removed
+
+    # Reading
+
+    def count(self):
+        """Total number of records, including expired ones"""
+
+        live = 0
+        for sequence in self._sequences():
+            try:
+                live += os.path.getsize(self._index_file(sequence)) // INDEX_ENTRY.size
+            except FileNotFoundError:
+                # Expired by another process meanwhile
+                continue
+        return live + self.expired_count()
+
+    def expired_count(self):
+        """Records dropped by expire_before"""
+
+        try:
+            with open(self._expired_file(), 'r', encoding='utf-8') as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def tail(self, n):
+        """Last n records, oldest first"""
+
+        chunks = []
+        remaining = n
+
+        for sequence in reversed(self._sequences()):
+            if remaining <= 0:
+                break
+
+            try:
+                entries = os.path.getsize(self._index_file(sequence)) // INDEX_ENTRY.size
+                take = min(remaining, entries)
+                if not take:
+                    continue
+
+                with open(self._index_file(sequence), 'rb') as f:
+                    f.seek((entries - take) * INDEX_ENTRY.size)
+                    index = [INDEX_ENTRY.unpack_from(block, 0)
+                             for block in self._blocks(f.read(take * INDEX_ENTRY.size))]
+
+                chunks.append(self._read_records(sequence, index))
+            except FileNotFoundError:
+                # Expired by another process meanwhile
+                continue
+            remaining -= take
+
+        return [record for chunk in reversed(chunks) for record in chunk]
+
+    def scan(self, start=None, end=None):
+        """Records with start <= timestamp < end, oldest first (either bound may be None)"""
+
+        start, end = to_epoch(start), to_epoch(end)
+        sequences = self._sequences()
+
+        for position, sequence in enumerate(sequences):
+            try:
+                offsets, lengths, timestamps = self._load_index(sequence, sealed=position < len(sequences) - 1)
+            except FileNotFoundError:
+                # Expired by another process meanwhile
+                continue
+            if not timestamps:
+                continue
+            if start is not None and timestamps[-1] < start:
+                continue
+            if end is not None and timestamps[0] >= end:
+                break
+
+            first = bisect.bisect_left(timestamps, start) if start is not None else 0
+            last = bisect.bisect_left(timestamps, end) if end is not None else len(timestamps)
+            if first < last:
+                index = list(zip(offsets[first:last], lengths[first:last], timestamps[first:last]))
+                try:
+                    records = self._read_records(sequence, index)
+                except FileNotFoundError:
+                    continue
+                yield from records
+
+    def _load_index(self, sequence, sealed):
+        """Index columns for a segment; full segments never change, so they are cached"""
+
+        if sequence in self._sealed_index:
+            return self._sealed_index[sequence]
+
+        with open(self._index_file(sequence), 'rb') as f:
+            data = f.read()
+
+        entries = [INDEX_ENTRY.unpack_from(block, 0) for block in self._blocks(data)]
+        columns = ([e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries])
+
+        if sealed:
+            self._sealed_index[sequence] = columns
+        return columns
+
+    def _read_records(self, sequence, index):
+        """Read a contiguous run of indexed records with one read"""
+
+        if not index:
+            return []
+
+        first_offset = index[0][0]
+        last_offset, last_length = index[-1][0], index[-1][1]
+
+        with open(self._segment_file(sequence), 'rb') as f:
+            f.seek(first_offset)
+            data = f.read(last_offset + last_length - first_offset)
+
+        records = []
+        for offset, length, _ in index:
+            line = data[offset - first_offset:offset - first_offset + length]
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return records
+
+    @staticmethod
+    def _blocks(data):
+        size = INDEX_ENTRY.size
+        return (data[i:i + size] for i in range(0, len(data) - size + 1, size))
+
+class InteractionLogStore:
+    """Per-user interaction logs under one directory"""
+
+    def __init__(self, base_path, max_segment_bytes=1024 * 1024, max_open_logs=1024):
+        self.base_path = base_path
+        self.max_segment_bytes = max_segment_bytes
+        self.max_open_logs = max_open_logs
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_ids(self):
+        """Users with a log on disk"""
+
+        if not os.path.isdir(self.base_path):
+            return []
+        return [unquote(name) for name in os.listdir(self.base_path)
+                if os.path.isdir(os.path.join(self.base_path, name))]
+
+    def log(self, user_id):
+        """Get the log for a user"""
+
+        with self._lock:
+            log = self._logs.get(user_id)
+            if log is None:
+                # User ids come from requests; keep them inside base_path
+                path = os.path.join(self.base_path, quote(str(user_id), safe='').replace('.', '%2E'))
+                log = self._logs[user_id] = InteractionLog(path, self.max_segment_bytes)
+                while len(self._logs) > self.max_open_logs:
+                    self._logs.popitem(last=False)
+            else:
+                self._logs.move_to_end(user_id)
+            return log
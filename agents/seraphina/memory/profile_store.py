@@ -0,0 +1,286 @@
+"""
+Profile Store for Seraphina
+Write-behind user profile cache with batched atomic flushes
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from agents.process_local import ProcessLocal
+
+class ProfileStore:
+    """In-memory user profiles written back to {user_id}_profile.json in batches
+
+    Callers change a profile in place and call `mark_dirty`. A background
+    thread writes dirty profiles every `flush_interval` seconds, so a busy
+    user costs one write per interval instead of one per message. Profiles
+    pushed out of the LRU cache while dirty stay readable until the flusher
+    has written them.
+
+    Every write goes to a temp file that is fsynced and renamed over the
+    profile, so a crash leaves either the old or the new version. Temp
+    files left behind by a crash are removed on startup.
+
+    With a `backend` (see agents.memory_backend) profiles are loaded from and
+    written to it instead, each flush as one batch.
+    """
+
+    def __init__(self, path, flush_interval=5.0, max_cached=10000, fsync=True, backend=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self.fsync = fsync
+        self.backend = backend
+
+        self._profiles = OrderedDict()   # user_id -> profile, least recently used first
+        self._dirty = {}                 # user_id -> monotonic time first marked dirty
+        self._evicted = {}               # dirty profiles pushed out of the cache, awaiting flush
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        # The flusher thread does not survive a fork
+        self._flusher = ProcessLocal(self._start_flusher)
+
+        self.stats = {
+            'updates': 0,
+            'writes': 0,
+            'bytes_written': 0,
+            'write_errors': 0,
+            'corrupt_profiles': 0,
+            'max_flush_lag': 0.0,
+            'total_flush_lag': 0.0
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        self._remove_temp_files()
+
+    def profile_file(self, user_id):
+        # User ids come from requests; keep them inside path
+        return os.path.join(self.path, quote(str(user_id), safe='').replace('.', '%2E') + '_profile.json')
+
+    def get(self, user_id):
+        """Cached or stored profile, or None if the user has none"""
+
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                profile = self._evicted.get(user_id)
+                if profile is None:
+                    profile = self._load(user_id)
+                    if profile is None:
+                        return None
+                self._cache(user_id, profile)
+            else:
+                self._profiles.move_to_end(user_id)
+            return profile
+
+    def put(self, user_id, profile, dirty=True):
+        """Cache a (new) profile, scheduling it for writing unless `dirty` is False"""
+
+        with self._lock:
+            self._cache(user_id, profile)
+            if dirty:
+                self.mark_dirty(user_id)
+
+    def mark_dirty(self, user_id):
+        """Schedule a profile changed in place for the next flush"""
+
+        with self._lock:
+            self.stats['updates'] += 1
+            self._dirty.setdefault(user_id, time.monotonic())
+
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write every dirty profile now"""
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            pending = []
+            for user_id, dirty_since in dirty.items():
+                profile = self._profiles.get(user_id) or self._evicted.get(user_id)
+                if profile is None:
+                    continue
+                try:
+                    pending.append((user_id, dirty_since, json.dumps(profile)))
+                except RuntimeError:
+                    # Changed mid-serialization by a request thread; next flush retries
+                    self._dirty[user_id] = dirty_since
+
+        written = self._write_pending(pending)
+
+        for user_id, dirty_since, data in pending:
+            if user_id not in written:
+                # Keep it dirty so the next flush retries
+                with self._lock:
+                    self._dirty.setdefault(user_id, dirty_since)
+                continue
+
+            lag = time.monotonic() - dirty_since
+            with self._lock:
+                self.stats['max_flush_lag'] = max(self.stats['max_flush_lag'], lag)
+                self.stats['total_flush_lag'] += lag
+                if user_id not in self._dirty:
+                    self._evicted.pop(user_id, None)
+
+    def close(self):
+        """Flush remaining dirty profiles (at exit or worker shutdown)"""
+
+        self._wake.set()
+        self.flush()
+
+    def _cache(self, user_id, profile):
+        """Add a profile to the LRU cache (lock held)"""
+
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        self._evicted.pop(user_id, None)
+
+        while len(self._profiles) > self.max_cached:
+            old_id, old_profile = self._profiles.popitem(last=False)
+            if old_id in self._dirty:
+                self._evicted[old_id] = old_profile
+                self._wake.set()
+
+    def _load(self, user_id):
+        if self.backend is not None:
+            return self.backend.load_profile(user_id)
+
+        profile_file = self.profile_file(user_id)
+        if not os.path.exists(profile_file):
+            return None
+
+        try:
+            with open(profile_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            # Only files from before atomic writes can be torn; start the profile over
+            print(f"Corrupt profile for {user_id}, starting a new one: {e}")
+            self.stats['corrupt_profiles'] += 1
+            os.replace(profile_file, f"{profile_file}.corrupt")
+            return None
+
+    def _write_pending(self, pending):
+        """Write serialized profiles; returns the ids that were written"""
+
+        if self.backend is None:
+            return {user_id for user_id, _, data in pending if self._write(user_id, data)}
+
+        if not pending:
+            return set()
+
+        try:
+            self.backend.write_profiles([(user_id, data) for user_id, _, data in pending])
+        except Exception as e:
+            print(f"Profile write error: {e}")
+            self.stats['write_errors'] += 1
+            return set()
+
+        self.stats['writes'] += len(pending)
+        self.stats['bytes_written'] += sum(len(data) for _, _, data in pending)
+        return {user_id for user_id, _, _ in pending}
+
+    def _write(self, user_id, data):
+        """Atomically replace a profile file"""
+
+        profile_file = self.profile_file(user_id)
+        temp_file = f"{profile_file}.{os.getpid()}.tmp"
+
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(temp_file, profile_file)
+        except OSError as e:
+            print(f"Profile write error for {user_id}: {e}")
+            self.stats['write_errors'] += 1
+            return False
+
+        self.stats['writes'] += 1
+        self.stats['bytes_written'] += len(data)
+        return True
+
+    def _remove_temp_files(self):
+        """Remove temp files whose writing process is gone"""
+
+        for name in os.listdir(self.path):
+            if not (name.endswith('.tmp') and '_profile.json.' in name):
+                continue
+
+            pid = name[:-len('.tmp')].rsplit('.', 1)[-1]
+            if pid.isdigit() and self._process_alive(int(pid)):
+                continue
+
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _ensure_flusher(self):
+        self._flusher.get()
+
+    def _start_flusher(self):
+        flusher = threading.Thread(target=self._flush_loop, name='profile-flusher', daemon=True)
+        flusher.start()
+        return flusher
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Profile flush error: {e}")
+
+    def get_stats(self):
+        """Get write-behind counters"""
+
+        with self._lock:
+            writes = self.stats['writes']
+            return {
+                **self.stats,
+                'cached': len(self._profiles),
+                'dirty': len(self._dirty),
+                'avg_flush_lag': self.stats['total_flush_lag'] / writes if writes else 0,
+                # Profile writes per profile update; 1.0 means every update was written
+                'write_amplification': writes / self.stats['updates'] if self.stats['updates'] else 0,
+                'bytes_per_update': self.stats['bytes_written'] / self.stats['updates'] if self.stats['updates'] else 0
+            }
+
+# (path, backend name) -> ProfileStore; dirty profiles belong to the process that changed them
+_stores = ProcessLocal(dict)
+_stores_lock = threading.Lock()
+
+def get_profile_store(path, backend=None):
+    """Get the shared profile store for a directory (and backend)"""
+
+    key = (path, backend.name if backend is not None else 'file')
+    stores = _stores.get()
+    with _stores_lock:
+        store = stores.get(key)
+        if store is None:
+            store = stores[key] = ProfileStore(path, backend=backend)
+        return store
+
+def flush_profile_stores():
+    """Write every dirty profile in this process"""
+
+    for store in list((_stores.peek() or {}).values()):
+        store.close()
+
+atexit.register(flush_profile_stores)
@@ -0,0 +1,77 @@
+"""
+Summary Store for Seraphina
+Compact per-period conversation summaries that replace expired raw turns
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from agents.seraphina.memory.interaction_log import to_epoch
+
+class SummaryStore:
+    """Per-user conversation summaries in {user}.jsonl, oldest first
+
+    Only the compactor appends. Readers cache each user's summaries and
+    reload them when the file size changes, so other workers' compactions
+    are picked up.
+    """
+
+    def __init__(self, path, max_cached=10000):
+        self.path = path
+        self.max_cached = max_cached
+        self._cache = OrderedDict()   # user_id -> (file size, summaries)
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def summary_file(self, user_id):
+        # User ids come from requests; keep them inside path
+        return os.path.join(self.path, quote(str(user_id), safe='').replace('.', '%2E') + '.jsonl')
+
+    def all(self, user_id):
+        """Every summary for a user, oldest first"""
+
+        summary_file = self.summary_file(user_id)
+        try:
+            size = os.path.getsize(summary_file)
+        except FileNotFoundError:
+            return []
+
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] == size:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+
+        summaries = []
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    summaries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+        with self._lock:
+            self._cache[user_id] = (size, summaries)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+        return summaries
+
+    def recent(self, user_id, limit):
+        """The latest summaries, oldest first"""
+        return self.all(user_id)[-limit:] if limit else []
+
+    def summarized_until(self, user_id):
+        """Epoch seconds up to which interactions are summarized, or None"""
+
+        summaries = self.all(user_id)
+        return to_epoch(summaries[-1]['end']) if summaries else None
+
+    def append(self, user_id, summary):
+        with open(self.summary_file(user_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(summary) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
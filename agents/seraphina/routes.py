@@ -2,16 +2,29 @@
 Seraphina Routes - AI Girlfriend Agent
 Romantic, flirty, and passionate AI companion routes
 """
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, render_template, request, jsonify, session, Response, stream_with_context
 from .logic import SerafinaEngine
 from .memory.emotional_memory import EmotionalMemory
 from .websocket.socket import SerafinaSocket
+from agents.scheduler import QueueFullError, plan_from_session
+import json
 import uuid
+import itertools
 
 seraphina_bp = Blueprint('seraphina', __name__)
 seraphina_engine = SerafinaEngine()
 emotional_memory = EmotionalMemory()
-seraphina_socket = SerafinaSocket()
+seraphina_socket = SerafinaSocket(seraphina_engine, emotional_memory)
+
+def busy_response(error):
+    """429 response asking the client to retry once the generation queue drains"""
+    response = jsonify({
+        'error': 'busy',
+        'message': f"Seraphina is talking to a lot of people right now 💕 Please try again in {error.retry_after}s",
+        'retry_after': error.retry_after
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
 
 @seraphina_bp.route('/')
 def seraphina_home():
@@ -44,7 +57,8 @@ def seraphina_chat():
         response = seraphina_engine.generate_romantic_response(
             user_message, 
             user_id=user_id,
-            mood=mood
+            mood=mood,
+            plan=plan_from_session(session)
         )
         
         # Store interaction in emotional memory
@@ -64,8 +78,54 @@ def seraphina_chat():
             'relationship_status': emotional_memory.get_relationship_level(user_id)
         })
         
+    except QueueFullError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@seraphina_bp.route('/chat/stream', methods=['POST'])
+def seraphina_chat_stream():
+    """Handle romantic chat interactions, streaming tokens as NDJSON"""
+    data = request.get_json() or {}
+    user_message = data.get('message', '')
+    user_id = session.get('user_id')
+    mood = data.get('mood', 'romantic')
+    plan = plan_from_session(session)
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    events = seraphina_engine.stream_romantic_response(user_message, user_id=user_id, mood=mood, plan=plan)
+    
+    # Admission happens before the first event, so pull it before any headers go out:
+    # a full queue is still a 429 with Retry-After rather than a 200 stream
+    try:
+        first_event = next(events)
+    except QueueFullError as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        try:
+            for event in itertools.chain([first_event], events):
+                if event['type'] == 'done':
+                    emotional_memory.store_interaction(
+                        user_id,
+                        user_message,
+                        event['message'],
+                        event['emotion'],
+                        mood
+                    )
+                    event['relationship_status'] = emotional_memory.get_relationship_level(user_id)
+                yield json.dumps(event) + '\n'
+        except QueueFullError as e:
+            yield json.dumps({'type': 'busy', 'error': 'busy', 'retry_after': e.retry_after}) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
 
 @seraphina_bp.route('/mood/<mood_type>')
 def set_mood(mood_type):
@@ -2,14 +2,18 @@
 WebSocket Handler for Seraphina
 Real-time romantic conversations and emotional updates
 """
+from flask import session
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime
 import json
+from agents.scheduler import QueueFullError, plan_from_session
 
 class SerafinaSocket:
     """WebSocket handler for real-time romantic interactions"""
     
-    def __init__(self):
+    def __init__(self, engine=None, memory=None):
+        self.engine = engine
+        self.memory = memory
         self.active_users = {}
         self.typing_users = set()
     
@@ -51,15 +55,41 @@ class SerafinaSocket:
         # Stop typing indicator
         self.handle_stop_typing(user_id)
         
-        # Process message (this would integrate with SerafinaEngine)
-        # For now, emit typing indicator for Seraphina's response
+        # Show Seraphina's typing indicator while she thinks
         emit('seraphina_typing', {
             'is_typing': True,
             'emotion': 'thinking'
         }, room=f"seraphina_{user_id}")
         
-        # Simulate processing delay for more realistic interaction
-        # In real implementation, this would be the actual AI processing
+        if not self.engine:
+            return
+        
+        # Stream Seraphina's reply token by token
+        message = message_data.get('message', '')
+        mood = message_data.get('mood') or self.engine.get_mood(user_id)
+        # The plan comes from the signed-in session; a plan sent by the client is ignored
+        events = self.engine.stream_romantic_response(message, user_id=user_id, mood=mood,
+                                                      plan=plan_from_session(session))
+        try:
+            response_data = self.send_response_stream(user_id, events)
+        except QueueFullError as e:
+            emit('seraphina_typing', {
+                'is_typing': False
+            }, room=f"seraphina_{user_id}")
+            emit('seraphina_busy', {
+                'message': 'So many people want my attention right now 💕 Try again in a moment, darling.',
+                'retry_after': e.retry_after
+            }, room=f"seraphina_{user_id}")
+            return
+        
+        if self.memory and response_data:
+            self.memory.store_interaction(
+                user_id,
+                message,
+                response_data['message'],
+                response_data['emotion'],
+                mood
+            )
         
     def send_response(self, user_id, response_data):
         """Send Seraphina's response to user"""
@@ -78,6 +108,22 @@ class SerafinaSocket:
             'timestamp': datetime.now().isoformat()
         }, room=f"seraphina_{user_id}")
     
+    def send_response_stream(self, user_id, events):
+        """Push streamed tokens to the user, then send the final response"""
+        
+        room = f"seraphina_{user_id}"
+        
+        for event in events:
+            if event.get('type') == 'token':
+                emit('seraphina_token', {
+                    'token': event['token']
+                }, room=room)
+            elif event.get('type') == 'done':
+                self.send_response(user_id, event)
+                return event
+        
+        return None
+    
     def handle_typing(self, user_id):
         """Handle user typing indicator"""
         
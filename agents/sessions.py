@@ -0,0 +1,125 @@
+"""
+Conversation Sessions - Ollama KV Context Reuse
+Keeps the `context` Ollama returns so follow-up turns skip re-reading the persona prompt
+"""
+
+import time
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+class ConversationSession:
+    """Ollama context for one user's conversation with one agent"""
+
+    def __init__(self, fingerprint: Tuple, context: List[int]):
+        self.fingerprint = fingerprint
+        # Token ids as a compact int array; a few thousand per session add up
+        self.context = array('i', context)
+        self.turns = 1
+        self.updated_at = time.time()
+
+class SessionStore:
+    """LRU store of conversation sessions keyed by (user, agent)
+
+    A session is bound to a fingerprint (model, mood, ...). A turn whose
+    fingerprint differs from the stored one starts over with a full prompt,
+    as does a session past `max_turns` so persona and memory text get
+    refreshed periodically.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800, max_turns: int = 20):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'continued': 0,
+            'started': 0,
+            'invalidated': 0,
+            'expired': 0,
+            'rolled_over': 0,
+            'evicted': 0
+        }
+
+    @classmethod
+    def from_config(cls, session_config: Dict = None) -> Optional['SessionStore']:
+        """Build a store from an agent's `sessions` config section, or None if not opted in"""
+
+        if not session_config or not session_config.get('enabled'):
+            return None
+
+        return cls(
+            max_sessions=session_config.get('max_sessions', 1000),
+            ttl=session_config.get('ttl_seconds', 1800),
+            max_turns=session_config.get('max_turns', 20)
+        )
+
+    def get(self, key: Tuple, fingerprint: Tuple) -> Optional[List[int]]:
+        """Context to continue from, or None if the next turn needs a full prompt"""
+
+        with self._lock:
+            session = self._sessions.get(key)
+
+            if session is None:
+                self.stats['started'] += 1
+                return None
+
+            if session.fingerprint != fingerprint:
+                stat = 'invalidated'
+            elif session.updated_at + self.ttl < time.time():
+                stat = 'expired'
+            elif session.turns >= self.max_turns:
+                stat = 'rolled_over'
+            else:
+                self._sessions.move_to_end(key)
+                self.stats['continued'] += 1
+                return session.context.tolist()
+
+            del self._sessions[key]
+            self.stats[stat] += 1
+            self.stats['started'] += 1
+            return None
+
+    def update(self, key: Tuple, fingerprint: Tuple, context: List[int], continued: bool):
+        """Record the context returned for a turn"""
+
+        if not context:
+            self.invalidate(key)
+            return
+
+        with self._lock:
+            session = self._sessions.get(key)
+
+            if continued and session is not None and session.fingerprint == fingerprint:
+                session.context = array('i', context)
+                session.turns += 1
+                session.updated_at = time.time()
+            else:
+                session = self._sessions[key] = ConversationSession(fingerprint, context)
+
+            self._sessions.move_to_end(key)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def invalidate(self, key: Tuple):
+        """Drop a session so the next turn sends a full prompt"""
+
+        with self._lock:
+            if self._sessions.pop(key, None) is not None:
+                self.stats['invalidated'] += 1
+
+    def get_stats(self) -> Dict:
+        """Get session reuse counters"""
+
+        turns = self.stats['continued'] + self.stats['started']
+
+        return {
+            **self.stats,
+            'reuse_rate': self.stats['continued'] / turns if turns else 0,
+            'active': len(self._sessions)
+        }
@@ -0,0 +1,62 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical generations share one upstream Ollama call
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict
+
+def make_generation_key(model: str, prompt: str, options: Dict = None) -> str:
+    """Build a stable key for (model, full prompt, options)"""
+
+    payload = json.dumps([model, prompt, options or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task
+
+    Must be used from a single event loop; the generation engine owns one.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {
+            'leaders': 0,
+            'coalesced': 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Run fn() once per key at a time; concurrent callers await the same result"""
+
+        task = self._calls.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.stats['leaders'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        # Shield so one caller cancelling does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        """Drop a finished call so the next request starts a fresh one"""
+
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight"""
+        return len(self._calls)
+
+    def get_stats(self) -> Dict:
+        """Get coalescing statistics"""
+
+        return {
+            **self.stats,
+            'in_flight': self.in_flight()
+        }
@@ -0,0 +1,333 @@
+"""
+Top-K Memory Store - Bounded Important Memories
+Min-heap by importance with a per-type index, persisted as snapshot plus append log
+"""
+
+import os
+import json
+import fcntl
+import heapq
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+from agents.jsonl_writer import flush_jsonl_writer, get_jsonl_writer
+from agents.process_local import ProcessLocal
+
+class TopKMemories:
+    """The `capacity` most important memories, in insertion order
+
+    A min-heap keyed by importance_score finds the memory to evict in
+    O(log K). Among equal scores the newest is evicted first, matching a
+    stable sort-and-truncate. Memories are also indexed by type.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._heap = []                  # (importance, -seq)
+        self._memories = {}              # seq -> memory, insertion ordered
+        self._by_type = {}               # type -> {seq: memory}
+        self._seq = 0
+
+    def insert(self, memory: Dict) -> bool:
+        """Add a memory; returns False if it ranks below everything kept"""
+
+        score = memory.get('importance_score', 0)
+        self._seq += 1
+        key = (score, -self._seq)
+
+        if len(self._heap) >= self.capacity:
+            if key <= self._heap[0]:
+                return False
+            _, evicted = heapq.heapreplace(self._heap, key)
+            self._remove(-evicted)
+        else:
+            heapq.heappush(self._heap, key)
+
+        self._memories[self._seq] = memory
+        self._by_type.setdefault(memory.get('type'), {})[self._seq] = memory
+        return True
+
+    def _remove(self, seq: int):
+        memory = self._memories.pop(seq)
+        typed = self._by_type.get(memory.get('type'))
+        if typed is not None:
+            typed.pop(seq, None)
+            if not typed:
+                del self._by_type[memory.get('type')]
+
+    def get(self, memory_type: str = None) -> List[Dict]:
+        """Memories in insertion order, optionally of one type"""
+
+        if memory_type is None or memory_type == 'all':
+            return list(self._memories.values())
+        return list(self._by_type.get(memory_type, {}).values())
+
+    def top(self, n: int) -> List[Dict]:
+        """The n most important memories, highest first"""
+
+        keys = heapq.nlargest(n, self._heap)
+        return [self._memories[-seq] for _, seq in keys]
+
+    def __len__(self):
+        return len(self._memories)
+
+class TopKLog:
+    """One user's insert log, as a JSONL writer sink
+
+    Each batch is appended to the log of the generation current on disk,
+    under the user's lock file, so inserts queued in any worker land after
+    a compaction instead of in a log it already folded in.
+    """
+
+    def __init__(self, store: 'TopKMemoryStore', user_id: str):
+        self.store = store
+        self.user_id = user_id
+        self._snapshot = None            # (inode, mtime, size) the generation was read from
+        self._generation = 0
+
+    def __repr__(self):
+        return f"TopKLog({self.user_id!r})"
+
+    def prepare(self, memory: Dict) -> str:
+        return json.dumps(memory) + '\n'
+
+    def write_batch(self, lines: List[str], fsync: bool = False):
+        with self.store.file_lock(self.user_id):
+            with open(self.store.log_file(self.user_id, self.generation()), 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+
+    def generation(self) -> int:
+        """Generation of the current snapshot; re-read only when the snapshot was replaced (file lock held)"""
+
+        try:
+            st = os.stat(self.store.snapshot_file(self.user_id))
+        except FileNotFoundError:
+            return 0
+
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key != self._snapshot:
+            self._generation = self.store.read_snapshot(self.user_id)[0]
+            self._snapshot = key
+        return self._generation
+
+class TopKMemoryStore:
+    """Per-user TopKMemories persisted as {user}_memories.json plus an append log
+
+    Inserts are appended to {user}_memories.<generation>.log through the
+    background JSONL writer. Once a worker has logged `compact_after`
+    entries, the memories on disk (snapshot plus log, including other
+    workers' inserts) are written as a new snapshot with the next
+    generation, atomically, and the old log is dropped. Loading replays
+    only the log of the snapshot's generation, so a crash mid-compaction
+    never replays entries twice. Legacy snapshots (a bare list) are read as
+    generation 0.
+
+    Generation switches, loads and log appends hold an exclusive lock on
+    {user}_memories.lock, so several worker processes can share the store.
+    File I/O happens outside the in-process lock.
+    """
+
+    def __init__(self, path: str, capacity: int = 1000, compact_after: int = None, max_users: int = 1000):
+        self.path = path
+        self.capacity = capacity
+        self.compact_after = compact_after or max(64, capacity)
+        self.max_users = max_users
+
+        self._users = OrderedDict()      # user_id -> [TopKMemories, TopKLog, entries logged since compaction]
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'inserts': 0,
+            'rejected': 0,
+            'compactions': 0
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file_prefix(self, user_id: str) -> str:
+        # User ids come from requests; keep them inside path
+        return os.path.join(self.path, quote(str(user_id), safe='').replace('.', '%2E') + '_memories')
+
+    def snapshot_file(self, user_id: str) -> str:
+        return self._file_prefix(user_id) + '.json'
+
+    def log_file(self, user_id: str, generation: int) -> str:
+        return f"{self._file_prefix(user_id)}.{generation}.log"
+
+    @contextmanager
+    def file_lock(self, user_id: str):
+        """Exclusive cross-process lock on a user's snapshot and logs"""
+
+        with open(self._file_prefix(user_id) + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, user_id: str, memory: Dict) -> bool:
+        """Insert a memory and log it; returns False if it did not make the top K"""
+
+        entry = self._entry(user_id)
+
+        with self._lock:
+            memories, log, logged = entry
+
+            self.stats['inserts'] += 1
+            if not memories.insert(memory):
+                self.stats['rejected'] += 1
+                return False
+
+            get_jsonl_writer().append_to(log, memory)
+            entry[2] = logged + 1
+
+            compact = entry[2] >= self.compact_after
+            if compact:
+                entry[2] = 0
+
+        if compact:
+            self._compact(user_id)
+        return True
+
+    def get(self, user_id: str, memory_type: str = None) -> List[Dict]:
+        """A user's memories in insertion order, optionally of one type"""
+
+        entry = self._entry(user_id)
+        with self._lock:
+            return entry[0].get(memory_type)
+
+    def top(self, user_id: str, n: int) -> List[Dict]:
+        """A user's n most important memories, highest first"""
+
+        entry = self._entry(user_id)
+        with self._lock:
+            return entry[0].top(n)
+
+    def _entry(self, user_id: str) -> list:
+        """A user's resident memories, loading them (outside the lock) if needed"""
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                return entry
+
+        loaded = self._load(user_id)
+
+        with self._lock:
+            # Another thread may have loaded the user meanwhile; keep the first
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = loaded
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            return entry
+
+    def read_snapshot(self, user_id: str) -> Tuple[int, List[Dict]]:
+        """(generation, memories) of a user's snapshot (file lock held)"""
+
+        snapshot_file = self.snapshot_file(user_id)
+        if not os.path.exists(snapshot_file):
+            return 0, []
+
+        try:
+            with open(snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Corrupt memory snapshot for {user_id}: {e}")
+            return 0, []
+
+        if isinstance(snapshot, dict):
+            return snapshot.get('generation', 0), snapshot.get('memories', [])
+        return 0, snapshot
+
+    def _read(self, user_id: str) -> Tuple[int, TopKMemories]:
+        """Snapshot plus its generation's log (file lock held)"""
+
+        generation, snapshot = self.read_snapshot(user_id)
+        memories = TopKMemories(self.capacity)
+        for memory in snapshot:
+            memories.insert(memory)
+
+        log_file = self.log_file(user_id, generation)
+        if os.path.exists(log_file):
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        memories.insert(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+        # Logs from generations an interrupted compaction already folded in
+        for old_generation in range(max(0, generation - 2), generation):
+            old_log = self.log_file(user_id, old_generation)
+            if os.path.exists(old_log):
+                os.remove(old_log)
+
+        return generation, memories
+
+    def _load(self, user_id: str) -> list:
+        # Inserts for a user dropped from the cache may still be queued
+        flush_jsonl_writer()
+
+        with self.file_lock(user_id):
+            _, memories = self._read(user_id)
+        return [memories, TopKLog(self, user_id), 0]
+
+    def _compact(self, user_id: str):
+        """Fold the log into a new snapshot generation and drop the old log"""
+
+        # This worker's queued inserts go to the old log before it is folded in
+        # (not under the file lock: the writer thread needs it to append)
+        flush_jsonl_writer()
+
+        with self.file_lock(user_id):
+            generation, memories = self._read(user_id)
+            snapshot_file = self.snapshot_file(user_id)
+            temp_file = f"{snapshot_file}.{os.getpid()}.tmp"
+
+            try:
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump({'generation': generation + 1, 'memories': memories.get()}, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, snapshot_file)
+            except OSError as e:
+                print(f"Memory compaction error for {user_id}: {e}")
+                return
+
+            # Appends from here on resolve the new generation under this lock
+            try:
+                os.remove(self.log_file(user_id, generation))
+            except OSError:
+                pass
+
+        with self._lock:
+            self.stats['compactions'] += 1
+
+    def get_stats(self) -> Dict:
+        """Get insert and compaction counters"""
+
+        with self._lock:
+            return {**self.stats, 'resident_users': len(self._users)}
+
+# path -> TopKMemoryStore; locks are not shared across a fork
+_stores = ProcessLocal(dict)
+_stores_lock = threading.Lock()
+
+def get_topk_store(path: str, capacity: int = 1000) -> TopKMemoryStore:
+    """Get the shared top-K memory store for a directory"""
+
+    stores = _stores.get()
+    with _stores_lock:
+        store = stores.get(path)
+        if store is None:
+            store = stores[path] = TopKMemoryStore(path, capacity)
+        return store
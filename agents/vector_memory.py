@@ -0,0 +1,410 @@
+"""
+Vector Memory - Relevance-Ranked Long-Term Recall
+Embedding-indexed per-user memories, searched by similarity to the current message
+"""
+
+import os
+import json
+import time
+import heapq
+import base64
+import threading
+import concurrent.futures
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import quote
+from agents.jsonl_writer import append_jsonl, flush_jsonl_writer
+from agents.process_local import ProcessLocal
+from agents.semantic_cache import Embedder, OllamaEmbedder, normalize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class MemoryIndex:
+    """Cosine top-k over one user's memory vectors
+
+    Up to `ivf_threshold` vectors are searched brute force with one
+    matrix-vector product. Above it an IVF index is built: spherical k-means
+    splits the vectors into ~sqrt(n) lists and a search scans only the
+    `nprobe` lists whose centroids are closest to the query. New vectors join
+    their nearest list; the index is retrained once the count has doubled.
+
+    Without NumPy the index falls back to a pure-Python scan.
+    """
+
+    KMEANS_ITERATIONS = 6
+    KMEANS_SAMPLE_PER_LIST = 32
+
+    def __init__(self, ivf_threshold: int = 20000, nprobe: int = 8):
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+
+        self.dim = None
+        self.payloads = []
+        self._vectors = None            # (capacity, dim) float32, rows normalized
+        self._rows = []                 # pure-Python fallback
+
+        self._centroids = None
+        self._lists = []                # row numbers per centroid
+        self._list_arrays = {}          # centroid -> cached np array of its rows
+        self._trained_at = 0
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @property
+    def is_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def add_many(self, vectors, payloads: List[Dict]):
+        """Add vectors (rows of a float32 matrix or lists) with their payloads"""
+
+        if np is None:
+            for vector, payload in zip(vectors, payloads):
+                self.add(vector, payload)
+            return
+
+        if not payloads:
+            return
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(payloads), -1)
+        if self.dim is not None and matrix.shape[1] != self.dim:
+            return
+
+        self.dim = matrix.shape[1]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        start = len(self.payloads)
+        self._reserve(start + len(payloads))
+        self._vectors[start:start + len(payloads)] = matrix
+        self.payloads.extend(payloads)
+
+        if self.is_ivf:
+            assignments = np.argmax(matrix @ self._centroids.T, axis=1)
+            for offset, centroid in enumerate(assignments.tolist()):
+                self._lists[centroid].append(start + offset)
+                self._list_arrays.pop(centroid, None)
+
+        self._maybe_train()
+
+    def add(self, vector: List[float], payload: Dict):
+        """Add one vector"""
+
+        if self.dim is not None and len(vector) != self.dim:
+            return
+
+        if np is not None:
+            self.add_many([vector], [payload])
+            return
+
+        self.dim = len(vector)
+        self._rows.append(normalize(vector))
+        self.payloads.append(payload)
+
+    def search(self, vector: List[float], k: int) -> List[tuple]:
+        """Return up to k (similarity, payload) pairs, most similar first"""
+
+        if not self.payloads or len(vector) != self.dim:
+            return []
+
+        if np is None:
+            query = normalize(vector)
+            scored = ((sum(a * b for a, b in zip(query, row)), i) for i, row in enumerate(self._rows))
+            return [(score, self.payloads[i]) for score, i in heapq.nlargest(k, scored)]
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if self.is_ivf:
+            probes = np.argsort(self._centroids @ query)[::-1][:self.nprobe]
+            candidates = np.concatenate([self._list_array(c) for c in probes.tolist()])
+            scores = self._vectors[candidates] @ query
+        else:
+            candidates = None
+            scores = self._vectors[:len(self.payloads)] @ query
+
+        if len(scores) > k:
+            best = np.argpartition(scores, -k)[-k:]
+            best = best[np.argsort(scores[best])[::-1]]
+        else:
+            best = np.argsort(scores)[::-1]
+
+        rows = candidates[best] if candidates is not None else best
+        return [(float(scores[b]), self.payloads[r]) for b, r in zip(best.tolist(), rows.tolist())]
+
+    def _reserve(self, rows: int):
+        """Grow the vector matrix geometrically"""
+
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+
+        grown = np.empty((max(rows, capacity * 2, 256), self.dim), dtype=np.float32)
+        if capacity:
+            grown[:len(self.payloads)] = self._vectors[:len(self.payloads)]
+        self._vectors = grown
+
+    def _list_array(self, centroid: int):
+        rows = self._list_arrays.get(centroid)
+        if rows is None:
+            rows = self._list_arrays[centroid] = np.asarray(self._lists[centroid], dtype=np.int64)
+        return rows
+
+    def _maybe_train(self):
+        """Build the IVF index past the threshold, and rebuild it when the count doubles"""
+
+        count = len(self.payloads)
+        if count < self.ivf_threshold or (self.is_ivf and count < self._trained_at * 2):
+            return
+
+        vectors = self._vectors[:count]
+        n_lists = max(1, int(count ** 0.5))
+        rng = np.random.default_rng(count)
+
+        sample_size = min(count, n_lists * self.KMEANS_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(count, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.KMEANS_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.where(norms == 0, 1, norms), centroids)
+
+        lists = [[] for _ in range(n_lists)]
+        for start in range(0, count, 8192):
+            assignments = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+            for offset, centroid in enumerate(assignments.tolist()):
+                lists[centroid].append(start + offset)
+
+        self._centroids = centroids
+        self._lists = lists
+        self._list_arrays = {}
+        self._trained_at = count
+
+class VectorMemory:
+    """Embedding-indexed long-term memories for one agent, one index per user
+
+    Memories are appended to {path}/{user}.jsonl with their float32 vector
+    (base64) through the background JSONL writer, so loading a user never
+    re-embeds. `remember` embeds on a small worker pool and returns at once;
+    `recall` embeds the current message and returns the most similar
+    memories. Indexes of the least recently active users are dropped beyond
+    `max_resident_users`.
+
+    Loading, searching and adding to a user's index hold one of
+    `lock_stripes` per-user locks, so a cold load only stalls users that hash
+    to the same stripe; the store-wide lock guards the resident set and stats.
+    """
+
+    def __init__(self, path: str, embedder: Embedder, top_k: int = 5, min_score: float = 0.3,
+                 ivf_threshold: int = 20000, nprobe: int = 8, max_resident_users: int = 64,
+                 lock_stripes: int = 64):
+        self.path = path
+        self.embedder = embedder
+        self.top_k = top_k
+        self.min_score = min_score
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.max_resident_users = max_resident_users
+
+        self._indexes = OrderedDict()   # user_id -> MemoryIndex, least recently used first
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+        # Worker threads do not survive a fork
+        self._executor = ProcessLocal(
+            lambda: concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='vector-memory'))
+
+        self.stats = {
+            'recalls': 0,
+            'remembered': 0,
+            'embed_errors': 0,
+            'loads': 0,
+            'total_search_ms': 0.0,
+            'max_search_ms': 0.0
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, memory_config: Dict, path: str, embedder: Embedder = None) -> Optional['VectorMemory']:
+        """Build a store from an agent's `vector_memory` config section, or None if not opted in"""
+
+        if not memory_config or not memory_config.get('enabled'):
+            return None
+
+        if np is None:
+            print("Warning: numpy is not installed; vector memory falling back to a pure-Python scan")
+
+        return cls(
+            os.path.join(path, 'vectors'),
+            embedder or OllamaEmbedder(memory_config.get('embedding_model', 'nomic-embed-text:latest')),
+            top_k=memory_config.get('top_k', 5),
+            min_score=memory_config.get('min_score', 0.3),
+            ivf_threshold=memory_config.get('ivf_threshold', 20000),
+            nprobe=memory_config.get('nprobe', 8),
+            max_resident_users=memory_config.get('max_resident_users', 64)
+        )
+
+    def memory_file(self, user_id: str) -> str:
+        # User ids come from requests; keep them inside path
+        return os.path.join(self.path, quote(str(user_id), safe='').replace('.', '%2E') + '.jsonl')
+
+    def recall(self, user_id: str, text: str, k: int = None) -> List[Dict]:
+        """Memories most relevant to text, best first, each with its similarity as 'score'"""
+
+        with self._lock:
+            self.stats['recalls'] += 1
+        vector = self._embed(text)
+        if vector is None:
+            return []
+
+        with self._user_lock(user_id):
+            index = self._index(user_id)
+            start = time.perf_counter()
+            results = index.search(vector, k or self.top_k)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.stats['total_search_ms'] += elapsed
+            self.stats['max_search_ms'] = max(self.stats['max_search_ms'], elapsed)
+
+        return [{**payload, 'score': score} for score, payload in results if score >= self.min_score]
+
+    def remember(self, user_id: str, content: str, **fields) -> concurrent.futures.Future:
+        """Embed and store a memory in the background"""
+        return self._pool().submit(self._remember, user_id, content, fields)
+
+    def _remember(self, user_id: str, content: str, fields: Dict):
+        vector = self._embed(content)
+        if vector is None:
+            return
+
+        payload = {'content': content, 'timestamp': fields.pop('timestamp', None) or time.time(), **fields}
+        record = {**payload, 'vector': base64.b64encode(array('f', vector).tobytes()).decode('ascii')}
+
+        # Under the user's lock so a concurrent load cannot read the record and then get it added again
+        with self._user_lock(user_id):
+            append_jsonl(self.memory_file(user_id), record)
+            with self._lock:
+                index = self._indexes.get(user_id)
+                self.stats['remembered'] += 1
+            if index is not None:
+                index.add(vector, payload)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def _index(self, user_id: str) -> MemoryIndex:
+        """Resident index for a user, loading it from disk if needed (user lock held)"""
+
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        # The flush and the parse run outside the store-wide lock
+        index = self._load(user_id)
+
+        with self._lock:
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_resident_users:
+                self._indexes.popitem(last=False)
+            self.stats['loads'] += 1
+        return index
+
+    def _load(self, user_id: str) -> MemoryIndex:
+        index = MemoryIndex(self.ivf_threshold, self.nprobe)
+        memory_file = self.memory_file(user_id)
+
+        # Memories stored while the user was not resident may still be queued
+        flush_jsonl_writer()
+        if not os.path.exists(memory_file):
+            return index
+
+        vectors, payloads = [], []
+        with open(memory_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    vector = base64.b64decode(record.pop('vector'))
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue
+                vectors.append(vector)
+                payloads.append(record)
+
+        if np is not None and vectors:
+            # Rows of another dimension (a changed embedding model) are skipped
+            dim = len(vectors[-1]) // 4
+            keep = [i for i, v in enumerate(vectors) if len(v) == dim * 4]
+            matrix = np.frombuffer(b''.join(vectors[i] for i in keep), dtype=np.float32).reshape(len(keep), dim)
+            index.add_many(matrix, [payloads[i] for i in keep])
+        else:
+            for vector, payload in zip(vectors, payloads):
+                row = array('f')
+                row.frombytes(vector)
+                index.add(row.tolist(), payload)
+
+        return index
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            vector = self.embedder(text.strip())
+        except Exception as e:
+            print(f"Vector memory embedding error: {e}")
+            vector = None
+
+        if not vector:
+            with self._lock:
+                self.stats['embed_errors'] += 1
+            return None
+
+        return vector
+
+    def _pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        return self._executor.get()
+
+    def get_stats(self) -> Dict:
+        """Get recall counters and search latency"""
+
+        with self._lock:
+            indexes = list(self._indexes.values())
+            stats = dict(self.stats)
+
+        return {
+            **stats,
+            'avg_search_ms': stats['total_search_ms'] / stats['recalls'] if stats['recalls'] else 0,
+            'resident_users': len(indexes),
+            'ivf_indexes': sum(1 for index in indexes if index.is_ivf),
+            'numpy': np is not None
+        }
+
+# path -> VectorMemory; each store's worker pool belongs to the process that built it
+_stores = ProcessLocal(dict)
+_stores_lock = threading.Lock()
+
+def get_vector_memory(memory_config: Dict, path: str) -> Optional[VectorMemory]:
+    """Get the shared vector memory for an agent's memory directory, or None if not opted in"""
+
+    if not memory_config or not memory_config.get('enabled'):
+        return None
+
+    stores = _stores.get()
+    with _stores_lock:
+        store = stores.get(path)
+        if store is None:
+            store = stores[path] = VectorMemory.from_config(memory_config, path)
+        return store
+
+def get_vector_memory_stats() -> Dict:
+    """Counters for every vector memory in this process"""
+    return {path: store.get_stats() for path, store in list((_stores.peek() or {}).items())}
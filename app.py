@@ -1,7 +1,8 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 from datetime import datetime
 import uuid
 import random
+import json
 from config import load_config
 
 # Initialize Flask app with configuration
@@ -531,6 +532,53 @@ def get_agents_api():
             'message': str(e)
         }), 500
 
+@app.route("/api/agents/<agent_name>/batch", methods=['POST'])
+def run_agent_batch(agent_name):
+    """Run a list of prompts through an agent, streaming NDJSON results as they finish
+
+    Send {"prompts": [...]} to start a job, or {"job_id": "..."} to resume one.
+    """
+    from agents.batch import get_batch_runner
+    
+    data = request.get_json() or {}
+    runner = get_batch_runner()
+    
+    try:
+        if data.get('job_id'):
+            job = runner.get_job(data['job_id'])
+            if job is None or job.agent_name != agent_name:
+                return jsonify({'success': False, 'message': 'Unknown batch job'}), 404
+        else:
+            job = runner.create_job(agent_name, data.get('prompts'), model=data.get('model'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    def generate():
+        try:
+            for event in runner.stream(job):
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'job_id': job.job_id, 'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache',
+                             'X-Batch-Job-Id': job.job_id})
+
+@app.route("/api/agents/<agent_name>/batch/<job_id>")
+def get_agent_batch(agent_name, job_id):
+    """Get a batch job's status and the results completed so far"""
+    from agents.batch import get_batch_runner
+    
+    job = get_batch_runner().get_job(job_id)
+    if job is None or job.agent_name != agent_name:
+        return jsonify({'success': False, 'message': 'Unknown batch job'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.summary(),
+        'results': [job.results[index] for index in sorted(job.results)]
+    })
+
 # Account Management Routes
 @app.route("/account")
 def account_dashboard():
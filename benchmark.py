@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Chat Path Benchmark - Load and Latency Harness
+Drives AgentCore, RomanticPersonality and AgentManager against the fake Ollama server
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import concurrent.futures
+from typing import Callable, Dict, List
+
+from fake_ollama import FakeOllamaServer, DEFAULT_PROFILES, load_profiles
+
+SCENARIOS = ['core', 'core_stream', 'romantic', 'manager']
+
+PROMPTS = [
+    "Hi there, how are you today?",
+    "I had a really long day at work and I'm exhausted",
+    "What should we do this weekend?",
+    "Tell me something that makes you happy",
+    "I miss you so much",
+    "Can you help me plan a surprise dinner for my partner?",
+    "I'm feeling anxious about my exam tomorrow",
+    "What's your favorite memory of us?",
+    "Good morning! Did you sleep well?",
+    "I just got promoted, I can't believe it!",
+    "Do you ever think about the future?",
+    "I'm bored, entertain me"
+]
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def build_workload(requests: int, users: int, seed: int) -> List[Dict]:
+    """Deterministic (user, prompt) sequence; some prompts repeat as real traffic does"""
+
+    rng = random.Random(seed)
+    return [{'user_id': f"bench_user_{rng.randrange(users)}", 'prompt': rng.choice(PROMPTS)}
+            for _ in range(requests)]
+
+def scenario_calls(scenario: str) -> Callable[[Dict], Dict]:
+    """Return a callable that runs one request for a scenario and reports its outcome"""
+
+    # Imported here so the environment points at the fake server first
+    if scenario in ('core', 'core_stream'):
+        from agents.core import AgentCore
+
+        agent = AgentCore('benchmark')
+        fallback = agent.fallback_response()
+
+        if scenario == 'core':
+            def call(item):
+                response = agent.generate_response(item['prompt'], {'user_id': item['user_id']})
+                return {'ok': response != fallback}
+        else:
+            def call(item):
+                start = time.perf_counter()
+                first_token = None
+                tokens = []
+                for token in agent.generate_response_stream(item['prompt'], {'user_id': item['user_id']}):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    tokens.append(token)
+                return {'ok': ''.join(tokens) != fallback, 'ttft': first_token}
+        return call
+
+    if scenario == 'romantic':
+        from agents.seraphina.engine.romantic_ai import RomanticPersonality
+
+        personality = RomanticPersonality()
+
+        def call(item):
+            response = personality.generate_response(item['prompt'])
+            return {'ok': not personality.is_fallback_response(response)}
+        return call
+
+    if scenario == 'manager':
+        from agents.manager import agent_manager
+
+        def call(item):
+            agent = agent_manager.get_agent('seraphina', item['user_id'])
+            result = agent.generate_contextual_response(item['prompt'], item['user_id'])
+            return {'ok': result['response'] != agent.fallback_response(), 'model': result.get('model_used')}
+        return call
+
+    raise ValueError(f"Unknown scenario {scenario}")
+
+def run_scenario(scenario: str, workload: List[Dict], concurrency: int) -> Dict:
+    """Run a workload through one scenario and summarize latencies"""
+
+    call = scenario_calls(scenario)
+    latencies, ttfts, errors, first_error = [], [], 0, None
+
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            outcome = call(item)
+        except Exception as e:
+            outcome = {'ok': False, 'error': str(e)}
+        outcome['latency'] = time.perf_counter() - start
+        return outcome
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for outcome in pool.map(timed, workload):
+            latencies.append(outcome['latency'])
+            if outcome.get('ttft') is not None:
+                ttfts.append(outcome['ttft'])
+            if not outcome['ok']:
+                errors += 1
+                first_error = first_error or outcome.get('error')
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'scenario': scenario,
+        'requests': len(workload),
+        'concurrency': concurrency,
+        'errors': errors,
+        'elapsed': round(elapsed, 3),
+        'throughput_rps': round(len(workload) / elapsed, 2) if elapsed else 0,
+        'latency_p50': round(percentile(latencies, 50), 4),
+        'latency_p95': round(percentile(latencies, 95), 4),
+        'latency_p99': round(percentile(latencies, 99), 4),
+        'latency_max': round(max(latencies), 4) if latencies else 0
+    }
+    if first_error:
+        summary['first_error'] = first_error
+    if ttfts:
+        summary['ttft_p50'] = round(percentile(ttfts, 50), 4)
+        summary['ttft_p95'] = round(percentile(ttfts, 95), 4)
+
+    return summary
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the chat path against a fake Ollama server')
+    parser.add_argument('--scenario', choices=SCENARIOS + ['all'], default='all')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profiles', help='JSON file of per-model fake server settings')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='multiply simulated delays (0 = none)')
+    parser.add_argument('--error-rate', type=float, help='override error_rate for every model')
+    parser.add_argument('--ollama-url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.ollama_url:
+        os.environ['OLLAMA_URL'] = os.environ['OLLAMA_HOSTS'] = args.ollama_url
+    else:
+        profiles = load_profiles(args.profiles) if args.profiles else {k: dict(v) for k, v in DEFAULT_PROFILES.items()}
+        if args.error_rate is not None:
+            for settings in profiles.values():
+                settings['error_rate'] = args.error_rate
+
+        server = FakeOllamaServer(profiles=profiles, seed=args.seed, time_scale=args.time_scale).start()
+        os.environ.update(server.environ())
+
+    scenarios = SCENARIOS if args.scenario == 'all' else [args.scenario]
+    workload = build_workload(args.requests, args.users, args.seed)
+
+    report = {'scenarios': []}
+    try:
+        for scenario in scenarios:
+            summary = run_scenario(scenario, workload, args.concurrency)
+            report['scenarios'].append(summary)
+            print(json.dumps(summary))
+
+        from agents.generation import get_generation_engine
+        report['generation_engine'] = get_generation_engine().get_stats()
+        if server:
+            report['fake_ollama'] = server.fake.get_stats()
+    finally:
+        if server:
+            server.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+
+    return 0 if all(s['errors'] < s['requests'] for s in report['scenarios']) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
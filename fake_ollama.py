@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama - Deterministic Local Stand-in Server
+Serves the Ollama HTTP API with simulated latency, throughput and errors for load testing
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Time to first token and generation speed roughly follow model size
+DEFAULT_PROFILES = {
+    'gemma2:2b': {'latency': {'distribution': 'lognormal', 'median': 0.12, 'sigma': 0.3}, 'tokens_per_sec': 60},
+    'llama3.2:3b': {'latency': {'distribution': 'lognormal', 'median': 0.15, 'sigma': 0.3}, 'tokens_per_sec': 45},
+    'yi:6b': {'latency': {'distribution': 'lognormal', 'median': 0.35, 'sigma': 0.4}, 'tokens_per_sec': 25},
+    'mistral:7b': {'latency': {'distribution': 'lognormal', 'median': 0.4, 'sigma': 0.4}, 'tokens_per_sec': 22},
+    'mathstral:7b': {'latency': {'distribution': 'lognormal', 'median': 0.4, 'sigma': 0.4}, 'tokens_per_sec': 22},
+    'qwen2.5:7b': {'latency': {'distribution': 'lognormal', 'median': 0.4, 'sigma': 0.4}, 'tokens_per_sec': 22},
+    'llava:7b': {'latency': {'distribution': 'lognormal', 'median': 0.5, 'sigma': 0.4}, 'tokens_per_sec': 20},
+    'deepseek-coder:6.7b': {'latency': {'distribution': 'lognormal', 'median': 0.4, 'sigma': 0.4}, 'tokens_per_sec': 22},
+    'phi3:14b': {'latency': {'distribution': 'lognormal', 'median': 0.8, 'sigma': 0.5}, 'tokens_per_sec': 12},
+    'nomic-embed-text:latest': {'latency': {'distribution': 'fixed', 'value': 0.02}, 'embedding_dim': 768},
+    'snowflake-arctic-embed:latest': {'latency': {'distribution': 'fixed', 'value': 0.03}, 'embedding_dim': 1024}
+}
+
+PROFILE_DEFAULTS = {
+    'latency': {'distribution': 'fixed', 'value': 0.2},
+    'tokens_per_sec': 30,
+    'response_tokens': 48,     # used when the request sets no num_predict
+    'error_rate': 0.0,         # fraction of requests answered with error_status
+    'error_status': 500,
+    'drop_rate': 0.0,          # fraction of streams cut off halfway through
+    'embedding_dim': 768,
+    'num_ctx': 2048
+}
+
+WORDS = (
+    "I love how you think about that and it makes me smile every time we talk "
+    "tell me more about your day because every little detail matters to me "
+    "you always know how to brighten my evening with your kind and thoughtful words "
+    "let us plan something special together soon just the two of us under the stars"
+).split()
+
+def _seed(*parts) -> int:
+    digest = hashlib.sha256('\0'.join(str(p) for p in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+class ModelProfile:
+    """Simulated behaviour for one model"""
+
+    def __init__(self, name: str, settings: Dict = None):
+        settings = {**PROFILE_DEFAULTS, **(settings or {})}
+        self.name = name
+        self.latency = settings['latency']
+        self.tokens_per_sec = settings['tokens_per_sec']
+        self.response_tokens = settings['response_tokens']
+        self.error_rate = settings['error_rate']
+        self.error_status = settings['error_status']
+        self.drop_rate = settings['drop_rate']
+        self.embedding_dim = settings['embedding_dim']
+        self.num_ctx = settings['num_ctx']
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Seconds before the first token"""
+
+        spec = self.latency
+        distribution = spec.get('distribution', 'fixed')
+
+        if distribution == 'fixed':
+            value = spec.get('value', 0.0)
+        elif distribution == 'uniform':
+            value = rng.uniform(spec.get('low', 0.0), spec.get('high', 1.0))
+        elif distribution == 'normal':
+            value = rng.gauss(spec.get('mean', 0.2), spec.get('stddev', 0.05))
+        elif distribution == 'lognormal':
+            value = rng.lognormvariate(math.log(spec.get('median', 0.2)), spec.get('sigma', 0.5))
+        else:
+            raise ValueError(f"Unknown latency distribution {distribution}")
+
+        return max(0.0, min(value, spec.get('max', 120.0)))
+
+class FakeOllama:
+    """Request handling state shared by all connections
+
+    Outputs are a pure function of (seed, model, prompt). Latency samples and
+    injected errors are drawn from the same inputs plus how many times that
+    prompt has been seen, so a retried request can succeed while a replayed
+    benchmark still sees the same sequence.
+    """
+
+    def __init__(self, profiles: Dict = None, seed: int = 0, time_scale: float = 1.0, strict_models: bool = False):
+        self.profiles = {name: ModelProfile(name, settings)
+                         for name, settings in (DEFAULT_PROFILES if profiles is None else profiles).items()}
+        self.seed = seed
+        self.time_scale = time_scale
+        self.strict_models = strict_models
+
+        self._seen = {}
+        self._loaded = {}          # model -> last used
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'generate': 0,
+            'streams': 0,
+            'embeddings': 0,
+            'injected_errors': 0,
+            'dropped_streams': 0,
+            'tokens': 0
+        }
+
+    def profile(self, model: str) -> Optional[ModelProfile]:
+        """Profile for a model; unknown models get defaults unless strict_models is set"""
+
+        if model in self.profiles:
+            return self.profiles[model]
+        if self.strict_models or not model:
+            return None
+        return self.profiles.setdefault(model, ModelProfile(model))
+
+    def request_rng(self, endpoint: str, model: str, text: str) -> random.Random:
+        with self._lock:
+            self.stats['requests'] += 1
+            occurrence = self._seen.get((endpoint, model, text), 0)
+            self._seen[(endpoint, model, text)] = occurrence + 1
+            self._loaded[model] = time.time()
+        return random.Random(_seed(self.seed, endpoint, model, text, occurrence))
+
+    def count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def sleep(self, seconds: float):
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def response_words(self, model: str, prompt: str, options: Dict, profile: ModelProfile) -> List[str]:
+        """Deterministic reply for a prompt"""
+
+        rng = random.Random(_seed(self.seed, model, prompt, options.get('seed', '')))
+        count = options.get('num_predict') or profile.response_tokens
+        if count < 0:
+            count = profile.response_tokens
+
+        words = [rng.choice(WORDS) for _ in range(count)]
+        # Vary sentence boundaries so the text does not look like one run-on line
+        for index in range(7, len(words), rng.randint(8, 12)):
+            words[index] += '.'
+        if words:
+            words[0] = words[0].capitalize()
+            words[-1] = words[-1].rstrip('.') + '.'
+        return words
+
+    def context_tokens(self, model: str, prompt: str, context: List[int], words: List[str]) -> List[int]:
+        """Fake KV context: prior context plus one id per prompt and response word"""
+
+        tokens = list(context or [])
+        tokens.extend(_seed(model, word) % 32000 for word in prompt.split())
+        tokens.extend(_seed(model, word) % 32000 for word in words)
+        return tokens
+
+    def embedding(self, model: str, text: str, dim: int) -> List[float]:
+        """Deterministic unit vector; texts sharing words land close together"""
+
+        vector = [0.0] * dim
+        for word in text.lower().split() or ['']:
+            rng = random.Random(_seed(model, word))
+            for index in range(dim):
+                vector[index] += rng.gauss(0, 1)
+
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def loaded_models(self) -> List[Dict]:
+        with self._lock:
+            loaded = dict(self._loaded)
+
+        return [{'name': model, 'model': model, 'size': 0, 'size_vram': 0,
+                 'expires_at': datetime.fromtimestamp(used + 300, timezone.utc).isoformat()}
+                for model, used in loaded.items()]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """HTTP handler for the subset of the Ollama API the agents use"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeOllama/1.0'
+
+    @property
+    def fake(self) -> FakeOllama:
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            models = [{'name': name, 'model': name, 'size': 0, 'digest': hashlib.sha256(name.encode()).hexdigest(),
+                       'modified_at': '2024-01-01T00:00:00Z'} for name in self.fake.profiles]
+            self._send_json({'models': models})
+        elif self.path == '/api/ps':
+            self._send_json({'models': self.fake.loaded_models()})
+        elif self.path in ('/', '/api/version'):
+            self._send_json({'version': '0.0.0-fake'})
+        else:
+            self._send_error(404, f"{self.path} not found")
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            self._send_error(400, 'invalid JSON body')
+            return
+
+        routes = {
+            '/api/generate': self._generate,
+            '/api/embeddings': self._embeddings,
+            '/api/embed': self._embed,
+            '/api/show': self._show
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_error(404, f"{self.path} not found")
+            return
+
+        model = body.get('model', '')
+        profile = self.fake.profile(model)
+        if profile is None:
+            self._send_error(404, f"model '{model}' not found, try pulling it first")
+            return
+
+        route(body, profile)
+
+    def _generate(self, body: Dict, profile: ModelProfile):
+        model = body['model']
+        prompt = body.get('prompt', '')
+        options = body.get('options') or {}
+        stream = body.get('stream', True)
+
+        rng = self.fake.request_rng('generate', model, prompt)
+        self.fake.count('streams' if stream else 'generate')
+
+        latency = profile.sample_latency(rng)
+        if rng.random() < profile.error_rate:
+            self.fake.count('injected_errors')
+            self.fake.sleep(latency)
+            self._send_error(profile.error_status, f"injected failure for {model}")
+            return
+
+        words = self.fake.response_words(model, prompt, options, profile)
+        per_token = 1.0 / profile.tokens_per_sec if profile.tokens_per_sec else 0.0
+        context = self.fake.context_tokens(model, prompt, body.get('context'), words)
+        prompt_tokens = len(prompt.split())
+
+        self.fake.sleep(latency)
+
+        if not stream:
+            self.fake.sleep(per_token * len(words))
+            self.fake.count('tokens', len(words))
+            self._send_json(self._final_chunk(model, ' '.join(words), context, prompt_tokens, len(words),
+                                              latency, per_token))
+            return
+
+        drop_at = len(words) // 2 if rng.random() < profile.drop_rate else None
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            for index, word in enumerate(words):
+                if index == drop_at:
+                    self.fake.count('dropped_streams')
+                    self.close_connection = True
+                    return
+
+                self.fake.sleep(per_token)
+                self._write_chunk({'model': model, 'created_at': self._now(),
+                                   'response': word if index == 0 else ' ' + word, 'done': False})
+                self.fake.count('tokens')
+
+            self._write_chunk(self._final_chunk(model, '', context, prompt_tokens, len(words), latency, per_token))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _embeddings(self, body: Dict, profile: ModelProfile):
+        text = body.get('prompt', '')
+        rng = self.fake.request_rng('embeddings', body['model'], text)
+        if not self._simulate_embedding_call(rng, profile):
+            return
+
+        self._send_json({'embedding': self.fake.embedding(body['model'], text, profile.embedding_dim)})
+
+    def _embed(self, body: Dict, profile: ModelProfile):
+        inputs = body.get('input', [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        rng = self.fake.request_rng('embed', body['model'], '\0'.join(inputs))
+        if not self._simulate_embedding_call(rng, profile):
+            return
+
+        self._send_json({'model': body['model'],
+                         'embeddings': [self.fake.embedding(body['model'], text, profile.embedding_dim)
+                                        for text in inputs]})
+
+    def _simulate_embedding_call(self, rng: random.Random, profile: ModelProfile) -> bool:
+        self.fake.count('embeddings')
+        self.fake.sleep(profile.sample_latency(rng))
+
+        if rng.random() < profile.error_rate:
+            self.fake.count('injected_errors')
+            self._send_error(profile.error_status, f"injected failure for {profile.name}")
+            return False
+        return True
+
+    def _show(self, body: Dict, profile: ModelProfile):
+        self._send_json({
+            'modelfile': f"FROM {profile.name}",
+            'parameters': f"num_ctx                        {profile.num_ctx}",
+            'details': {'family': profile.name.split(':')[0], 'format': 'gguf'}
+        })
+
+    def _final_chunk(self, model: str, response: str, context: List[int], prompt_tokens: int, eval_tokens: int,
+                     latency: float, per_token: float) -> Dict:
+        eval_ns = int(per_token * eval_tokens * 1e9)
+        prompt_ns = int(latency * 1e9)
+
+        return {
+            'model': model,
+            'created_at': self._now(),
+            'response': response,
+            'done': True,
+            'done_reason': 'stop',
+            'context': context,
+            'total_duration': prompt_ns + eval_ns,
+            'load_duration': 0,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': prompt_ns,
+            'eval_count': eval_tokens,
+            'eval_duration': eval_ns
+        }
+
+    def _write_chunk(self, payload: Dict):
+        data = (json.dumps(payload) + '\n').encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json({'error': message}, status)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+class FakeOllamaServer:
+    """Threaded fake Ollama server; use as a context manager or start()/stop()"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, profiles: Dict = None, seed: int = 0,
+                 time_scale: float = 1.0, strict_models: bool = False, verbose: bool = False):
+        self.fake = FakeOllama(profiles, seed, time_scale, strict_models)
+        self.httpd = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def environ(self) -> Dict[str, str]:
+        """Environment that points the agents' Ollama client at this server
+
+        Must be applied before anything under `agents` is imported.
+        """
+        return {'OLLAMA_URL': self.url, 'OLLAMA_HOSTS': self.url}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def load_profiles(path: str) -> Dict:
+    """Read model profiles from a JSON file ({model: settings}), merged over the defaults"""
+
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+
+    profiles = {name: dict(settings) for name, settings in DEFAULT_PROFILES.items()}
+    for name, settings in overrides.items():
+        profiles[name] = {**profiles.get(name, {}), **settings}
+    return profiles
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Deterministic fake Ollama server for load and latency testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('FAKE_OLLAMA_PORT', 11435)))
+    parser.add_argument('--profiles', help='JSON file of per-model settings merged over the defaults')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-scale', type=float, default=1.0, help='multiply all simulated delays (0 = none)')
+    parser.add_argument('--error-rate', type=float, help='override error_rate for every model')
+    parser.add_argument('--strict-models', action='store_true', help='return 404 for models without a profile')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.profiles) if args.profiles else {k: dict(v) for k, v in DEFAULT_PROFILES.items()}
+    if args.error_rate is not None:
+        for settings in profiles.values():
+            settings['error_rate'] = args.error_rate
+
+    server = FakeOllamaServer(args.host, args.port, profiles, args.seed, args.time_scale,
+                              args.strict_models, args.verbose)
+    print(f"Fake Ollama listening on {server.url} ({len(profiles)} models, seed {args.seed})")
+
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Fake Ollama stats: {json.dumps(server.fake.get_stats())}")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -53,6 +53,18 @@ def when_ready(server):
 def worker_int(worker):
     """Called just after a worker exited on SIGINT or SIGQUIT."""
     worker.log.info("👋 Worker received INT or QUIT signal")
+    drain_memory_writes(worker)
+
+def worker_exit(server, worker):
+    """Called just after a worker has been exited, in the worker process."""
+    drain_memory_writes(worker)
+
+def drain_memory_writes(worker):
+    """Commit queued memory records and dirty profiles before the worker goes away."""
+    from agents.jsonl_writer import shutdown_jsonl_writer
+    from agents.seraphina.memory.profile_store import flush_profile_stores
+    shutdown_jsonl_writer()
+    flush_profile_stores()
 
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
@@ -0,0 +1,74 @@
+"""
+Test Fixtures - Fake Ollama Server and Isolated Agent Data
+Every test talks to a FakeOllamaServer and writes under a temporary data root
+"""
+
+import os
+import sys
+import pytest
+
+from fake_ollama import FakeOllamaServer
+
+@pytest.fixture(scope='session', autouse=True)
+def fake_ollama(tmp_path_factory):
+    """Zero-latency fake Ollama server for the whole session
+
+    `agents` reads OLLAMA_URL and its data paths at import time, so the
+    environment is applied before anything under `agents` is imported; test
+    modules import agents inside their tests and fixtures.
+    """
+
+    assert 'agents' not in sys.modules, "agents was imported before the fake Ollama environment was applied"
+
+    data_root = tmp_path_factory.mktemp('agent-data')
+    server = FakeOllamaServer(time_scale=0).start()
+    environ = {
+        **server.environ(),
+        'AGENT_DATA_PATH': str(data_root),
+        'EMBEDDING_CACHE_PATH': str(data_root / 'embeddings'),
+        'BATCH_JOBS_PATH': str(data_root / 'batch_jobs'),
+        'MEMORY_BACKEND': 'file'
+    }
+    previous = {key: os.environ.get(key) for key in environ}
+    os.environ.update(environ)
+
+    yield server
+
+    server.stop()
+    for key, value in previous.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+@pytest.fixture
+def engine(fake_ollama):
+    """The process-wide generation engine with fresh circuit breakers"""
+
+    from agents.generation import get_generation_engine
+    from agents.resilience import CircuitBreakerRegistry
+
+    engine = get_generation_engine()
+    engine.breakers = CircuitBreakerRegistry()
+    return engine
+
+@pytest.fixture
+def fail_models(fake_ollama, engine):
+    """Make models answer HTTP 500: fail_models('yi:6b', ...); restored after the test"""
+
+    changed = {}
+
+    def fail(*models):
+        for model in models:
+            profile = fake_ollama.fake.profile(model)
+            changed.setdefault(model, profile.error_rate)
+            profile.error_rate = 1.0
+
+    yield fail
+
+    for model, error_rate in changed.items():
+        fake_ollama.fake.profile(model).error_rate = error_rate
+
+    # Failures recorded while the models were down must not trip later tests
+    from agents.resilience import CircuitBreakerRegistry
+    engine.breakers = CircuitBreakerRegistry()
@@ -0,0 +1,148 @@
+"""
+Backend pool tests against several fake Ollama servers
+Model-affinity routing, load tie-breaks, health marking, admission scaling and per-host residency
+"""
+
+import pytest
+from fake_ollama import DEFAULT_PROFILES, FakeOllamaServer
+
+def start_server(models, port=0):
+    profiles = {model: DEFAULT_PROFILES[model] for model in models}
+    return FakeOllamaServer(port=port, profiles=profiles, time_scale=0, strict_models=True).start()
+
+@pytest.fixture
+def servers(fake_ollama):
+    """Three hosts: a small-model host, a large-model host and one with both"""
+
+    started = [start_server(['gemma2:2b']), start_server(['yi:6b']), start_server(['gemma2:2b', 'yi:6b'])]
+    yield started
+    for server in started:
+        try:
+            server.stop()
+        except OSError:
+            pass
+
+def make_pool(servers):
+    from agents.backends import BackendPool
+
+    pool = BackendPool([server.url for server in servers])
+    pool.probe_all()
+    return pool
+
+def test_probe_reads_each_host_model_set(servers):
+    pool = make_pool(servers)
+
+    assert [backend.models for backend in pool.backends] == [{'gemma2:2b'}, {'yi:6b'}, {'gemma2:2b', 'yi:6b'}]
+    assert pool.list_models() == ['gemma2:2b', 'yi:6b']
+
+def test_routes_to_hosts_that_have_the_model(servers):
+    pool = make_pool(servers[:2])
+
+    for _ in range(3):
+        with pool.acquire('yi:6b') as backend:
+            assert backend.url == servers[1].url
+            assert backend.client.generate('yi:6b', "Hello there")['response']
+
+    assert [backend.total_requests for backend in pool.backends] == [0, 3]
+
+def test_least_outstanding_breaks_ties(servers):
+    pool = make_pool([servers[0], servers[2]])
+
+    with pool.acquire('gemma2:2b') as first:
+        # The first host is busy, so the idle one wins
+        with pool.acquire('gemma2:2b') as second:
+            assert second is not first
+
+    # Both idle again: fewer total requests wins, then list order
+    with pool.acquire('gemma2:2b') as third:
+        assert third is pool.backends[0]
+    with pool.acquire('gemma2:2b') as fourth:
+        assert fourth is pool.backends[1]
+
+def test_connection_error_marks_host_unhealthy_until_probe(servers):
+    from agents.ollama_client import OllamaClient, OllamaConnectionError
+
+    pool = make_pool([servers[0], servers[2]])
+    down = pool.backends[1]
+    # A client with no pooled keep-alive connection the stopped server could still answer
+    down.client = OllamaClient(down.url, retries=0)
+    port = int(servers[2].url.rsplit(':', 1)[1])
+    servers[2].stop()
+
+    # Route the request to the stopped host by loading the other one
+    pool.backends[0].outstanding += 1
+    with pytest.raises(OllamaConnectionError):
+        with pool.acquire('yi:6b') as backend:
+            assert backend is down
+            backend.client.generate('yi:6b', "Are you there?")
+    pool.backends[0].outstanding -= 1
+
+    assert not down.healthy
+    assert down.failures == 1
+    # The host still lists yi:6b, but requests go elsewhere until a probe succeeds
+    assert pool.select('yi:6b') is pool.backends[0]
+
+    servers[2] = start_server(['gemma2:2b', 'yi:6b'], port=port)
+    assert pool.select('yi:6b') is pool.backends[0]
+
+    pool.probe_all()
+    assert down.healthy
+    assert pool.select('yi:6b') is down
+
+def test_admission_capacity_scales_with_hosts(servers, monkeypatch):
+    from agents import generation
+
+    pool = make_pool(servers)
+    monkeypatch.setattr(generation, 'get_backend_pool', lambda: pool)
+
+    engine = generation.GenerationEngine()
+    assert engine.scheduler.capacity == generation.DEFAULT_ADMISSION_PER_HOST * 3
+
+    assert generation.GenerationEngine(admission_capacity=5).scheduler.capacity == 5
+
+    monkeypatch.setenv('GENERATION_ADMISSION_CAPACITY', '12')
+    assert generation.GenerationEngine.from_env().scheduler.capacity == 12
+
+@pytest.fixture
+def residency(servers, monkeypatch):
+    """A residency manager over the three hosts, recording unloads instead of sending them"""
+
+    import threading
+    from agents import residency
+
+    pool = make_pool(servers)
+    monkeypatch.setattr(residency, 'get_backend_pool', lambda: pool)
+
+    manager = residency.ModelResidencyManager(memory_budget_gb=5, sync_interval=3600)
+    manager._last_sync = float('inf')
+    manager.unloaded = []
+    manager.unloads_done = threading.Event()
+    for backend in pool.backends:
+        def unload(model, url=backend.url):
+            manager.unloaded.append((url, model))
+            manager.unloads_done.set()
+        backend.client.unload = unload
+    return manager
+
+def test_residency_budget_is_per_host(residency, servers):
+    # 1.7 GB and 4.1 GB on different hosts: over the budget in total, within it on each host
+    residency.record_placement('gemma2:2b', servers[0].url)
+    residency.record_placement('yi:6b', servers[1].url)
+
+    stats = residency.get_stats()
+    assert stats['evictions'] == 0
+    assert stats['resident_models'] == ['gemma2:2b', 'yi:6b']
+    assert stats['hosts'][servers[0].url]['resident_models'] == ['gemma2:2b']
+
+def test_residency_evicts_only_on_the_host_that_needs_space(residency, servers):
+    residency.record_placement('gemma2:2b', servers[0].url)
+    residency.record_placement('gemma2:2b', servers[2].url)
+    residency.record_placement('yi:6b', servers[2].url)
+
+    assert residency.unloads_done.wait(5)
+    assert residency.unloaded == [(servers[2].url, 'gemma2:2b')]
+    assert residency.get_stats()['hosts'] == {
+        servers[0].url: {'memory_used_gb': 1.7, 'resident_models': ['gemma2:2b']},
+        servers[2].url: {'memory_used_gb': 4.1, 'resident_models': ['yi:6b']}
+    }
+    assert residency.is_resident('gemma2:2b')
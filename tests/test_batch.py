@@ -0,0 +1,82 @@
+"""
+Batch runner tests
+Persisted results, resuming by job ID, the job cache bound and admission retries
+"""
+
+import asyncio
+import pytest
+
+class EchoAgent:
+    """Answers every prompt at once, keeping these tests off the model stack"""
+
+    async def generate_response_async(self, prompt, context=None, model=None, plan=None):
+        return f"Echo: {prompt}"
+
+    def fallback_response(self):
+        return "fallback"
+
+@pytest.fixture
+def runner(engine, tmp_path, monkeypatch):
+    from agents.batch import BatchRunner
+
+    runner = BatchRunner(jobs_path=str(tmp_path), max_cached_jobs=2)
+    monkeypatch.setattr(runner, '_resolve_agent', lambda agent_name: EchoAgent())
+    return runner
+
+def test_results_are_persisted_and_resumable(runner):
+    from agents.batch import BatchJob
+
+    results = runner.run('seraphina', ["Good morning!", {'id': 'b', 'prompt': "How did you sleep?"}])
+
+    assert [result['id'] for result in results] == [0, 'b']
+    assert [result['response'] for result in results] == ["Echo: Good morning!", "Echo: How did you sleep?"]
+
+    job = BatchJob.load(list(runner.jobs)[-1], runner.jobs_path)
+    assert job.status == 'completed'
+    assert sorted(job.results) == [0, 1]
+
+def test_finished_jobs_are_dropped_from_memory(runner):
+    jobs = [runner.create_job('seraphina', [f"Prompt {i}"]) for i in range(4)]
+
+    assert list(runner.jobs) == [job.job_id for job in jobs[2:]]
+
+    # Dropped jobs are reloaded from disk
+    reloaded = runner.get_job(jobs[0].job_id)
+    assert reloaded is not jobs[0] and reloaded.items == jobs[0].items
+    assert list(runner.jobs) == [jobs[3].job_id, jobs[0].job_id]
+
+def test_running_jobs_stay_in_memory(runner):
+    first = runner.create_job('seraphina', ["Still running"])
+    runner._running.add(first.job_id)
+
+    for i in range(3):
+        runner.create_job('seraphina', [f"Prompt {i}"])
+
+    assert first.job_id in runner.jobs
+    assert len(runner.jobs) == 2
+
+def test_last_admission_attempt_does_not_sleep(runner, monkeypatch):
+    from agents import batch
+    from agents.scheduler import QueueFullError
+
+    class BusyAgent(EchoAgent):
+        calls = 0
+
+        async def generate_response_async(self, prompt, context=None, model=None, plan=None):
+            BusyAgent.calls += 1
+            raise QueueFullError(plan, retry_after=7)
+
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(batch.asyncio, 'sleep', sleep)
+    runner.max_attempts = 3
+    job = runner.create_job('seraphina', ["Busy?"])
+
+    result = asyncio.run(runner._generate(job, BusyAgent(), 0))
+
+    assert BusyAgent.calls == 3
+    assert sleeps == [7, 7]
+    assert result['response'] is None and 'full' in result['error']
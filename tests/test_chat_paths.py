@@ -0,0 +1,135 @@
+"""
+Chat path tests against the fake Ollama server
+AgentCore, RomanticPersonality and EnhancedAgent, including the fallback paths
+"""
+
+import pytest
+
+@pytest.fixture
+def agent_core(engine):
+    from agents.core import AgentCore
+    return AgentCore('test_agent')
+
+@pytest.fixture
+def personality(engine):
+    from agents.seraphina.engine.romantic_ai import RomanticPersonality
+    return RomanticPersonality()
+
+@pytest.fixture
+def seraphina_agent(engine):
+    from agents.manager import agent_manager
+    return agent_manager.get_agent('seraphina', 'chat_path_user')
+
+def test_core_generate_response(agent_core, fake_ollama):
+    before = fake_ollama.fake.get_stats()['generate']
+
+    response = agent_core.generate_response("What should we cook tonight?")
+
+    assert response
+    assert response != agent_core.fallback_response()
+    assert fake_ollama.fake.get_stats()['generate'] == before + 1
+
+def test_core_generate_response_is_deterministic(agent_core):
+    first = agent_core.generate_response("Tell me about the ocean")
+    second = agent_core.generate_response("Tell me about the ocean")
+
+    assert first == second
+
+def test_core_stream_matches_generate(agent_core):
+    streamed = list(agent_core.generate_response_stream("How was the concert last night?"))
+
+    assert len(streamed) > 1
+    assert not streamed[0][0].isspace()
+    assert ''.join(streamed).strip() == agent_core.generate_response("How was the concert last night?")
+
+def test_core_shared_cache_tier_runs_off_the_loop(agent_core, engine):
+    import threading
+    from agents.cache import CompletionCache
+
+    threads = []
+
+    class SharedTier:
+        errors = 0
+
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return None
+
+        def set(self, key, value, ttl):
+            threads.append(threading.current_thread())
+
+    agent_core.completion_cache = CompletionCache()
+    agent_core.completion_cache.shared = SharedTier()
+
+    agent_core.generate_response("Shall we go for a walk?")
+
+    assert len(threads) == 2
+    assert engine._thread not in threads
+    assert agent_core.completion_cache.get_stats()['stores'] == 1
+
+def test_core_falls_back_to_fallback_model(agent_core, engine, fail_models):
+    fail_models('yi:6b')
+    fallbacks = engine.stats['fallbacks']
+
+    response = agent_core.generate_response("Any plans for the weekend?")
+
+    assert response != agent_core.fallback_response()
+    assert engine.stats['fallbacks'] == fallbacks + 1
+
+def test_core_stream_falls_back_before_first_token(agent_core, engine, fail_models):
+    fail_models('yi:6b')
+    fallbacks = engine.stats['fallbacks']
+
+    tokens = list(agent_core.generate_response_stream("Which book are you reading?"))
+
+    assert ''.join(tokens) != agent_core.fallback_response()
+    assert engine.stats['fallbacks'] == fallbacks + 1
+
+def test_core_returns_fallback_response_when_every_model_fails(agent_core, fail_models):
+    fail_models('yi:6b', 'llama3.2:3b')
+
+    assert agent_core.generate_response("Is anyone there?") == agent_core.fallback_response()
+    assert list(agent_core.generate_response_stream("Is anyone there?")) == [agent_core.fallback_response()]
+
+def test_romantic_generate_response(personality):
+    response = personality.generate_response("I missed you today", model='gemma2:2b')
+
+    assert response
+    assert not personality.is_fallback_response(response)
+
+def test_romantic_generate_response_falls_back(personality, engine, fail_models):
+    fail_models('yi:6b')
+    fallbacks = engine.stats['fallbacks']
+
+    response = personality.generate_response("Good morning, sunshine")
+
+    assert not personality.is_fallback_response(response)
+    assert engine.stats['fallbacks'] == fallbacks + 1
+
+def test_romantic_generate_response_when_every_model_fails(personality, fail_models):
+    fail_models('yi:6b', personality.fallback_model())
+
+    assert personality.is_fallback_response(personality.generate_response("Are you awake?"))
+
+def test_enhanced_agent_contextual_response(seraphina_agent):
+    result = seraphina_agent.generate_contextual_response("I love spending time with you", 'chat_path_user')
+
+    assert result['response']
+    assert result['response'] != seraphina_agent.fallback_response()
+    assert result['model_used']
+    assert result['response_time'] >= 0
+
+    recent = seraphina_agent.memory_system.get_context('chat_path_user')['recent_interactions']
+    assert recent[-1]['content']['user_input'] == "I love spending time with you"
+    assert recent[-1]['content']['response'] == result['response']
+
+def test_enhanced_agent_contextual_response_falls_back(seraphina_agent, engine, fail_models):
+    model = seraphina_agent.select_model_for_context(
+        seraphina_agent.emotion_engine.analyze_emotion("What a strange day"))
+    fail_models(model)
+    fallbacks = engine.stats['fallbacks']
+
+    result = seraphina_agent.generate_contextual_response("What a strange day", 'chat_path_user')
+
+    assert not result['response'].startswith(seraphina_agent.fallback_response())
+    assert engine.stats['fallbacks'] == fallbacks + 1
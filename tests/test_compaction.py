@@ -0,0 +1,81 @@
+"""
+Conversation compaction tests against the fake Ollama server
+Summarizing whole periods past the horizon, then expiring their raw turns
+"""
+
+from datetime import datetime, timedelta
+import pytest
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+@pytest.fixture
+def memory(engine):
+    from agents.seraphina.memory.emotional_memory import EmotionalMemory
+    return EmotionalMemory()
+
+@pytest.fixture
+def compactor(memory):
+    from agents.seraphina.memory.compaction import ConversationCompactor
+    return ConversationCompactor(memory, horizon_days=30)
+
+def fill_log(memory, user_id, days_ago, turns_per_day=2):
+    """Turns on each of the given days, in small segments so old ones can expire"""
+
+    log = memory._interaction_log(user_id)
+    log.max_segment_bytes = 300
+    for days in days_ago:
+        day = (NOW - timedelta(days=days)).replace(hour=9)
+        log.write_batch([log.prepare({
+            'timestamp': (day + timedelta(minutes=i)).isoformat(),
+            'user_message': f"Day {days} message {i}",
+            'ai_response': f"Day {days} reply {i}",
+            'user_emotion': 'joy'
+        }) for i in range(turns_per_day)])
+    return log
+
+def test_compact_user_summarizes_old_days_and_expires_them(memory, compactor):
+    log = fill_log(memory, 'compact_user', [45, 44, 40, 3, 1])
+
+    written = compactor.compact_user('compact_user', now=NOW)
+
+    summaries = memory.summaries.all('compact_user')
+    assert written == 3
+    assert [s['period'] for s in summaries] == [f"{NOW - timedelta(days=d):%Y-%m-%d}" for d in (45, 44, 40)]
+    assert all(s['interactions'] == 2 and s['summary'] for s in summaries)
+    assert summaries[0]['emotions'] == {'joy': 2}
+
+    # Only whole segments before the last summarized day are dropped
+    expired = compactor.get_stats()['expired_interactions']
+    assert 0 < expired <= 6
+    assert log.count() == 10
+    remaining = [t['user_message'] for t in log.scan()]
+    assert remaining[-4:] == ['Day 3 message 0', 'Day 3 message 1', 'Day 1 message 0', 'Day 1 message 1']
+    assert len(remaining) == 10 - expired
+
+def test_compact_user_is_incremental(memory, compactor):
+    fill_log(memory, 'incremental_user', [50, 49])
+
+    assert compactor.compact_user('incremental_user', now=NOW) == 2
+    assert compactor.compact_user('incremental_user', now=NOW) == 0
+
+    # A day later the next day past the horizon is summarized on its own
+    fill_log(memory, 'incremental_user', [31])
+    assert compactor.compact_user('incremental_user', now=NOW + timedelta(days=2)) == 1
+    assert len(memory.summaries.all('incremental_user')) == 3
+
+def test_compact_user_leaves_turns_when_summaries_fail(memory, compactor, fail_models):
+    log = fill_log(memory, 'failing_user', [60, 59])
+    fail_models(compactor.model, compactor.fallback_model)
+
+    assert compactor.compact_user('failing_user', now=NOW) == 0
+    assert compactor.get_stats()['summary_errors'] == 1
+    assert memory.summaries.all('failing_user') == []
+    assert len(list(log.scan())) == 4
+
+def test_compact_user_respects_max_periods_per_run(memory, compactor):
+    compactor.max_periods_per_run = 2
+    fill_log(memory, 'busy_user', [70, 69, 68, 67])
+
+    assert compactor.compact_user('busy_user', now=NOW) == 2
+    assert compactor.compact_user('busy_user', now=NOW) == 2
+    assert compactor.compact_user('busy_user', now=NOW) == 0
@@ -0,0 +1,56 @@
+"""
+Context packer tests
+Background num_ctx lookups and their retry after a failure
+"""
+
+import time
+import pytest
+
+def wait_for_lookup(model):
+    from agents import context_packer
+
+    deadline = time.time() + 5
+    while model in context_packer._num_ctx_pending and time.time() < deadline:
+        time.sleep(0.01)
+    assert model not in context_packer._num_ctx_pending
+
+def test_num_ctx_is_read_in_the_background(fake_ollama):
+    from agents import context_packer
+
+    fake_ollama.fake.profile('phi3:14b').num_ctx = 8192
+
+    assert context_packer.get_num_ctx('phi3:14b') == context_packer.DEFAULT_NUM_CTX
+    wait_for_lookup('phi3:14b')
+    assert context_packer.get_num_ctx('phi3:14b') == 8192
+
+def test_failed_lookup_retries_after_delay(fake_ollama, monkeypatch, capsys):
+    from agents import context_packer
+    from agents.ollama_client import OllamaClient, OllamaError
+
+    def unreachable(self, model, timeout=5):
+        raise OllamaError("unreachable")
+
+    monkeypatch.setattr(OllamaClient, 'show', unreachable)
+    fake_ollama.fake.profile('qwen2.5:7b').num_ctx = 4096
+
+    assert context_packer.get_num_ctx('qwen2.5:7b') == context_packer.DEFAULT_NUM_CTX
+    wait_for_lookup('qwen2.5:7b')
+    assert "Could not read num_ctx for qwen2.5:7b" in capsys.readouterr().out
+
+    # Within the retry delay no new lookup starts
+    monkeypatch.undo()
+    assert context_packer.get_num_ctx('qwen2.5:7b') == context_packer.DEFAULT_NUM_CTX
+    assert 'qwen2.5:7b' not in context_packer._num_ctx_pending
+    assert context_packer._num_ctx_retry_at['qwen2.5:7b'] > time.time()
+
+    # Once it has passed, the next call looks the model up again
+    context_packer._num_ctx_retry_at['qwen2.5:7b'] = 0
+    context_packer.get_num_ctx('qwen2.5:7b')
+    wait_for_lookup('qwen2.5:7b')
+    assert context_packer.get_num_ctx('qwen2.5:7b') == 4096
+
+@pytest.mark.parametrize('model, text, tokens', [('gemma2:2b', 'x' * 40, 10), ('yi:6b', 'x' * 35, 10), (None, '', 0)])
+def test_estimate_tokens(model, text, tokens):
+    from agents.context_packer import estimate_tokens
+
+    assert estimate_tokens(text, model) == tokens
@@ -0,0 +1,123 @@
+"""
+Generation engine tests
+Blocking stream() guards and keeping synchronous work off the engine loop
+"""
+
+import threading
+import pytest
+
+@pytest.fixture
+def small_engine(fake_ollama):
+    """A private engine with one admission slot and a short slot timeout"""
+
+    from agents.generation import GenerationEngine
+
+    engine = GenerationEngine(admission_capacity=1, slot_timeout=0.2)
+    engine.start()
+    yield engine
+    engine.stop()
+
+def test_stream_yields_chunks(engine):
+    chunks = list(engine.stream('gemma2:2b', "Stream me a short answer"))
+
+    assert chunks[-1]['done']
+    assert ''.join(chunk.get('response', '') for chunk in chunks).strip()
+
+def test_stream_refuses_engine_loop_thread(engine):
+    async def stream_on_loop():
+        return next(engine.stream('gemma2:2b', "Never sent"))
+
+    with pytest.raises(RuntimeError):
+        engine.run(stream_on_loop()).result(5)
+
+def test_stream_admission_timeout_raises_queue_full(small_engine):
+    from agents.scheduler import QueueFullError
+
+    # Hold the only admission slot
+    small_engine.run(small_engine.scheduler.acquire('free')).result(5)
+
+    with pytest.raises(QueueFullError) as error:
+        next(small_engine.stream('gemma2:2b', "Waits for a slot"))
+    assert error.value.retry_after >= 1
+
+    stats = small_engine.run(_scheduler_stats(small_engine)).result(5)
+    assert stats['queued'].get('free', 0) == 0
+    assert stats['plans']['free']['rejected'] == 1
+
+    # Once the slot is free, streaming works again
+    small_engine.loop.call_soon_threadsafe(small_engine.scheduler.release)
+    assert list(small_engine.stream('gemma2:2b', "Gets the slot"))[-1]['done']
+
+def test_stream_model_slot_timeout_raises(small_engine):
+    small_engine.model_concurrency['gemma2:2b'] = 1
+    semaphore = small_engine.run(small_engine._acquire('gemma2:2b')).result(5)
+    try:
+        with pytest.raises(TimeoutError):
+            next(small_engine.stream('gemma2:2b', "Waits for the model"))
+    finally:
+        small_engine.loop.call_soon_threadsafe(small_engine._release, 'gemma2:2b', semaphore)
+
+    # The admission slot taken by the timed-out stream was given back
+    assert small_engine.run(_scheduler_stats(small_engine)).result(5)['active'] == 0
+
+def test_contextual_response_keeps_memory_work_off_the_loop(engine, monkeypatch):
+    from agents.manager import agent_manager
+
+    agent = agent_manager.get_agent('seraphina', 'loop_thread_user')
+    threads = {}
+
+    def record(target, name):
+        method = getattr(target, name)
+
+        def wrapper(*args, **kwargs):
+            threads[name] = threading.current_thread()
+            return method(*args, **kwargs)
+        monkeypatch.setattr(target, name, wrapper)
+
+    record(agent.memory_system, 'get_context')
+    record(agent.memory_system, 'store_interaction')
+    record(agent.emotion_engine, 'analyze_emotion')
+
+    agent.generate_contextual_response("Tell me a secret", 'loop_thread_user')
+
+    assert set(threads) == {'get_context', 'store_interaction', 'analyze_emotion'}
+    assert all(thread is not engine._thread for thread in threads.values())
+
+async def _scheduler_stats(engine):
+    return engine.scheduler.get_stats()
+
+def half_open(engine, model):
+    """Trip `model`'s breaker with no cooldown, so the next allow() is its probe"""
+
+    breaker = engine.breakers.get(model)
+    breaker.cooldown = 0
+    with breaker._lock:
+        breaker._trip()
+    return breaker
+
+def test_abandoned_probe_is_released(engine):
+    breaker = half_open(engine, 'phi3:14b')
+
+    stream = engine.stream_resilient('phi3:14b', "Probe me", fallback_model='gemma2:2b')
+    next(stream)
+    assert breaker.state == breaker.HALF_OPEN
+    stream.close()
+
+    # The next request probes the model instead of going to the fallback
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+
+def test_probe_rejected_by_admission_is_released(small_engine):
+    from agents.scheduler import QueueFullError
+
+    breaker = half_open(small_engine, 'gemma2:2b')
+    small_engine.run(small_engine.scheduler.acquire('free')).result(5)
+    try:
+        assert breaker.allow()
+        with pytest.raises(QueueFullError):
+            next(small_engine.stream('gemma2:2b', "Waits for a slot"))
+    finally:
+        small_engine.loop.call_soon_threadsafe(small_engine.scheduler.release)
+
+    assert breaker.allow()
@@ -0,0 +1,119 @@
+"""
+Interaction log tests
+Segment rolls, tail and scan across segments, torn-write recovery and expiry
+"""
+
+import os
+import pytest
+
+BASE = 1760000000
+
+@pytest.fixture
+def log(tmp_path, fake_ollama):
+    from agents.seraphina.memory.interaction_log import InteractionLog
+
+    log = InteractionLog(str(tmp_path / 'u1'), max_segment_bytes=256)
+    for i in range(30):
+        log.append({'timestamp': BASE + i, 'turn': i, 'user_message': f"message {i}"})
+    return log
+
+def turns(records):
+    return [record['turn'] for record in records]
+
+def test_appends_roll_over_into_segments(log):
+    sequences = log._sequences()
+
+    assert len(sequences) > 3
+    assert sequences == list(range(1, len(sequences) + 1))
+    assert all(os.path.getsize(log._segment_file(s)) <= 256 for s in sequences)
+    assert log.count() == 30
+
+def test_tail_across_segments(log):
+    assert turns(log.tail(1)) == [29]
+    assert turns(log.tail(12)) == list(range(18, 30))
+    assert turns(log.tail(100)) == list(range(30))
+    assert log.tail(0) == []
+
+def test_scan_across_segments(log):
+    assert turns(log.scan()) == list(range(30))
+    assert turns(log.scan(BASE + 3, BASE + 17)) == list(range(3, 17))
+    assert turns(log.scan(start=BASE + 25)) == list(range(25, 30))
+    assert turns(log.scan(end=BASE + 2)) == [0, 1]
+    assert list(log.scan(BASE + 100)) == []
+
+def test_scan_accepts_iso_timestamps(tmp_path, fake_ollama):
+    from agents.seraphina.memory.interaction_log import InteractionLog
+
+    log = InteractionLog(str(tmp_path / 'iso'))
+    for day in range(1, 5):
+        log.append({'timestamp': f"2026-10-0{day}T12:00:00", 'turn': day})
+
+    assert turns(log.scan('2026-10-02T00:00:00', '2026-10-04T00:00:00')) == [2, 3]
+
+def test_torn_last_record_is_recovered(log):
+    sequence = log._sequences()[-1]
+
+    # A crash mid-append: part of a record and part of its index entry
+    with open(log._segment_file(sequence), 'ab') as f:
+        f.write(b'{"timestamp": 1760000030, "tu')
+    with open(log._index_file(sequence), 'ab') as f:
+        f.write(b'\x00\x01\x02')
+
+    # Readers ignore the torn tail
+    assert log.count() == 30
+    assert turns(log.tail(2)) == [28, 29]
+
+    # The next writer truncates it before appending
+    log.append({'timestamp': BASE + 30, 'turn': 30})
+
+    assert log.count() == 31
+    assert turns(log.tail(3)) == [28, 29, 30]
+    assert turns(log.scan(start=BASE + 28)) == [28, 29, 30]
+
+def test_record_without_index_entry_is_dropped(log):
+    sequence = log._sequences()[-1]
+
+    # The record reached the segment but its index entry (the commit point) did not
+    with open(log._segment_file(sequence), 'ab') as f:
+        f.write(b'{"timestamp": 1760000030, "turn": 99}\n')
+
+    log.append({'timestamp': BASE + 30, 'turn': 30})
+
+    assert turns(log.scan(start=BASE + 29)) == [29, 30]
+    assert log.count() == 31
+
+def test_expire_before_drops_whole_old_segments(log):
+    sequences = log._sequences()
+    removed = log.expire_before(BASE + 15)
+
+    assert removed > 0
+    assert log.expired_count() == removed
+    assert log.count() == 30
+    assert log._sequences() == sequences[-len(log._sequences()):]
+
+    kept = turns(log.scan())
+    assert kept == list(range(removed, 30))
+    # Segments straddling the cutoff are kept whole
+    assert kept[0] <= 15
+
+def test_expire_before_keeps_the_segment_being_written(log):
+    last = log._sequences()[-1]
+
+    removed = log.expire_before(BASE + 1000)
+
+    assert log._sequences() == [last]
+    assert log.count() == 30
+    assert turns(log.tail(100)) == list(range(removed, 30))
+    assert log.expire_before(BASE + 1000) == 0
+
+def test_emotional_memory_reads_see_queued_interactions(fake_ollama):
+    from agents.seraphina.memory.emotional_memory import EmotionalMemory
+
+    memory = EmotionalMemory()
+    for i in range(30):
+        memory.store_interaction('queued_user', f"message {i}", f"reply {i}", 'joy', 'romantic')
+
+    # Reads right after the stores include records still queued on the JSONL writer
+    assert memory.count_interactions('queued_user') == 30
+    assert [t['user_message'] for t in memory._load_recent_interactions('queued_user', 3)] == [
+        'message 29', 'message 28', 'message 27']
@@ -0,0 +1,142 @@
+"""
+Memory backend tests
+SQLite logs and profiles, epoch timestamps, and the JSONL to SQLite migration
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def sqlite_backend(tmp_path, fake_ollama):
+    from agents.memory_backend import SQLiteBackend
+    return SQLiteBackend(str(tmp_path / 'memory.db'))
+
+def test_memory_backend_is_abstract(fake_ollama):
+    from agents.memory_backend import MemoryBackend
+
+    with pytest.raises(TypeError):
+        MemoryBackend()
+
+def test_record_timestamp_accepts_iso_and_epoch(fake_ollama):
+    from datetime import datetime
+    from agents.memory_backend import record_timestamp
+
+    assert record_timestamp({'timestamp': 1700000000}) == 1700000000
+    assert record_timestamp({'timestamp': 1700000000.5}) == 1700000000.5
+    assert record_timestamp({'timestamp': '2026-10-01T12:00:00'}) == datetime(2026, 10, 1, 12).timestamp()
+    for record in ({}, {'timestamp': 'yesterday'}, {'timestamp': ['?']}, None):
+        assert abs(record_timestamp(record) - time.time()) < 5
+
+def test_sqlite_log_round_trip(sqlite_backend):
+    from agents.jsonl_writer import flush_jsonl_writer
+
+    for i in range(5):
+        sqlite_backend.append('interaction', 'u1', {'timestamp': f"2026-10-0{i + 1}T09:00:00", 'turn': i})
+    sqlite_backend.append('learning', 'u1', {'timestamp': '2026-10-01T09:00:00', 'rating': 5})
+    flush_jsonl_writer()
+
+    log = sqlite_backend.log('interaction', 'u1')
+    assert log.count() == 5
+    assert [record['turn'] for record in log.tail(2)] == [3, 4]
+    assert [record['turn'] for record in log.scan('2026-10-02T00:00:00', '2026-10-04T00:00:00')] == [1, 2]
+    assert sqlite_backend.user_ids('interaction') == ['u1']
+    assert sqlite_backend.log('learning', 'u1').count() == 1
+
+def test_sqlite_epoch_timestamps_scan_and_expire(sqlite_backend):
+    now = time.time()
+    log = sqlite_backend.log('interaction', 'epoch_user')
+    log.write_batch([log.prepare({'timestamp': now - (i + 1) * 100, 'turn': i}) for i in range(20)])
+
+    assert len(list(log.scan(start=now - 500))) == 5
+    assert log.expire_before(now - 1000) == 10
+    assert len(list(log.scan())) == 10
+    assert log.count() == 20
+    assert log.expired_count() == 10
+
+def test_sqlite_profiles(sqlite_backend):
+    sqlite_backend.write_profiles([('u1', json.dumps({'name': 'Ada'}))])
+    sqlite_backend.write_profiles([('u1', json.dumps({'name': 'Ada', 'mood': 'happy'}))])
+
+    assert sqlite_backend.load_profile('u1') == {'name': 'Ada', 'mood': 'happy'}
+    assert sqlite_backend.load_profile('nobody') is None
+
+def write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        # A torn last line is skipped
+        f.write('{"timestamp": "2026-10-0')
+
+@pytest.fixture
+def memory_dir(tmp_path, fake_ollama):
+    """A file-backed memory directory with every kind of source"""
+
+    from agents.seraphina.memory.interaction_log import InteractionLogStore
+
+    path = tmp_path / 'memory'
+    path.mkdir()
+    write_jsonl(path / 'u1_2026-10-01.jsonl',
+                [{'timestamp': f"2026-10-01T0{i}:00:00", 'user_message': f"hi {i}"} for i in range(3)])
+    write_jsonl(path / 'memory_2026-10-01.jsonl',
+                [{'timestamp': 1759300000 + i, 'user_id': f"u{i % 2}", 'content': 'note'} for i in range(4)])
+    write_jsonl(path / 'u1_learning.jsonl', [{'timestamp': '2026-10-01T10:00:00', 'rating': 4}])
+    (path / 'u1_profile.json').write_text(json.dumps({'name': 'Ada'}))
+
+    log = InteractionLogStore(str(path / 'interactions')).log('u2')
+    for i in range(2):
+        log.append({'timestamp': f"2026-10-02T0{i}:00:00", 'user_message': f"hey {i}"})
+
+    return str(path)
+
+def test_migrate_round_trip_and_reimport(memory_dir):
+    from agents.memory_backend import SQLiteBackend
+    from agents.migrate_memory import main
+
+    result = subprocess.run([sys.executable, '-m', 'agents.migrate_memory', '--path', memory_dir],
+                            cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    counts = json.loads(result.stdout.strip().splitlines()[-1])
+    assert counts == {'path': memory_dir, 'interaction': 5, 'memory': 4, 'learning': 1, 'profile': 1,
+                      'skipped_sources': 0, 'failed_sources': 0}
+
+    backend = SQLiteBackend(os.path.join(memory_dir, 'memory.db'))
+    assert [r['user_message'] for r in backend.log('interaction', 'u1').scan()] == ['hi 0', 'hi 1', 'hi 2']
+    assert [r['user_message'] for r in backend.log('interaction', 'u2').scan()] == ['hey 0', 'hey 1']
+    assert backend.log('memory', 'u0').count() == 2
+    assert backend.log('learning', 'u1').tail(1) == [{'timestamp': '2026-10-01T10:00:00', 'rating': 4}]
+    assert backend.load_profile('u1') == {'name': 'Ada'}
+
+    # A second run skips every source it already imported
+    assert main(['--path', memory_dir]) == 0
+    assert backend.log('interaction', 'u1').count() == 3
+    assert backend.log('memory', 'u1').count() == 2
+
+def test_migrate_reimport_counts_skips(memory_dir, capsys):
+    from agents.migrate_memory import main, migrate
+
+    assert main(['--path', memory_dir, '--dry-run']) == 0
+    assert json.loads(capsys.readouterr().out)['interaction'] == 5
+
+    first = migrate(memory_dir)
+    second = migrate(memory_dir)
+
+    assert first['skipped_sources'] == 0
+    assert second == {'interaction': 0, 'memory': 0, 'learning': 0, 'profile': 0,
+                      'skipped_sources': 5, 'failed_sources': 0}
+
+def test_migrated_records_expire(memory_dir):
+    from agents.memory_backend import get_memory_backend
+    from agents.migrate_memory import migrate
+
+    migrate(memory_dir)
+    log = get_memory_backend(memory_dir, 'sqlite').log('interaction', 'u1')
+
+    assert log.expire_before('2026-10-01T02:00:00') == 2
+    assert [r['user_message'] for r in log.scan()] == ['hi 2']
+    assert log.count() == 3
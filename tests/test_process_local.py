@@ -0,0 +1,71 @@
+"""
+Process-local singleton and shared counter tests
+Per-process rebuilds after fork, and stats kept exact under concurrency
+"""
+
+import os
+import threading
+
+def test_process_local_builds_once_per_process():
+    from agents.process_local import ProcessLocal
+
+    built = []
+    local = ProcessLocal(lambda: built.append(object()) or built[-1])
+
+    assert local.peek() is None
+    assert local.get() is local.get() is local.peek()
+    assert len(built) == 1
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: the parent's instance is not reused, and the new one sticks
+        ok = local.peek() is None and local.get() is not built[0] and local.get() is local.peek()
+        os.write(write, b'1' if ok else b'0')
+        os._exit(0)
+
+    os.close(write)
+    assert os.read(read, 1) == b'1'
+    os.close(read)
+    os.waitpid(pid, 0)
+    assert local.get() is built[0]
+
+def run_threads(target, count=8):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_vector_memory_counters_are_exact_under_threads(tmp_path):
+    from agents.semantic_cache import HashingEmbedder
+    from agents.vector_memory import VectorMemory
+
+    memory = VectorMemory(str(tmp_path), HashingEmbedder(), max_resident_users=2)
+
+    def recall_and_remember():
+        for i in range(50):
+            memory.recall(f"user{i % 3}", "Where did we go on our first date?")
+            memory._remember(f"user{i % 3}", f"We went to the lake {i}", {})
+
+    run_threads(recall_and_remember)
+    stats = memory.get_stats()
+
+    assert stats['recalls'] == 400
+    assert stats['remembered'] == 400
+
+def test_embedding_counters_are_exact_under_threads(tmp_path, monkeypatch):
+    from agents.embeddings import EmbeddingService
+
+    service = EmbeddingService('fake-embed', cache_path=str(tmp_path))
+    monkeypatch.setattr(service, '_call', lambda texts: [[float(len(text)), 1.0] for text in texts])
+
+    def embed():
+        for i in range(25):
+            service.embed(f"text {i}")
+
+    run_threads(embed)
+    stats = service.get_stats()
+
+    assert stats['requests'] == 200
+    assert stats['requests'] == stats['cache_hits'] + stats['coalesced'] + stats['batched_texts']
@@ -0,0 +1,128 @@
+"""
+Profile store tests
+Write-behind batching, eviction of dirty profiles, and the flush on shutdown
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def read_profile(store, user_id):
+    with open(store.profile_file(user_id), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def test_updates_are_written_behind_in_one_write(tmp_path, fake_ollama):
+    from agents.seraphina.memory.profile_store import ProfileStore
+
+    store = ProfileStore(str(tmp_path), flush_interval=3600, fsync=False)
+    profile = {'name': 'Ada', 'messages': 0}
+    store.put('u1', profile)
+    for _ in range(9):
+        profile['messages'] += 1
+        store.mark_dirty('u1')
+
+    assert not os.path.exists(store.profile_file('u1'))
+
+    store.flush()
+    stats = store.get_stats()
+
+    assert read_profile(store, 'u1') == {'name': 'Ada', 'messages': 9}
+    assert stats['updates'] == 10
+    assert stats['writes'] == 1
+    assert stats['dirty'] == 0
+
+def test_evicted_dirty_profile_stays_readable_until_written(tmp_path, fake_ollama):
+    from agents.seraphina.memory.profile_store import ProfileStore
+
+    store = ProfileStore(str(tmp_path), flush_interval=3600, max_cached=1, fsync=False)
+    store.put('u1', {'name': 'Ada'})
+    store.put('u2', {'name': 'Grace'})
+
+    assert store.get_stats()['cached'] == 1
+    assert store.get('u1') == {'name': 'Ada'}
+
+    store.flush()
+    assert read_profile(store, 'u1') == {'name': 'Ada'}
+    assert read_profile(store, 'u2') == {'name': 'Grace'}
+
+def test_flush_profile_stores_writes_dirty_profiles(tmp_path, fake_ollama):
+    from agents.seraphina.memory.profile_store import flush_profile_stores, get_profile_store
+
+    store = get_profile_store(str(tmp_path))
+    store.flush_interval = 3600
+    store.put('u1', {'name': 'Ada'})
+    assert not os.path.exists(store.profile_file('u1'))
+
+    # What gunicorn's worker_exit hook runs
+    flush_profile_stores()
+
+    assert read_profile(store, 'u1') == {'name': 'Ada'}
+
+def test_profiles_are_flushed_at_interpreter_exit(tmp_path, fake_ollama):
+    script = (
+        "import sys\n"
+        "from agents.seraphina.memory.profile_store import get_profile_store\n"
+        "store = get_profile_store(sys.argv[1])\n"
+        "store.flush_interval = 3600\n"
+        "store.put('u1', {'name': 'Ada'})\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script, str(tmp_path)],
+                            cwd=ROOT, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    with open(tmp_path / 'u1_profile.json', 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'name': 'Ada'}
+
+def test_sqlite_backed_profiles_flush_on_close(tmp_path, fake_ollama):
+    from agents.memory_backend import SQLiteBackend
+    from agents.seraphina.memory.profile_store import ProfileStore
+
+    backend = SQLiteBackend(str(tmp_path / 'memory.db'))
+    store = ProfileStore(str(tmp_path), flush_interval=3600, backend=backend)
+    store.put('u1', {'name': 'Ada'})
+    assert backend.load_profile('u1') is None
+
+    store.close()
+
+    assert backend.load_profile('u1') == {'name': 'Ada'}
+    assert not os.path.exists(store.profile_file('u1'))
+
+def test_profile_file_stays_inside_path(tmp_path, fake_ollama):
+    from agents.seraphina.memory.profile_store import ProfileStore
+
+    store = ProfileStore(str(tmp_path / 'profiles'), flush_interval=3600, fsync=False)
+    store.put('../escape', {'name': 'Mallory'})
+    store.put('a/b', {'name': 'Eve'})
+    store.flush()
+
+    assert sorted(os.listdir(tmp_path)) == ['profiles']
+    assert os.path.dirname(store.profile_file('../escape')) == store.path
+    assert store.get('../escape') == {'name': 'Mallory'}
+    assert ProfileStore(store.path).get('a/b') == {'name': 'Eve'}
+
+def test_profile_is_reconciled_with_the_interaction_log(fake_ollama):
+    from agents.seraphina.memory.emotional_memory import EmotionalMemory
+
+    memory = EmotionalMemory()
+    for i in range(5):
+        memory.store_interaction('crashed_user', f"message {i}", f"reply {i}", 'joy', 'romantic')
+    memory.profile_store.flush()
+    for i in range(5, 8):
+        memory.store_interaction('crashed_user', f"message {i}", f"reply {i}", 'sad', 'caring')
+
+    # A crash inside the write-behind window: the log kept the turns, the profile did not
+    store = memory.profile_store
+    with store._lock:
+        store._dirty.pop('crashed_user', None)
+        store._profiles.pop('crashed_user', None)
+
+    profile = EmotionalMemory().get_user_profile('crashed_user')
+
+    assert profile['total_interactions'] == 8
+    assert profile['emotional_patterns'] == {'joy': 5, 'sad': 3}
+    assert profile['favorite_moods'] == {'romantic': 5, 'caring': 3}
+    assert len(profile['relationship_aggregate']['recent_emotions']) == 8
+    assert 'crashed_user' in store._dirty
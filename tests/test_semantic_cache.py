@@ -0,0 +1,127 @@
+"""
+Semantic cache tests with the deterministic HashingEmbedder
+Paraphrase matching, scoping, and the streaming chat paths
+"""
+
+import pytest
+
+THRESHOLD = 0.8
+
+@pytest.fixture
+def cache(fake_ollama):
+    from agents.semantic_cache import SemanticCache, HashingEmbedder
+    return SemanticCache(HashingEmbedder(), threshold=THRESHOLD)
+
+@pytest.fixture
+def seraphina(engine, cache):
+    from agents.seraphina.logic import SerafinaEngine
+
+    seraphina = SerafinaEngine()
+    seraphina.semantic_cache = cache
+    return seraphina
+
+@pytest.fixture
+def agent(engine, cache):
+    from agents.manager import EnhancedAgent, agent_manager
+
+    agent = EnhancedAgent('seraphina', agent_manager.agent_registry['seraphina'])
+    agent.semantic_cache = cache
+    return agent
+
+def test_paraphrase_hit(cache):
+    cache.store(('seraphina', 'romantic', 'yi:6b'), "What should we do this weekend?", "Stargazing 🌟")
+
+    assert cache.lookup(('seraphina', 'romantic', 'yi:6b'), "What should we do on the weekend?") == "Stargazing 🌟"
+    assert cache.get_stats()['hits'] == 1
+
+def test_miss_below_threshold(cache):
+    cache.store(('seraphina', 'romantic', 'yi:6b'), "I miss you so much", "I miss you too 💕")
+
+    assert cache.lookup(('seraphina', 'romantic', 'yi:6b'), "I really miss you") is None
+    assert cache.lookup(('seraphina', 'romantic', 'yi:6b'), "Tell me about quantum physics") is None
+    assert cache.get_stats()['misses'] == 2
+
+def test_scopes_are_isolated(cache):
+    cache.store(('seraphina', 'romantic', 'yi:6b'), "How are you doing today?", "Better now 💕")
+
+    assert cache.lookup(('seraphina', 'playful', 'gemma2:2b'), "How are you doing today?") is None
+    assert cache.lookup(('healer', 'llama3.2:3b'), "How are you doing today?") is None
+    assert cache.lookup(('seraphina', 'romantic', 'yi:6b'), "How are you doing today?") == "Better now 💕"
+
+def test_expired_entries_miss(cache):
+    cache.ttl = -1
+    cache.store(('scope',), "Good night, love", "Sweet dreams 🌙")
+
+    assert cache.lookup(('scope',), "Good night, love") is None
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_index_overwrites_oldest_entries(use_numpy, monkeypatch):
+    from agents import semantic_cache
+    from agents.semantic_cache import HashingEmbedder, VectorIndex
+
+    if not use_numpy:
+        monkeypatch.setattr(semantic_cache, 'np', None)
+
+    embed = HashingEmbedder()
+    messages = [f"message number {i} about {word}" for i, word in enumerate(['cats', 'rain', 'tea', 'jazz', 'sea'])]
+    index = VectorIndex(max_entries=3)
+    for message in messages:
+        index.add(embed(message), {'message': message})
+
+    assert len(index) == 3
+    for message in messages[2:]:
+        score, payload = index.nearest(embed(message))
+        assert payload == {'message': message}
+        assert score == pytest.approx(1.0, abs=1e-5)
+    assert index.nearest(embed(messages[0]))[1] != {'message': messages[0]}
+    assert VectorIndex().nearest(embed("empty")) == (-1.0, None)
+
+def test_romantic_stream_serves_paraphrase_from_cache(seraphina, cache, fake_ollama):
+    first = list(seraphina.stream_romantic_response("What should we do this weekend?", user_id='cache_user'))
+    assert cache.get_stats()['stores'] == 1
+
+    generations = fake_ollama.fake.get_stats()['generate']
+    invalidated = seraphina.sessions.get_stats()['invalidated']
+
+    events = list(seraphina.stream_romantic_response("What should we do on the weekend?", user_id='cache_user'))
+
+    assert [event['type'] for event in events] == ['token', 'done']
+    assert events[-1]['message'] == first[-1]['message']
+    assert fake_ollama.fake.get_stats()['generate'] == generations
+    assert seraphina.sessions.get_stats()['invalidated'] == invalidated + 1
+
+def test_romantic_stream_does_not_cache_fallbacks(seraphina, cache, fail_models):
+    fail_models('yi:6b', seraphina.romantic_ai.fallback_model())
+
+    events = list(seraphina.stream_romantic_response("Can you hear me?"))
+
+    assert seraphina.romantic_ai.is_fallback_response(events[-1]['message'])
+    assert cache.get_stats()['stores'] == 0
+
+def test_romantic_response_does_not_cache_fallbacks(seraphina, cache, fail_models):
+    fail_models('yi:6b', seraphina.romantic_ai.fallback_model())
+
+    result = seraphina.generate_romantic_response("Can you hear me now?")
+
+    assert seraphina.romantic_ai.is_fallback_response(result['message'])
+    assert cache.get_stats()['stores'] == 0
+
+def test_agent_stream_serves_paraphrase_from_cache(agent, cache, fake_ollama):
+    first = list(agent.generate_contextual_response_stream("What should we do this weekend?", 'cache_user'))
+    assert cache.get_stats()['stores'] == 1
+
+    generations = fake_ollama.fake.get_stats()['generate']
+    events = list(agent.generate_contextual_response_stream("What should we do on the weekend?", 'cache_user'))
+
+    assert events[0]['type'] == 'token'
+    assert events[-1]['response'] == first[-1]['response']
+    assert fake_ollama.fake.get_stats()['generate'] == generations
+
+def test_agent_stream_does_not_cache_fallbacks(agent, cache, fail_models):
+    model = agent.select_model_for_context(agent.emotion_engine.analyze_emotion("Can you hear me?"))
+    fail_models(model, agent.config['models']['fallback'])
+
+    events = list(agent.generate_contextual_response_stream("Can you hear me?", 'cache_user'))
+
+    assert events[-1]['response'].startswith(agent.fallback_response())
+    assert cache.get_stats()['stores'] == 0
@@ -0,0 +1,77 @@
+"""
+Seraphina HTTP route tests
+JSON and NDJSON chat, and the 429 busy response when admission is full
+"""
+
+import json
+import pytest
+
+@pytest.fixture
+def client(engine):
+    from flask import Flask
+    from agents.seraphina.routes import seraphina_bp
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(seraphina_bp, url_prefix='/agent/seraphina')
+    return app.test_client()
+
+@pytest.fixture
+def full_queue(engine, monkeypatch):
+    """No free admission slots and no room to queue for the free plan"""
+
+    engine.start()
+    monkeypatch.setattr(engine.scheduler, 'capacity', 0)
+    monkeypatch.setitem(engine.scheduler.max_queue_depth, 'free', 0)
+
+def test_chat_stream_sends_tokens_then_done(client):
+    response = client.post('/agent/seraphina/chat/stream', json={'message': "Tell me about your day"})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert events[0]['type'] == 'token'
+    assert events[-1]['type'] == 'done'
+    assert events[-1]['message'].startswith(events[0]['token'])
+
+def test_chat_stream_busy_is_429(client, full_queue):
+    response = client.post('/agent/seraphina/chat/stream', json={'message': "Are you free to talk?"})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['error'] == 'busy'
+
+def test_chat_busy_is_429(client, full_queue):
+    response = client.post('/agent/seraphina/chat', json={'message': "Are you free to talk now?"})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_chat_stream_requires_message(client):
+    assert client.post('/agent/seraphina/chat/stream', json={}).status_code == 400
+
+def test_socket_message_uses_the_session_plan(engine, monkeypatch):
+    from flask import Flask, session
+    from agents.seraphina.websocket import socket
+
+    plans = []
+
+    class Engine:
+        def get_mood(self, user_id):
+            return 'romantic'
+
+        def stream_romantic_response(self, message, user_id=None, mood=None, plan=None):
+            plans.append(plan)
+            return iter([])
+
+    monkeypatch.setattr(socket, 'emit', lambda *args, **kwargs: None)
+    handler = socket.SerafinaSocket(Engine())
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.test_request_context():
+        session['user_info'] = {'subscription_plan': 'free'}
+        handler.handle_message('socket_user', {'message': "Hello", 'plan': 'enterprise'})
+
+    assert plans == ['free']
@@ -0,0 +1,205 @@
+"""
+Top-K memory tests
+Eviction order on equal scores, and snapshot plus append-log persistence
+"""
+
+import os
+import json
+import pytest
+
+def memory(name, score, kind='moment'):
+    return {'content': name, 'importance_score': score, 'type': kind}
+
+def contents(memories):
+    return [m['content'] for m in memories]
+
+def test_evicts_lowest_score_first(fake_ollama):
+    from agents.topk_memory import TopKMemories
+
+    memories = TopKMemories(capacity=3)
+    for name, score in [('a', 5), ('b', 1), ('c', 3)]:
+        memories.insert(memory(name, score))
+
+    assert memories.insert(memory('d', 4))
+    assert contents(memories.get()) == ['a', 'c', 'd']
+    assert not memories.insert(memory('e', 2))
+    assert contents(memories.top(3)) == ['a', 'd', 'c']
+
+def test_equal_scores_evict_newest_first(fake_ollama):
+    from agents.topk_memory import TopKMemories
+
+    memories = TopKMemories(capacity=3)
+    for name in 'abc':
+        memories.insert(memory(name, 2))
+
+    # A tie with the lowest kept score does not displace anything
+    assert not memories.insert(memory('d', 2))
+    # A higher score evicts the newest of the tied memories
+    assert memories.insert(memory('e', 3))
+    assert contents(memories.get()) == ['a', 'b', 'e']
+    assert memories.insert(memory('f', 3))
+    assert contents(memories.get()) == ['a', 'e', 'f']
+
+def test_matches_stable_sort_and_truncate(fake_ollama):
+    import random
+    from agents.topk_memory import TopKMemories
+
+    rng = random.Random(7)
+    inserted = [memory(str(i), rng.randint(0, 5)) for i in range(200)]
+    memories = TopKMemories(capacity=20)
+    for m in inserted:
+        memories.insert(m)
+
+    expected = sorted(inserted, key=lambda m: m['importance_score'], reverse=True)[:20]
+    assert sorted(contents(memories.get()), key=int) == sorted(contents(expected), key=int)
+
+def test_type_index_follows_evictions(fake_ollama):
+    from agents.topk_memory import TopKMemories
+
+    memories = TopKMemories(capacity=2)
+    memories.insert(memory('a', 1, 'fear'))
+    memories.insert(memory('b', 2, 'joy'))
+    memories.insert(memory('c', 3, 'joy'))
+
+    assert memories.get('fear') == []
+    assert contents(memories.get('joy')) == ['b', 'c']
+    assert contents(memories.get('all')) == ['b', 'c']
+
+@pytest.fixture
+def store_path(tmp_path, fake_ollama):
+    return str(tmp_path / 'topk')
+
+def test_store_reloads_from_log(store_path):
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=5, compact_after=100)
+    for i in range(8):
+        store.add('u1', memory(str(i), i))
+
+    reloaded = TopKMemoryStore(store_path, capacity=5, compact_after=100)
+    assert contents(reloaded.get('u1')) == contents(store.get('u1')) == ['3', '4', '5', '6', '7']
+    assert not os.path.exists(store.snapshot_file('u1'))
+
+def test_store_compacts_log_into_snapshot(store_path):
+    from agents.jsonl_writer import flush_jsonl_writer
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=3, compact_after=4)
+    for i in range(6):
+        store.add('u1', memory(str(i), i))
+    flush_jsonl_writer()
+
+    assert store.get_stats()['compactions'] == 1
+    with open(store.snapshot_file('u1'), 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    assert snapshot['generation'] == 1
+    assert contents(snapshot['memories']) == ['1', '2', '3']
+
+    # The old generation's log is gone; inserts since then are in the new one
+    assert not os.path.exists(store.log_file('u1', 0))
+    with open(store.log_file('u1', 1), 'r', encoding='utf-8') as f:
+        assert [json.loads(line)['content'] for line in f] == ['4', '5']
+
+    reloaded = TopKMemoryStore(store_path, capacity=3, compact_after=4)
+    assert contents(reloaded.get('u1')) == ['3', '4', '5']
+
+def test_store_ignores_logs_folded_into_snapshot(store_path):
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=3, compact_after=100)
+    with open(store.snapshot_file('u1'), 'w', encoding='utf-8') as f:
+        json.dump({'generation': 1, 'memories': [memory('kept', 5)]}, f)
+    # A compaction crashed after writing the snapshot but before dropping the log
+    with open(store.log_file('u1', 0), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(memory('kept', 5)) + '\n')
+
+    assert contents(store.get('u1')) == ['kept']
+    assert not os.path.exists(store.log_file('u1', 0))
+
+def test_store_reads_legacy_snapshot(store_path):
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=3)
+    with open(store.snapshot_file('u1'), 'w', encoding='utf-8') as f:
+        json.dump([memory('old', 1), memory('older', 2)], f)
+
+    assert contents(store.top('u1', 1)) == ['older']
+
+def test_store_keeps_user_files_inside_path(store_path):
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=3, compact_after=1)
+    store.add('../escape', memory('a', 1))
+    store.add('../escape', memory('b', 2))
+
+    assert os.path.dirname(store.snapshot_file('../escape')) == store_path
+    assert all(not name.startswith('..') for name in os.listdir(store_path))
+    assert contents(TopKMemoryStore(store_path, capacity=3).get('../escape')) == ['a', 'b']
+
+def test_compaction_keeps_other_workers_inserts(store_path):
+    from agents.jsonl_writer import flush_jsonl_writer
+    from agents.topk_memory import TopKMemoryStore
+
+    # Two stores on one directory stand in for two gunicorn workers
+    first = TopKMemoryStore(store_path, capacity=10, compact_after=4)
+    second = TopKMemoryStore(store_path, capacity=10, compact_after=4)
+    first.get('u1')
+    second.get('u1')
+
+    for i in range(3):
+        first.add('u1', memory(f"first {i}", 1))
+        second.add('u1', memory(f"second {i}", 1))
+    first.add('u1', memory('first 3', 1))
+    assert first.get_stats()['compactions'] == 1
+
+    # The second worker still appends, and its inserts go to the new generation's log
+    second.add('u1', memory('second 3', 1))
+    flush_jsonl_writer()
+
+    assert not os.path.exists(first.log_file('u1', 0))
+    reloaded = TopKMemoryStore(store_path, capacity=10)
+    assert sorted(contents(reloaded.get('u1'))) == sorted(
+        [f"first {i}" for i in range(4)] + [f"second {i}" for i in range(4)])
+
+def test_loading_one_user_does_not_block_others(store_path):
+    import threading
+    from agents.topk_memory import TopKMemoryStore
+
+    store = TopKMemoryStore(store_path, capacity=3)
+    store.add('fast', memory('a', 1))
+    store._users.clear()
+
+    read, loading, release = store._read, threading.Event(), threading.Event()
+
+    def slow_read(user_id):
+        if user_id == 'slow':
+            loading.set()
+            release.wait(5)
+        return read(user_id)
+
+    store._read = slow_read
+    slow = threading.Thread(target=store.get, args=('slow',))
+    slow.start()
+    try:
+        assert loading.wait(5)
+        assert contents(store.get('fast')) == ['a']
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join(5)
+
+@pytest.mark.parametrize('backend', ['file', 'sqlite'])
+def test_short_term_spill_keeps_significant_turns(backend, monkeypatch, fake_ollama):
+    from agents.seraphina.memory.emotional_memory import EmotionalMemory
+
+    monkeypatch.setenv('MEMORY_BACKEND', backend)
+    memory = EmotionalMemory()
+    user_id = f"spill_user_{backend}"
+
+    memory.store_interaction(user_id, "Our first date was perfect", "It was 💕", 'romantic', 'romantic')
+    for i in range(memory.max_short_term_memory + 5):
+        memory.store_interaction(user_id, f"Small talk {i}", "Mm-hm", 'neutral', 'playful')
+
+    assert len(memory.short_term_cache[user_id]) == memory.max_short_term_memory
+    assert contents(memory.get_memories(user_id, 'conversation')) == ["Our first date was perfect"]
+    assert memory.count_interactions(user_id) == memory.max_short_term_memory + 6
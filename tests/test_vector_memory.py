@@ -0,0 +1,77 @@
+"""
+Vector memory tests
+Recall after reloads, and cold loads kept off the store-wide lock
+"""
+
+import threading
+import pytest
+
+@pytest.fixture
+def memory(tmp_path):
+    from agents.semantic_cache import HashingEmbedder
+    from agents.vector_memory import VectorMemory
+
+    return VectorMemory(str(tmp_path), HashingEmbedder(), min_score=0.5)
+
+def contents(results):
+    return [result['content'] for result in results]
+
+def test_recall_after_reload(memory):
+    memory._remember('u1', "We went stargazing on the hill", {})
+    memory._remember('u1', "You love lemon cake", {})
+    memory._indexes.clear()
+
+    assert contents(memory.recall('u1', "Do you remember stargazing on the hill?")) == [
+        "We went stargazing on the hill"]
+    assert memory.get_stats()['loads'] == 1
+
+def test_loading_one_user_does_not_block_others(memory):
+    memory._remember('slow', "We danced in the rain", {})
+    fast = next(f"fast{i}" for i in range(100) if memory._user_lock(f"fast{i}") is not memory._user_lock('slow'))
+    memory._remember(fast, "We baked lemon cake", {})
+    memory._indexes.clear()
+
+    load, loading, release = memory._load, threading.Event(), threading.Event()
+
+    def slow_load(user_id):
+        if user_id == 'slow':
+            loading.set()
+            release.wait(5)
+        return load(user_id)
+
+    memory._load = slow_load
+    slow = threading.Thread(target=memory.recall, args=('slow', "Dancing in the rain"))
+    slow.start()
+    try:
+        assert loading.wait(5)
+        assert contents(memory.recall(fast, "We baked lemon cake")) == ["We baked lemon cake"]
+        assert memory.get_stats()['resident_users'] == 1
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join(5)
+
+def test_memory_remembered_during_a_load_is_kept(memory):
+    memory._remember('u1', "We danced in the rain", {})
+    memory._indexes.clear()
+
+    load, loading, release = memory._load, threading.Event(), threading.Event()
+
+    def slow_load(user_id):
+        loading.set()
+        release.wait(5)
+        return load(user_id)
+
+    memory._load = slow_load
+    recall = threading.Thread(target=memory.recall, args=('u1', "Dancing in the rain"))
+    recall.start()
+    assert loading.wait(5)
+
+    remember = threading.Thread(target=memory._remember, args=('u1', "We baked lemon cake", {}))
+    remember.start()
+    release.set()
+    recall.join(5)
+    remember.join(5)
+
+    assert contents(memory.recall('u1', "We baked lemon cake")) == ["We baked lemon cake"]
+    assert len(memory._indexes['u1']) == 2
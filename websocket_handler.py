@@ -141,7 +141,10 @@ def handle_message(data):
         emit('error', {'message': 'Message and agent ID required'})
         return
     
+    from agents.scheduler import plan_from_session
+    
     user_id = active_connections[client_id]['user_id']
+    plan = plan_from_session(session)
     room = f'agent_{agent_id}'
     
     # Create message object
@@ -163,11 +166,37 @@ def handle_message(data):
         'typing': True
     }, room=room)
     
-    # Simulate agent response after delay
-    def send_agent_response():
+    def stream_agent_response():
+        """Stream a real agent response token by token"""
+        from agents.manager import agent_manager
+        
+        agent = agent_manager.get_agent(agent_id, user_id)
+        response_id = f'msg_{int(time.time() * 1000)}'
+        final_event = None
+        
+        for event in agent.generate_contextual_response_stream(message, user_id, {'plan': plan}):
+            if event['type'] == 'token':
+                socketio.emit('agent_token', {
+                    'id': response_id,
+                    'agent_id': agent_id,
+                    'token': event['token']
+                }, room=room)
+            elif event['type'] == 'done':
+                final_event = event
+        
+        return {
+            'id': response_id,
+            'user_id': f'agent_{agent_id}',
+            'agent_id': agent_id,
+            'message': final_event['response'] if final_event else '',
+            'timestamp': datetime.utcnow().isoformat(),
+            'type': 'agent'
+        }
+    
+    def mock_agent_response():
+        """Mock agent response for agents without an Ollama backend"""
         time.sleep(1 + (len(message) / 50))  # Simulate thinking time
         
-        # Mock agent response (replace with actual AI integration)
         agent_responses = {
             'strategist': f"Based on your message '{message}', I suggest we analyze the strategic implications and develop a tactical approach.",
             'healer': f"I understand your concern about '{message}'. Let me help you find balance and wellness in this situation.",
@@ -176,16 +205,36 @@ def handle_message(data):
         }
         
         default_response = f"Thank you for sharing '{message}'. Let me process this and provide you with the best assistance."
-        agent_response = agent_responses.get(agent_id, default_response)
         
-        response_data = {
+        return {
             'id': f'msg_{int(time.time() * 1000)}',
             'user_id': f'agent_{agent_id}',
             'agent_id': agent_id,
-            'message': agent_response,
+            'message': agent_responses.get(agent_id, default_response),
             'timestamp': datetime.utcnow().isoformat(),
             'type': 'agent'
         }
+    
+    def send_agent_response():
+        from agents.manager import agent_manager
+        from agents.scheduler import QueueFullError
+        
+        try:
+            if agent_id in agent_manager.agent_registry:
+                response_data = stream_agent_response()
+            else:
+                response_data = mock_agent_response()
+        except QueueFullError as e:
+            socketio.emit('agent_typing', {
+                'agent_id': agent_id,
+                'typing': False
+            }, room=room)
+            socketio.emit('agent_busy', {
+                'agent_id': agent_id,
+                'message': 'The agent is busy right now, please try again shortly.',
+                'retry_after': e.retry_after
+            }, room=room)
+            return
         
         # Stop typing indicator
         socketio.emit('agent_typing', {